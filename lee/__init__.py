@@ -1,11 +1,18 @@
-from . import conf
-import urllib.parse
+from . import conf, shard, replica
+import hashlib
 import os
+import sys
 
-__all__ = ['connect', 'Table', 'Model', 'query', 'desc_table', 'show_tables']
+__all__ = ['connect', 'Table', 'Model', 'query', 'desc_table', 'show_tables',
+    'query_budget']
 
-def connect(path, memcached=False, cache_timeout=0,
-        lru_cache=False, lru_cache_max=128):
+def connect(path, memcached=False, cache_timeout=0, generation_cache_time=0,
+        lru_cache=False, lru_cache_max=128, lru_cache_max_bytes=0,
+        cache_policy='lru', shm_cache=False, shm_cache_size=64 * 1024 * 1024,
+        shm_cache_slot_size=1024, cache_metrics=False, query_stats=False,
+        slow_query_time=0, index_advisor=False, lazy_schema=False,
+        schema_cache=None, shards=None, shard_vnodes=64, replicas=None,
+        replica_sticky_time=1, replica_retry_time=30):
     '''connect to the database
 
     @path:
@@ -18,40 +25,130 @@ def connect(path, memcached=False, cache_timeout=0,
     @cache_timeout:
         only for memcached timeout
 
+    @generation_cache_time:
+        the seconds the table generations of memcached are kept in process,
+        default 0 read the generation on every lookup, if set the del_all and
+        Table.invalidate_all of the other processes are seen after it
+
     @lru_cache:
         bool if use lru_cache set it True
 
     @lru_cache_max:
-        the max size of lru_cache
-    '''
-    p = urllib.parse.urlparse(path)
-    if p.scheme == 'mysql':
-        conf.mysql = {}
-        netloc = p.netloc.split(':', 1)
-        conf.mysql['host'] = netloc[0]
+        the max size of lru_cache, 0 is unlimited
+
+    @lru_cache_max_bytes:
+        the max bytes of lru_cache, if set the values are stored pickled and
+        evicted when the total size is over it
+
+    @cache_policy:
+        the policy of the in-process cache, lru or tinylfu (scan resistant,
+        bounded by lru_cache_max only, it can not be 0)
+
+    @shm_cache:
+        the path of the memory mapped file shared by all the processes on the
+        host, True use /dev/shm/lee_cache_ and the hash of path, a file in
+        use with an other size is never resized, it raise ValueError
+
+    @shm_cache_size:
+        the bytes of the shared memory cache
+
+    @shm_cache_slot_size:
+        the bytes of one entry of the shared memory cache, the bigger values
+        are not cached
+
+    @cache_metrics:
+        count the cache hits, misses, sets, deletes, bytes, get latency and
+        hot keys per table, also see Table.cache_metrics and lee.cache.metrics
+
+    @query_stats:
+        count the latency histograms per sql fingerprint, also see
+        lee.query.query_stats
+
+    @slow_query_time:
+        log the sql slower than it (seconds) as warning
 
-        if len(netloc) == 2:
-            conf.mysql['port'] = int(netloc[1])
-        else:
-            conf.mysql['port'] = 3306
+    @index_advisor:
+        record the query shapes of the tables, also see lee.advisor.advise
 
-        conf.mysql.update(urllib.parse.parse_qsl(p.query))
+    @lazy_schema:
+        defer the create of the tables to the first query, and create all
+        the missing tables in one transaction, also see lee.schema
 
-        conf.use_mysql = True
+    @schema_cache:
+        the file to save the schema fingerprints, the unchanged schemas skip
+        the introspection, only for lazy_schema
+
+    @shards:
+        the DSN list of the shards of the models with sharded = True, also
+        see lee.shard
+
+    @shard_vnodes:
+        the virtual nodes of every shard on the consistent hash ring
+
+    @replicas:
+        the DSN list of the read replicas of path, also see lee.replica
+
+    @replica_sticky_time:
+        the reads stay on the primary for it (seconds) after a write of the
+        same session, also the max cache timeout of the rows read from a
+        replica
+
+    @replica_retry_time:
+        the replica failed the health check is skipped for it (seconds)
+    '''
+    if lru_cache and cache_policy == 'tinylfu' and lru_cache_max <= 0:
+        raise ValueError('the tinylfu cache_policy needs a lru_cache_max')
+
+    database = shard.parse_dsn(path)
+    conf.use_mysql = database['use_mysql']
+    if conf.use_mysql:
+        conf.mysql = database['mysql']
     else:
-        conf.path = p.netloc + p.path
-        conf.use_mysql = False
-        base_path = os.path.dirname(conf.path)
+        conf.path = database['path']
+
+    shard.configure(shards, shard_vnodes)
+    replica.configure(replicas, replica_sticky_time, replica_retry_time)
+    for database in [{'path': conf.path}] + conf.shards:
+        base_path = os.path.dirname(database['path'] or '')
         if base_path and not os.path.exists(base_path):
             os.makedirs(base_path)
 
+    # the tinylfu segments are sized on clear
+    resize = (lru_cache_max, cache_policy) != (conf.lru_cache_max, conf.cache_policy)
+
     conf.memcached = memcached
     conf.lru_cache = lru_cache
     conf.lru_cache_max = lru_cache_max
+    conf.lru_cache_max_bytes = lru_cache_max_bytes
+    conf.cache_policy = cache_policy
     conf.cache_timeout = cache_timeout
-    if memcached or lru_cache:
-        conf.is_cache = True
+    conf.generation_cache_time = generation_cache_time
+    conf.shm_cache = bool(shm_cache)
+    if isinstance(shm_cache, str):
+        shm_cache_path = shm_cache
+    else:
+        # one file per database, the keys of the other apps never collide
+        shm_cache_path = '/dev/shm/lee_cache_{}'.format(
+                hashlib.md5(path.encode()).hexdigest()[:12])
+    # the module needs fcntl, it is only imported by the shm_cache users
+    if shm_cache_path != conf.shm_cache_path and \
+            'lee.cache.shm_cache' in sys.modules:
+        sys.modules['lee.cache.shm_cache'].close()
+    conf.shm_cache_path = shm_cache_path
+    conf.shm_cache_size = shm_cache_size
+    conf.shm_cache_slot_size = shm_cache_slot_size
+    conf.cache_metrics = cache_metrics
+    conf.query_stats = query_stats
+    conf.slow_query_time = slow_query_time
+    conf.index_advisor = index_advisor
+    conf.lazy_schema = lazy_schema
+    conf.schema_cache = schema_cache
+    conf.is_cache = bool(memcached or lru_cache or shm_cache)
+    if resize and cache_policy == 'tinylfu':
+        from .cache import tinylfu
+        tinylfu.clear()
 
 from .table import Table
 from .models import Model
 from .query import query, desc_table, show_tables
+from .budget import query_budget
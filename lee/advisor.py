@@ -0,0 +1,176 @@
+'''
+index advisor, aggregate the query shapes of find_one, find_all, iter_all and
+del_all per table, explain the representative query of each shape and
+propose the spec_index entries for the full table scans and filesorts.
+
+the shapes are observed in process by lee.connect(..., index_advisor=True),
+or loaded from a workload log of lee.workload::
+
+    lee advise sqlite://path/to/the/sqlite /tmp/lee.workload.jsonl
+'''
+from _thread import RLock
+from .utils import parse_query
+import argparse
+import json
+import re
+
+__all__ = ['observe', 'shapes', 'reset', 'load_log', 'advise', 'main']
+
+_shapes = {}
+_lock = RLock()
+_re_q = re.compile(r'^(.+?)_\$(gt|gte|lt|lte|eq|like|in|notin)$')
+EQUAL_OPS = ('eq', 'in')
+
+def _filters(query):
+    if not query:
+        return ()
+    if isinstance(query, dict):
+        query = query.items()
+    retval = []
+    for item in query:
+        if len(item) == 3:
+            key, op = item[0], item[1]
+            op = {'=': 'eq', 'in': 'in'}.get(op, 'gt')
+        else:
+            key, op = item[0], 'eq'
+            q = _re_q.search(key)
+            if q:
+                key, op = q.group(1), q.group(2)
+        retval.append((key, op))
+    return tuple(sorted(retval))
+
+def _order(order):
+    if not order:
+        return ()
+    if isinstance(order, dict):
+        return tuple((key, str(val).upper()) for key, val in order.items())
+    if isinstance(order, (list, tuple)):
+        if isinstance(order[0], (list, tuple)):
+            return tuple((key, str(val).upper()) for key, val in order)
+        return tuple((key, 'ASC') for key in order)
+    return ((order, 'ASC'), )
+
+def observe(table_name, query=None, order=None, group=None, is_or=False):
+    '''record one query of the table'''
+    shape = (table_name, _filters(query), _order(order),
+            tuple(group or ()), bool(is_or))
+    with _lock:
+        stat = _shapes.get(shape)
+        if stat is None:
+            stat = _shapes[shape] = {
+                'table': table_name,
+                'filters': shape[1],
+                'order': shape[2],
+                'group': shape[3],
+                'is_or': shape[4],
+                'count': 0,
+                'query': query,
+                'order_arg': order,
+            }
+        stat['count'] += 1
+
+def shapes():
+    with _lock:
+        return sorted(_shapes.values(), key=lambda x: x['count'], reverse=True)
+
+def reset():
+    with _lock:
+        _shapes.clear()
+
+def load_log(path):
+    '''observe the queries record in the workload log'''
+    with open(path) as f:
+        for line in f:
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            if record.get('op') not in ('find_one', 'find_all', 'del_all'):
+                continue
+            kwargs = record['kwargs']
+            observe(record['table'], kwargs.get('query'), kwargs.get('order'),
+                    kwargs.get('group'), kwargs.get('is_or', False))
+
+def _propose(stat):
+    '''the index columns by equality, range then order columns'''
+    if stat['is_or']:
+        return None
+    columns = [key for key, op in stat['filters'] if op in EQUAL_OPS]
+    ranges = [key for key, op in stat['filters'] \
+            if op in ('gt', 'gte', 'lt', 'lte', 'like')]
+    orders = [key for key, _ in stat['order']]
+    if ranges:
+        columns.append(ranges[0])
+    elif len(set(val for _, val in stat['order'])) <= 1:
+        columns.extend(orders)
+    columns.extend(stat['group'])
+
+    retval = []
+    for column in columns:
+        if column not in retval:
+            retval.append(column)
+    return retval
+
+def advise(min_count=1):
+    '''
+    explain every shape observed at least min_count times, return the list
+    of the shapes with the plan and the proposed index
+    '''
+    from .query import explain, desc_table, gen_index_sql
+
+    columns_cache = {}
+    retval = []
+    for stat in shapes():
+        if stat['count'] < min_count:
+            continue
+        table_name = stat['table']
+        if table_name not in columns_cache:
+            columns_cache[table_name] = desc_table(table_name) or []
+        columns = columns_cache[table_name]
+        where, values = parse_query(columns, stat['query'], '',
+                stat['order_arg'], list(stat['group']) or None, stat['is_or'])
+        sql = 'SELECT * FROM `{}` {}'.format(table_name, where)
+        plan = explain(sql, tuple(values)) or {}
+
+        item = {
+            'table': table_name,
+            'count': stat['count'],
+            'sql': sql,
+            'plan': plan.get('plan'),
+            'full_scan': plan.get('full_scan', False),
+            'filesort': plan.get('filesort', False),
+            'spec_index': None,
+            'sql_index': None,
+        }
+        if item['full_scan'] or item['filesort']:
+            index_columns = _propose(stat)
+            if index_columns:
+                idx = tuple(['_'.join(index_columns)] + index_columns)
+                item['spec_index'] = idx
+                item['sql_index'] = gen_index_sql(table_name, idx)
+        retval.append(item)
+
+    return retval
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='lee advise')
+    parser.add_argument('--min-count', type=int, default=1, help='skip the shapes observed less times')
+    parser.add_argument('--json', action='store_true', help='output JSON')
+    parser.add_argument('path', help='sqlite://path/to/the/sqlite\nmysql://host:port?user=dbuser&passwd=dbpasswd&db=dbname')
+    parser.add_argument('log', help='the workload log of lee.workload')
+    args = parser.parse_args(argv)
+
+    from . import connect
+    connect(args.path)
+    load_log(args.log)
+    result = advise(args.min_count)
+    if args.json:
+        print(json.dumps(result, indent=2, default=str))
+        return
+
+    for item in result:
+        flags = [flag for flag in ('full_scan', 'filesort') if item[flag]]
+        print('{} x {}'.format(item['count'], item['sql']))
+        print('    plan: {}'.format(', '.join(flags) or 'ok'))
+        if item['spec_index']:
+            print('    spec_index: {!r}'.format(item['spec_index']))
+            print('    {}'.format(item['sql_index']))
@@ -0,0 +1,171 @@
+'''
+the asyncio interface of lee, the blocking calls run on a dedicated bounded
+thread pool, every thread of the pool has its own database connection.
+
+eg::
+
+    AsyncUser = lee.aio.AsyncTable(User, max_concurrency=32, timeout=2)
+
+    async def handler(user_id):
+        user = await AsyncUser.find_by_id(user_id)
+        user['visits'] += 1
+        await AsyncUser.strict_save(user)
+
+the calls wait in the pool queue are cancelled with the awaiting task, the
+running ones can not be interrupted, they finish on the pool and the result
+is dropped.
+'''
+from concurrent.futures import ThreadPoolExecutor
+from _thread import RLock
+from . import cache as mc, conf
+from .models import Model
+import asyncio
+import contextvars
+import functools
+import os
+import weakref
+
+__all__ = ['AsyncTable', 'configure', 'shutdown', 'run', 'cache_get',
+    'cache_get_multi', 'cache_set', 'cache_set_multi', 'cache_delete']
+
+_executor = None
+_max_workers = min(32, (os.cpu_count() or 1) + 4)
+_lock = RLock()
+
+def configure(max_workers):
+    '''set the size of the thread pool, the running pool is shutdown'''
+    global _max_workers
+    with _lock:
+        _max_workers = max_workers
+        shutdown(wait=False)
+
+def shutdown(wait=True):
+    global _executor
+    with _lock:
+        if _executor is not None:
+            _executor.shutdown(wait=wait)
+            _executor = None
+
+def _get_executor():
+    global _executor
+    if _executor is None:
+        with _lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(_max_workers,
+                        thread_name_prefix='lee-aio')
+    return _executor
+
+async def run(func, *args, timeout=None, **kwargs):
+    '''
+    run the blocking func on the pool and await the result
+
+    @timeout:
+        raise asyncio.TimeoutError if the result is not ready in it (seconds)
+    '''
+    loop = asyncio.get_running_loop()
+    # the context follows the call, eg: the session of lee.replica
+    context = contextvars.copy_context()
+    future = loop.run_in_executor(_get_executor(),
+            functools.partial(context.run, func, *args, **kwargs))
+    if timeout is None:
+        return await future
+    return await asyncio.wait_for(future, timeout)
+
+async def _cache_call(func, *args):
+    # the in-process caches never block, only memcached use the pool
+    if conf.memcached:
+        return await run(func, *args)
+    return func(*args)
+
+async def cache_get(key):
+    return await _cache_call(mc.get, key)
+
+async def cache_get_multi(keys):
+    return await _cache_call(mc.get_multi, keys)
+
+async def cache_set(key, val, timeout=0):
+    return await _cache_call(mc.set, key, val, timeout)
+
+async def cache_set_multi(mapping, timeout=0):
+    return await _cache_call(mc.set_multi, mapping, timeout)
+
+async def cache_delete(key):
+    return await _cache_call(mc.delete, key)
+
+class AsyncTable(object):
+    '''
+    the awaitable counterpart of a Table, the other attributes of the Table
+    are wrap to coroutine functions too, eg: await AsyncUser.find_by_name(name)
+
+    @max_concurrency:
+        the max calls of the table run at the same time on one event loop, the
+        others wait without blocking the loop, None is only bound by the pool
+
+    @timeout:
+        the default timeout (seconds) of every call
+    '''
+
+    __slots__ = ['table', 'max_concurrency', 'timeout', '_semaphores']
+
+    def __init__(self, table, max_concurrency=None, timeout=None):
+        self.table = table
+        self.max_concurrency = max_concurrency
+        self.timeout = timeout
+        self._semaphores = weakref.WeakKeyDictionary()
+
+    def __call__(self, *args, **kwargs):
+        return self.table(*args, **kwargs)
+
+    def __repr__(self):
+        return 'Async{!r}'.format(self.table)
+
+    def _semaphore(self):
+        if not self.max_concurrency:
+            return None
+        loop = asyncio.get_running_loop()
+        semaphore = self._semaphores.get(loop)
+        if semaphore is None:
+            semaphore = self._semaphores[loop] = asyncio.Semaphore(self.max_concurrency)
+        return semaphore
+
+    async def _run(self, func, *args, **kwargs):
+        timeout = kwargs.pop('timeout', None)
+        if timeout is None:
+            timeout = self.timeout
+        semaphore = self._semaphore()
+        if semaphore is None:
+            return await run(func, *args, timeout=timeout, **kwargs)
+        async with semaphore:
+            return await run(func, *args, timeout=timeout, **kwargs)
+
+    def __getattr__(self, key):
+        func = getattr(self.table, key)
+        if not callable(func):
+            return func
+        return functools.partial(self._run, func)
+
+    async def find_by_id(self, *args, timeout=None):
+        return await self._run(self.table.find_by_id, *args, timeout=timeout)
+
+    async def find_one(self, *args, timeout=None, **kwargs):
+        return await self._run(self.table.find_one, *args, timeout=timeout, **kwargs)
+
+    async def find_all(self, *args, timeout=None, **kwargs):
+        return await self._run(self.table.find_all, *args, timeout=timeout, **kwargs)
+
+    async def save(self, obj, timeout=None):
+        if isinstance(obj, Model):
+            return await self._run(obj.save, timeout=timeout)
+        return await self._run(self.table.save, obj, timeout=timeout)
+
+    async def strict_save(self, obj, changed=None, timeout=None):
+        '''save the changed columns of obj, obj is a Model or a dict with changed'''
+        if changed is None:
+            return await self._run(obj.strict_save, timeout=timeout)
+        return await self._run(self.table.strict_save, obj, changed, timeout=timeout)
+
+    async def del_by_id(self, *args, timeout=None):
+        return await self._run(self.table.del_by_id, *args, timeout=timeout)
+
+    async def del_all(self, *args, timeout=None, **kwargs):
+        return await self._run(self.table.del_all, *args, timeout=timeout, **kwargs)
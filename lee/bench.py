@@ -0,0 +1,158 @@
+'''
+the benchmark suite of lee, run it by::
+
+    lee bench sqlite://path/to/bench.db -o result.json
+
+the results are JSON so the runs can be compared over time, every benchmark
+report the count, the mean, p50 and p95 in microseconds and the ops per
+second.
+'''
+from . import connect
+from .table import Table
+from .models import Model
+from .utils import parse, unparse, parse_query
+import argparse
+import json
+import platform
+import time
+
+__all__ = ['run', 'main']
+
+BACKENDS = {
+    'uncache': {},
+    'lru': {'lru_cache': True, 'lru_cache_max': 100000},
+}
+
+class _Bench(Model):
+    table_name = 'lee_bench'
+    columns = [
+        {'name': 'id',         'type': 'int', 'primary': True, 'auto_increment': True},
+        {'name': 'name',       'type': 'str', 'length': 32, 'unique': True},
+        {'name': 'score',      'type': 'int', 'default': 0},
+        {'name': 'payload',    'type': 'pickle'},
+        {'name': 'created_at', 'type': 'int', 'default': lambda : int(time.time())},
+    ]
+
+def _measure(name, backend, func, count):
+    times = []
+    for idx in range(count):
+        start = time.perf_counter()
+        func(idx)
+        times.append(time.perf_counter() - start)
+
+    times.sort()
+    total = sum(times)
+    return {
+        'name': name,
+        'backend': backend,
+        'count': count,
+        'mean_us': total / count * 1000000,
+        'p50_us': times[count // 2] * 1000000,
+        'p95_us': times[min(int(count * 0.95), count - 1)] * 1000000,
+        'ops': count / total if total else 0,
+    }
+
+def _payload(idx):
+    return {'idx': idx, 'tags': ['a', 'b', 'c'], 'text': 'x' * 200}
+
+def _bench_table(table, backend, rows):
+    results = []
+    table.del_all()
+
+    def insert(idx):
+        table.save({'name': 'n{}'.format(idx), 'score': idx,
+            'payload': _payload(idx)})
+    results.append(_measure('save_insert', backend, insert, rows))
+
+    ids = [ret['id'] for ret in table.find_all(column='`id`', order='id')]
+
+    def update(idx):
+        table.save({'id': ids[idx], 'score': idx + 1})
+    results.append(_measure('save_update', backend, update, rows))
+
+    objs = [table.find_by_id(pk) for pk in ids]
+    def strict_save(idx):
+        obj = objs[idx]
+        obj['score'] = idx + 2
+        obj.strict_save()
+    results.append(_measure('strict_save', backend, strict_save, rows))
+
+    table.invalidate_all()
+    def find_by_id(idx):
+        table.find_by_id(ids[idx])
+    results.append(_measure('find_by_id_miss', backend, find_by_id, rows))
+    results.append(_measure('find_by_id_hit', backend, find_by_id, rows))
+
+    for size in (10, 100, 1000):
+        if size > rows:
+            break
+        def find_all(idx):
+            table.find_all(limit=size)
+        results.append(_measure('find_all_{}'.format(size), backend, find_all,
+            max(rows // size, 10)))
+
+    def del_all(idx):
+        table.del_all()
+    results.append(_measure('del_all', backend, del_all, 1))
+
+    return results
+
+def _bench_utils(rows):
+    results = []
+    columns = _Bench.columns
+    obj = {'id': 1, 'name': 'name', 'score': 2, 'payload': _payload(1),
+            'created_at': 3}
+    raw = parse(dict(obj), columns)
+    query = {'name': 'name', 'score_$gt': 1, 'id_$in': [1, 2, 3]}
+
+    results.append(_measure('parse', 'none', lambda idx: parse(dict(obj), columns),
+        rows))
+    results.append(_measure('unparse', 'none',
+        lambda idx: unparse(dict(raw), columns), rows))
+    results.append(_measure('parse_query', 'none',
+        lambda idx: parse_query(columns, query, 10, {'id': 'DESC'}), rows))
+    return results
+
+def run(path, backends=('uncache', 'lru'), rows=1000):
+    '''
+    run the benchmarks on the database of path and return the result dict
+
+    @backends:
+        the cache backend names on lee.bench.BACKENDS
+
+    @rows:
+        the rows insert and the count of the per row benchmarks
+    '''
+    results = _bench_utils(rows * 10)
+    table = None
+    for backend in backends:
+        connect(path, **BACKENDS[backend])
+        if table is None:
+            table = Table(_Bench)
+        results.extend(_bench_table(table, backend, rows))
+
+    return {
+        'path': path,
+        'rows': rows,
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'time': int(time.time()),
+        'results': results,
+    }
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='lee bench')
+    parser.add_argument('-o', '--output', help='the output file of the JSON result')
+    parser.add_argument('--rows', type=int, default=1000, help='the rows to benchmark')
+    parser.add_argument('--backend', action='append', choices=sorted(BACKENDS),
+            help='the cache backend to benchmark, default is all')
+    parser.add_argument('path', help='sqlite://path/to/the/sqlite\nmysql://host:port?user=dbuser&passwd=dbpasswd&db=dbname')
+    args = parser.parse_args(argv)
+
+    result = run(args.path, args.backend or sorted(BACKENDS), args.rows)
+    output = json.dumps(result, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output)
+    else:
+        print(output)
@@ -0,0 +1,132 @@
+from .query import instrument
+from . import cache as mc
+from .utils import logger
+from _thread import RLock
+import threading
+
+__all__ = ['query_budget', 'QueryBudgetExceeded']
+
+class QueryBudgetExceeded(Exception):
+    pass
+
+_local = threading.local()
+_lock = RLock()
+_active = 0
+
+def _budgets():
+    budgets = getattr(_local, 'budgets', None)
+    if budgets is None:
+        budgets = _local.budgets = []
+    return budgets
+
+def _on_query(event):
+    for budget in _budgets():
+        budget.queries += 1
+        fingerprint = event['fingerprint']
+        budget.fingerprints[fingerprint] = budget.fingerprints.get(fingerprint, 0) + 1
+
+def _on_cache(op):
+    for budget in _budgets():
+        budget.cache_calls += 1
+
+def _install():
+    global _active
+    with _lock:
+        if _active == 0:
+            instrument.add_hook(after_execute=_on_query)
+            mc.add_hook(_on_cache)
+        _active += 1
+
+def _uninstall():
+    global _active
+    with _lock:
+        _active -= 1
+        if _active == 0:
+            instrument.remove_hook(after_execute=_on_query)
+            mc.remove_hook(_on_cache)
+
+class query_budget(object):
+    '''
+    count the sql statements and the cache calls issued by the current thread
+    in the scope, and check them on exit.
+
+    eg::
+
+        with lee.query_budget(max_queries=10, max_cache_calls=50,
+                max_repeats=2, raise_error=True) as budget:
+            for item_id in item_ids:
+                Item.find_by_id(item_id)
+
+        print(budget.report())
+
+    @max_queries:
+        the max count of sql statements
+
+    @max_cache_calls:
+        the max count of cache calls
+
+    @max_repeats:
+        the max count of the same sql fingerprint, catch the N+1 query
+
+    @raise_error:
+        raise QueryBudgetExceeded if the budget is exceeded, otherwise log a
+        warning
+    '''
+
+    __slots__ = ['max_queries', 'max_cache_calls', 'max_repeats', 'raise_error',
+            'queries', 'cache_calls', 'fingerprints']
+
+    def __init__(self, max_queries=None, max_cache_calls=None, max_repeats=None,
+            raise_error=False):
+        self.max_queries = max_queries
+        self.max_cache_calls = max_cache_calls
+        self.max_repeats = max_repeats
+        self.raise_error = raise_error
+        self.queries = 0
+        self.cache_calls = 0
+        self.fingerprints = {}
+
+    def __enter__(self):
+        _install()
+        _budgets().append(self)
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        _budgets().remove(self)
+        _uninstall()
+        errors = self.errors()
+        if errors and exc_type is None:
+            message = 'query budget exceeded: {}'.format('; '.join(errors))
+            if self.raise_error:
+                raise QueryBudgetExceeded(message)
+            logger.warning(message)
+
+    def repeated(self):
+        '''the sql fingerprints execute more than once and their count'''
+        return dict((fingerprint, count) for fingerprint, count \
+                in self.fingerprints.items() if count > 1)
+
+    def errors(self):
+        errors = []
+        if self.max_queries is not None and self.queries > self.max_queries:
+            errors.append('{} queries > {}'.format(self.queries,
+                self.max_queries))
+
+        if self.max_cache_calls is not None and \
+                self.cache_calls > self.max_cache_calls:
+            errors.append('{} cache calls > {}'.format(self.cache_calls,
+                self.max_cache_calls))
+
+        if self.max_repeats is not None:
+            for fingerprint, count in self.fingerprints.items():
+                if count > self.max_repeats:
+                    errors.append('{} times > {}: {}'.format(count,
+                        self.max_repeats, fingerprint))
+        return errors
+
+    def report(self):
+        return {
+            'queries': self.queries,
+            'cache_calls': self.cache_calls,
+            'repeated': self.repeated(),
+        }
@@ -1,31 +1,136 @@
-from lee import conf
+from lee import conf, trace
+from lee.utils import to_int
+from time import time
 
-__all__ = ['get', 'set', 'delete', 'incr', 'decr', 'gen_key']
+__all__ = ['get', 'get_multi', 'set', 'set_multi', 'delete', 'incr', 'decr',
+    'stats', 'keys', 'dump_keys', 'gen_key', 'generation', 'bump_generation',
+    'metrics', 'add_hook', 'remove_hook']
+
+_hooks = []
+
+def add_hook(callback):
+    '''register the callback, it is called with the name of every cache call'''
+    _hooks.append(callback)
+
+def remove_hook(callback):
+    if callback in _hooks:
+        _hooks.remove(callback)
+
+def _dispatch(op=None):
+    if op and _hooks:
+        for hook in list(_hooks):
+            hook(op)
 
-def _dispatch():
     if conf.memcached:
         from . import memcache as mc
+    elif conf.shm_cache:
+        from . import shm_cache as mc
     elif conf.lru_cache:
-        from . import lru_cache as mc
+        if conf.cache_policy == 'tinylfu':
+            from . import tinylfu as mc
+        else:
+            from . import lru_cache as mc
     else:
         from . import uncache as mc
     return mc
 
+def _call(op, *args, **kwargs):
+    mc = _dispatch(op)
+    if trace.enabled():
+        with trace.span(op, 'cache'):
+            return getattr(mc, op)(*args, **kwargs)
+    return getattr(mc, op)(*args, **kwargs)
+
 def get(*args, **kwargs):
-    return _dispatch().get(*args, **kwargs)
+    return _call('get', *args, **kwargs)
+
+def get_multi(*args, **kwargs):
+    return _call('get_multi', *args, **kwargs)
 
 def set(*args, **kwargs):
-    return _dispatch().set(*args, **kwargs)
+    return _call('set', *args, **kwargs)
+
+def set_multi(*args, **kwargs):
+    return _call('set_multi', *args, **kwargs)
 
 def delete(*args, **kwargs):
-    return _dispatch().delete(*args, **kwargs)
+    return _call('delete', *args, **kwargs)
 
 def incr(*args, **kwargs):
-    return _dispatch().incr(*args, **kwargs)
+    return _call('incr', *args, **kwargs)
 
 def decr(*args, **kwargs):
-    return _dispatch().decr(*args, **kwargs)
+    return _call('decr', *args, **kwargs)
+
+def stats(*args, **kwargs):
+    return _dispatch().stats(*args, **kwargs)
+
+def keys(*args, **kwargs):
+    return _dispatch().keys(*args, **kwargs)
+
+def dump_keys(path, limit=None):
+    '''
+    write the most recent used keys of the in-process cache to the file, one
+    key per line, also see Table.preload_cache
+    '''
+    count = 0
+    with open(path, 'w') as f:
+        for key in keys(limit):
+            f.write('{}\n'.format(key))
+            count += 1
+    return count
 
 def gen_key(*args):
     args = map(str, args)
     return ':'.join(args)
+
+def _generation_key(namespace):
+    return gen_key(namespace, '__generation__')
+
+# the generations are clock values, a smaller one is the incr of a missing key
+_MIN_GENERATION = 1577836800000
+
+# the generations of memcached cached in process, namespace to (value, expire)
+_generations = {}
+
+def _new_generation():
+    # start from the clock so a lost generation key (eviction, restart)
+    # never falls back to a value that was already used
+    return int(time() * 1000)
+
+def _remember(namespace, val):
+    if conf.memcached and conf.generation_cache_time > 0:
+        _generations[namespace] = (val, time() + conf.generation_cache_time)
+    return val
+
+def generation(namespace):
+    '''
+    get the current generation number of the namespace, the generations of
+    memcached are cached in process for conf.generation_cache_time seconds
+    '''
+    if conf.memcached and conf.generation_cache_time > 0:
+        local = _generations.get(namespace)
+        if local and local[1] > time():
+            return local[0]
+
+    key = _generation_key(namespace)
+    val = get(key)
+    if val is None:
+        val = _new_generation()
+        set(key, val, 0)
+    return _remember(namespace, to_int(val))
+
+def bump_generation(namespace):
+    '''
+    bump the generation number of the namespace by one atomic incr, every key
+    build with the old generation is unreachable after it
+    '''
+    key = _generation_key(namespace)
+    val = to_int(incr(key) or 0)
+    if val < _MIN_GENERATION:
+        # the key is missing, memcached does not create it
+        val = _new_generation()
+        set(key, val, 0)
+    return _remember(namespace, val)
+
+from . import metrics
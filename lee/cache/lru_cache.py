@@ -1,85 +1,131 @@
 from _thread import RLock
+from collections import OrderedDict
 from lee import conf
 from lee.utils import to_int
+from . import metrics
+import pickle
 
-__all__ = ['get', 'set', 'delete', 'incr', 'decr']
+__all__ = ['get', 'get_multi', 'set', 'set_multi', 'delete', 'incr', 'decr',
+    'stats', 'keys', 'clear']
 
-_cache = {}
-full = False
-key_list = []
+# the most recent used key is at the end
+_cache = OrderedDict()
+_sizes = {}
+_bytes = 0
+evictions = 0
 
 lock = RLock()
+
+def clear():
+    '''drop all the keys'''
+    global _bytes, evictions
+    with lock:
+        _cache.clear()
+        _sizes.clear()
+        _bytes = 0
+        evictions = 0
+
+def _serialize():
+    return conf.lru_cache_max_bytes > 0
+
+def _dump(key, val):
+    if _serialize():
+        val = pickle.dumps(val, pickle.HIGHEST_PROTOCOL)
+        return val, len(val) + len(key)
+    return val, 0
+
+def _load(val):
+    if val is not None and _serialize():
+        return pickle.loads(val)
+    return val
+
+def _pop(key):
+    global _bytes
+    _cache.pop(key)
+    _bytes -= _sizes.pop(key, 0)
+
+def _evict():
+    global evictions
+    while _cache:
+        if conf.lru_cache_max > 0 and len(_cache) > conf.lru_cache_max:
+            pass
+        elif _serialize() and _bytes > conf.lru_cache_max_bytes:
+            pass
+        else:
+            break
+        key = next(iter(_cache))
+        _pop(key)
+        evictions += 1
+        if conf.cache_metrics:
+            metrics.record_eviction(key)
+
+def _store(key, val):
+    global _bytes
+    val, size = _dump(key, val)
+    if key in _cache:
+        _pop(key)
+    _cache[key] = val
+    _sizes[key] = size
+    _bytes += size
+    _evict()
+
 def get(key, *args, **kwargs):
-    global _cache, full, key_list, lock
     with lock:
-        if key in key_list:
-            key_list.remove(key)
-            key_list.insert(0, key)
-        return _cache.get(key)
+        if key in _cache:
+            _cache.move_to_end(key)
+            return _load(_cache[key])
+        return None
+
+def get_multi(keys, *args, **kwargs):
+    retval = {}
+    with lock:
+        for key in keys:
+            val = get(key)
+            if val is not None:
+                retval[key] = val
+    return retval
 
 def set(key, val, *args, **kwargs):
-    global _cache, full, key_list, lock
     with lock:
-        if key in key_list:
-            _cache[key] = val
-            key_list.remove(key)
-            key_list.insert(0, key)
-        elif full:
-            old_key = key_list.pop()
-            key_list.insert(0, key)
-            _cache.pop(old_key)
-            _cache[key] = val
-        else:
-            key_list.insert(0, key)
-            _cache[key] = val
-            full = (len(_cache) >= conf.lru_cache_max)
+        _store(key, val)
+
+def set_multi(mapping, *args, **kwargs):
+    for key, val in mapping.items():
+        set(key, val, *args, **kwargs)
+    return []
 
 def delete(key, *args, **kwargs):
-    global _cache, full, key_list, lock
     with lock:
-        if key in key_list:
-            key_list.remove(key)
-            _cache.pop(key)
-            full = (len(_cache) >= conf.lru_cache_max)
+        if key in _cache:
+            _pop(key)
 
 def incr(key, *args, **kwargs):
-    global _cache, full, key_list, lock
     with lock:
-        val = to_int(_cache.get(key, 0))
+        val = to_int(get(key) or 0)
         val += 1
-        if key in key_list:
-            _cache[key] = val
-            key_list.remove(key)
-            key_list.insert(0, key)
-        elif full:
-            old_key = key_list.pop()
-            key_list.insert(0, key)
-            _cache.pop(old_key)
-            _cache[key] = val
-        else:
-            key_list.insert(0, key)
-            _cache[key] = val
-            full = (len(_cache) >= conf.lru_cache_max)
-
-        return _cache.get(key)
+        _store(key, val)
+        return val
 
 def decr(key, *args, **kwargs):
-    global _cache, full, key_list, lock
     with lock:
-        val = to_int(_cache.get(key, 0))
+        val = to_int(get(key) or 0)
         val -= 1
-        if key in key_list:
-            _cache[key] = val
-            key_list.remove(key)
-            key_list.insert(0, key)
-        elif full:
-            old_key = key_list.pop()
-            key_list.insert(0, key)
-            _cache.pop(old_key)
-            _cache[key] = val
-        else:
-            key_list.insert(0, key)
-            _cache[key] = val
-            full = (len(_cache) >= conf.lru_cache_max)
+        _store(key, val)
+        return val
 
-        return _cache.get(key)
+def stats():
+    '''the current bytes, entry count and evictions of the cache'''
+    with lock:
+        return {
+            'bytes': _bytes,
+            'entries': len(_cache),
+            'evictions': evictions,
+        }
+
+def keys(limit=None):
+    '''the keys from the most recent used'''
+    with lock:
+        retval = list(reversed(_cache))
+    if limit:
+        retval = retval[:limit]
+    return retval
@@ -1,9 +1,19 @@
 from lee.conf import memcached
 import memcache
-__all__ = ['get', 'set', 'delete', 'incr', 'decr']
+__all__ = ['get', 'get_multi', 'set', 'set_multi', 'delete', 'incr', 'decr',
+    'stats', 'keys']
 mc = memcache.Client(memcached)
 get = mc.get
+get_multi = mc.get_multi
 set = mc.set
+set_multi = mc.set_multi
 delete = mc.delete
 incr = mc.incr
 decr = mc.decr
+
+def stats():
+    return dict(mc.get_stats())
+
+def keys(limit=None):
+    # memcached can not list the keys
+    return []
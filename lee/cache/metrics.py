@@ -0,0 +1,147 @@
+'''
+per table cache metrics, enable it by lee.connect(..., cache_metrics=True)
+
+the hottest keys are tracked with the space saving heavy hitter algorithm,
+so the memory is bounded by ``conf.cache_metrics_top_k`` per table.
+'''
+from _thread import RLock
+from lee import conf
+import pickle
+
+__all__ = ['record_get', 'record_set', 'record_delete', 'record_eviction',
+    'snapshot', 'reset']
+
+class _TopK(object):
+    '''space saving top-k counter'''
+
+    __slots__ = ['size', 'counts', 'errors']
+
+    def __init__(self, size):
+        self.size = size
+        self.counts = {}
+        self.errors = {}
+
+    def add(self, key):
+        if key in self.counts:
+            self.counts[key] += 1
+        elif len(self.counts) < self.size:
+            self.counts[key] = 1
+            self.errors[key] = 0
+        else:
+            victim = min(self.counts, key=self.counts.get)
+            count = self.counts.pop(victim)
+            self.errors.pop(victim)
+            self.counts[key] = count + 1
+            self.errors[key] = count
+
+    def top(self):
+        keys = sorted(self.counts, key=self.counts.get, reverse=True)
+        return [{'key': key, 'count': self.counts[key], 'error': self.errors[key]}
+                for key in keys]
+
+class _TableMetrics(object):
+
+    __slots__ = ['hits', 'misses', 'sets', 'deletes', 'evictions', 'bytes',
+            'get_time', 'get_max_time', 'top_k']
+
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+        self.sets = 0
+        self.deletes = 0
+        self.evictions = 0
+        self.bytes = 0
+        self.get_time = 0.0
+        self.get_max_time = 0.0
+        self.top_k = _TopK(conf.cache_metrics_top_k)
+
+    def snapshot(self):
+        gets = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_ratio': self.hits / gets if gets else 0.0,
+            'sets': self.sets,
+            'deletes': self.deletes,
+            'evictions': self.evictions,
+            'bytes': self.bytes,
+            'get_avg_time': self.get_time / gets if gets else 0.0,
+            'get_max_time': self.get_max_time,
+            'hot_keys': self.top_k.top(),
+        }
+
+_tables = {}
+lock = RLock()
+
+def _metrics(table_name):
+    metrics = _tables.get(table_name)
+    if metrics is None:
+        metrics = _tables[table_name] = _TableMetrics()
+    return metrics
+
+def record_get(table_name, keys, hits, elapsed):
+    '''
+    record a get or a multi get of the table
+
+    @keys:
+        the list of the primary key values have been get
+
+    @hits:
+        the count of the keys found in cache
+    '''
+    with lock:
+        metrics = _metrics(table_name)
+        metrics.hits += hits
+        metrics.misses += len(keys) - hits
+        metrics.get_time += elapsed
+        metrics.get_max_time = max(metrics.get_max_time, elapsed)
+        for key in keys:
+            metrics.top_k.add(key)
+
+def record_set(table_name, objs):
+    '''record a set or a multi set of the rows of the table'''
+    size = 0
+    for obj in objs:
+        size += len(pickle.dumps(obj, pickle.HIGHEST_PROTOCOL))
+    with lock:
+        metrics = _metrics(table_name)
+        metrics.sets += len(objs)
+        metrics.bytes += size
+
+def record_delete(table_name, count=1):
+    with lock:
+        _metrics(table_name).deletes += count
+
+def record_eviction(key):
+    '''
+    record the key evicted by the in-process or the shared memory cache, the
+    table is the prefix of the key. the evictions of memcached are only in
+    its server stats
+    '''
+    if isinstance(key, bytes):
+        key = key.decode('UTF-8', 'replace')
+    table_name = key.split(':', 1)[0]
+    with lock:
+        _metrics(table_name).evictions += 1
+
+def snapshot(table_name=None):
+    '''
+    the metrics of the table, or of all the tables and the cache backend
+    stats if table_name is None
+    '''
+    with lock:
+        if table_name is not None:
+            return _metrics(table_name).snapshot()
+        tables = dict((name, metrics.snapshot()) \
+                for name, metrics in _tables.items())
+
+    from . import stats
+    return {'tables': tables, 'backend': stats()}
+
+def reset(table_name=None):
+    '''reset the metrics of the table, or all the tables'''
+    with lock:
+        if table_name is None:
+            _tables.clear()
+        else:
+            _tables.pop(table_name, None)
@@ -0,0 +1,80 @@
+'''
+replay a recorded key trace against the in-process cache policies and
+compare the hit ratios.
+
+the trace is a text file with one cache key per line::
+
+    python3 -m lee.cache.replay trace.txt --size 1000
+'''
+from lee import conf
+from . import lru_cache, tinylfu
+import argparse
+
+__all__ = ['POLICIES', 'load_trace', 'replay']
+
+POLICIES = {
+    'lru': lru_cache,
+    'tinylfu': tinylfu,
+}
+
+def load_trace(path):
+    '''read the keys from the trace file'''
+    with open(path) as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                yield line
+
+def replay(keys, policies=('lru', 'tinylfu'), size=128):
+    '''
+    replay the keys on each policy, a miss set the key like a read through
+    cache, return the hit ratio of each policy
+
+    @keys:
+        the list of key
+
+    @policies:
+        the policy names on lee.cache.replay.POLICIES
+
+    @size:
+        the max entries of the cache
+    '''
+    keys = list(keys)
+    old_max, old_max_bytes = conf.lru_cache_max, conf.lru_cache_max_bytes
+    conf.lru_cache_max = size
+    conf.lru_cache_max_bytes = 0
+    retval = {}
+    try:
+        for policy in policies:
+            mc = POLICIES[policy]
+            mc.clear()
+            hits = 0
+            for key in keys:
+                if mc.get(key) is None:
+                    mc.set(key, True)
+                else:
+                    hits += 1
+            retval[policy] = hits / len(keys) if keys else 0.0
+    finally:
+        conf.lru_cache_max, conf.lru_cache_max_bytes = old_max, old_max_bytes
+        # the caches are sized by conf on clear, size them back
+        for policy in policies:
+            POLICIES[policy].clear()
+
+    return retval
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--size', type=int, default=128, help='the max entries of the cache')
+    parser.add_argument('--policy', action='append', choices=sorted(POLICIES),
+            help='the policy to replay, default is all')
+    parser.add_argument('trace', help='the trace file, one key per line')
+    args = parser.parse_args()
+
+    policies = args.policy or sorted(POLICIES)
+    ratios = replay(load_trace(args.trace), policies, args.size)
+    for policy in policies:
+        print('{}: {:.4f}'.format(policy, ratios[policy]))
+
+if __name__ == '__main__':
+    main()
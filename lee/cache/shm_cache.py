@@ -0,0 +1,286 @@
+'''
+cross-process cache on a memory mapped file.
+
+all the processes on a host that map the same file share one cache, the
+file is a fixed size hash table: every key hash to a bucket of
+``BUCKET_WAYS`` slots, a full bucket drop its oldest written slot.
+every bucket belongs to a lock stripe, the stripe is locked by a thread lock
+for the threads of a process and a fcntl record lock for the other processes.
+the values are pickled and must fit in one slot.
+'''
+from _thread import allocate_lock
+from lee import conf
+from lee.utils import to_int
+from . import metrics
+import hashlib
+import fcntl
+import mmap
+import os
+import pickle
+import struct
+import time
+
+__all__ = ['get', 'get_multi', 'set', 'set_multi', 'delete', 'incr', 'decr',
+    'stats', 'keys', 'clear', 'close', 'path']
+
+MAGIC = b'LEEC'
+FILE_HEADER = struct.Struct('<4sII') # magic, slot count, slot size
+DATA_OFFSET = 64
+# used, key hash, expire at, written at, key length, value length
+SLOT_HEADER = struct.Struct('<BQIIHI')
+BUCKET_WAYS = 8
+LOCK_STRIPES = 64
+
+_mm = None
+_fd = None
+_path = None
+_slots = 0
+_slot_size = 0
+_thread_locks = [allocate_lock() for _ in range(LOCK_STRIPES)]
+_open_lock = allocate_lock()
+
+def _open():
+    global _mm, _fd, _path, _slots, _slot_size
+    with _open_lock:
+        if _mm is not None:
+            return
+
+        path = conf.shm_cache_path
+        slot_size = conf.shm_cache_slot_size
+        slots = (conf.shm_cache_size - DATA_OFFSET) // slot_size
+        slots -= slots % BUCKET_WAYS
+        if slots < BUCKET_WAYS:
+            raise ValueError('shm_cache_size is too small')
+        size = DATA_OFFSET + slots * slot_size
+        header = FILE_HEADER.pack(MAGIC, slots, slot_size)
+
+        base_path = os.path.dirname(path)
+        if base_path and not os.path.exists(base_path):
+            os.makedirs(base_path)
+
+        fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+        # the byte 0 lock guard the initialize of the file
+        fcntl.lockf(fd, fcntl.LOCK_EX, 1, 0)
+        try:
+            file_size = os.fstat(fd).st_size
+            old = os.pread(fd, FILE_HEADER.size, 0)
+            if file_size == 0 or (file_size == size and not old.strip(b'\0')):
+                # a new file, or one never initialized, nobody use it yet
+                os.ftruncate(fd, size)
+                os.pwrite(fd, header, 0)
+            elif file_size != size or old != header:
+                # the other processes may have mapped it, never resize it
+                raise ValueError('the shm cache {} has an other size or slot size, '
+                        'use an other path or remove it'.format(path))
+        except:
+            fcntl.lockf(fd, fcntl.LOCK_UN, 1, 0)
+            os.close(fd)
+            raise
+        fcntl.lockf(fd, fcntl.LOCK_UN, 1, 0)
+
+        _mm = mmap.mmap(fd, size)
+        _fd = fd
+        _path = path
+        _slots = slots
+        _slot_size = slot_size
+
+def close():
+    '''unmap the shared cache of this process, the file is kept'''
+    global _mm, _fd, _path
+    with _open_lock:
+        if _mm is None:
+            return
+        _mm.close()
+        os.close(_fd)
+        _mm = _fd = _path = None
+
+def path():
+    '''the path of the mapped file, None if not opened'''
+    return _path
+
+class _stripe(object):
+    __slots__ = ['index']
+
+    def __init__(self, bucket):
+        self.index = bucket % LOCK_STRIPES
+
+    def __enter__(self):
+        _thread_locks[self.index].acquire()
+        try:
+            fcntl.lockf(_fd, fcntl.LOCK_EX, 1, self.index + 1)
+        except:
+            _thread_locks[self.index].release()
+            raise
+
+    def __exit__(self, *args):
+        fcntl.lockf(_fd, fcntl.LOCK_UN, 1, self.index + 1)
+        _thread_locks[self.index].release()
+
+def _hash(key):
+    digest = hashlib.blake2b(key, digest_size=8).digest()
+    return struct.unpack('<Q', digest)[0] or 1
+
+def _locate(key):
+    if _mm is None:
+        _open()
+    key = key.encode('UTF-8') if isinstance(key, str) else key
+    h = _hash(key)
+    bucket = h % (_slots // BUCKET_WAYS)
+    return key, h, bucket
+
+def _slot_offset(bucket, way):
+    return DATA_OFFSET + (bucket * BUCKET_WAYS + way) * _slot_size
+
+def _read_header(offset):
+    return SLOT_HEADER.unpack_from(_mm, offset)
+
+def _find(key, h, bucket, now):
+    for way in range(BUCKET_WAYS):
+        offset = _slot_offset(bucket, way)
+        used, slot_hash, expire, _, key_len, val_len = _read_header(offset)
+        if not used or slot_hash != h:
+            continue
+        start = offset + SLOT_HEADER.size
+        if _mm[start:start + key_len] != key:
+            continue
+        if expire and expire < now:
+            _mm[offset] = 0
+            return None, None
+        return offset, start + key_len
+    return None, None
+
+def _get(key, h, bucket):
+    offset, start = _find(key, h, bucket, int(time.time()))
+    if offset is None:
+        return None
+    val_len = _read_header(offset)[5]
+    return pickle.loads(_mm[start:start + val_len])
+
+def _set(key, h, bucket, val, timeout=0):
+    data = pickle.dumps(val, pickle.HIGHEST_PROTOCOL)
+    now = int(time.time())
+    offset, _ = _find(key, h, bucket, now)
+    if SLOT_HEADER.size + len(key) + len(data) > _slot_size:
+        # drop the old value as memcached does, it is never read stale
+        if offset is not None:
+            _mm[offset] = 0
+        return False
+
+    if offset is None:
+        victim = None
+        for way in range(BUCKET_WAYS):
+            slot = _slot_offset(bucket, way)
+            used, _, expire, written, _, _ = _read_header(slot)
+            if not used or (expire and expire < now):
+                offset = slot
+                break
+            if victim is None or written < victim[0]:
+                victim = (written, slot)
+        if offset is None:
+            offset = victim[1]
+            if conf.cache_metrics:
+                _, _, _, _, key_len, _ = _read_header(offset)
+                start = offset + SLOT_HEADER.size
+                metrics.record_eviction(_mm[start:start + key_len])
+
+    expire = 0
+    if timeout:
+        expire = now + int(timeout)
+
+    SLOT_HEADER.pack_into(_mm, offset, 1, h, expire, now, len(key), len(data))
+    start = offset + SLOT_HEADER.size
+    _mm[start:start + len(key)] = key
+    _mm[start + len(key):start + len(key) + len(data)] = data
+    return True
+
+def get(key, *args, **kwargs):
+    key, h, bucket = _locate(key)
+    with _stripe(bucket):
+        return _get(key, h, bucket)
+
+def get_multi(keys, *args, **kwargs):
+    retval = {}
+    for key in keys:
+        val = get(key)
+        if val is not None:
+            retval[key] = val
+    return retval
+
+def set(key, val, timeout=0, *args, **kwargs):
+    key, h, bucket = _locate(key)
+    with _stripe(bucket):
+        return _set(key, h, bucket, val, timeout)
+
+def set_multi(mapping, *args, **kwargs):
+    for key, val in mapping.items():
+        set(key, val, *args, **kwargs)
+    return []
+
+def delete(key, *args, **kwargs):
+    key, h, bucket = _locate(key)
+    with _stripe(bucket):
+        offset, _ = _find(key, h, bucket, int(time.time()))
+        if offset is not None:
+            _mm[offset] = 0
+
+def _incr(key, delta):
+    key, h, bucket = _locate(key)
+    with _stripe(bucket):
+        val = to_int(_get(key, h, bucket) or 0) + delta
+        _set(key, h, bucket, val)
+        return val
+
+def incr(key, delta=1, *args, **kwargs):
+    return _incr(key, delta)
+
+def decr(key, delta=1, *args, **kwargs):
+    return _incr(key, -delta)
+
+def stats():
+    '''the used slots and the size of the shared cache'''
+    if _mm is None:
+        _open()
+    entries = 0
+    for idx in range(_slots):
+        if _mm[DATA_OFFSET + idx * _slot_size]:
+            entries += 1
+    return {
+        'bytes': len(_mm),
+        'entries': entries,
+        'slots': _slots,
+    }
+
+def clear():
+    '''drop all the keys of the shared cache'''
+    if _mm is None:
+        _open()
+    for stripe in range(LOCK_STRIPES):
+        _thread_locks[stripe].acquire()
+        fcntl.lockf(_fd, fcntl.LOCK_EX, 1, stripe + 1)
+    try:
+        for idx in range(_slots):
+            _mm[DATA_OFFSET + idx * _slot_size] = 0
+    finally:
+        for stripe in range(LOCK_STRIPES):
+            fcntl.lockf(_fd, fcntl.LOCK_UN, 1, stripe + 1)
+            _thread_locks[stripe].release()
+
+def keys(limit=None):
+    '''the keys from the most recent written'''
+    if _mm is None:
+        _open()
+    retval = []
+    for bucket in range(_slots // BUCKET_WAYS):
+        # a slot is only consistent under the lock of its stripe
+        with _stripe(bucket):
+            for way in range(BUCKET_WAYS):
+                offset = _slot_offset(bucket, way)
+                used, _, _, written, key_len, _ = _read_header(offset)
+                if used:
+                    start = offset + SLOT_HEADER.size
+                    key = _mm[start:start + key_len]
+                    retval.append((written, key.decode('UTF-8', 'replace')))
+    retval = [key for _, key in sorted(retval, reverse=True)]
+    if limit:
+        retval = retval[:limit]
+    return retval
@@ -0,0 +1,199 @@
+'''
+W-TinyLFU in-process cache.
+
+New keys enter a small LRU window, when the window overflows its oldest key
+must have a higher estimated frequency than the oldest key of the main
+segment to be admitted, so one pass over many cold keys can not flush the
+hot keys. The main segment is a segmented LRU (probation and protected).
+'''
+from _thread import RLock
+from collections import OrderedDict
+from lee import conf
+from lee.utils import to_int
+from . import metrics
+import random
+
+__all__ = ['get', 'get_multi', 'set', 'set_multi', 'delete', 'incr', 'decr',
+    'stats', 'keys', 'clear']
+
+class _Sketch(object):
+    '''count-min sketch with 4 bit counters and periodic aging'''
+
+    __slots__ = ['width', 'table', 'seeds', 'additions', 'sample_size']
+
+    def __init__(self, size):
+        width = 16
+        while width < size:
+            width *= 2
+        self.width = width
+        self.table = [bytearray(width) for _ in range(4)]
+        self.seeds = [random.getrandbits(32) | 1 for _ in range(4)]
+        self.additions = 0
+        self.sample_size = 10 * size
+
+    def _indexes(self, key):
+        h = hash(key)
+        return [((h ^ seed) * 0x9E3779B1 >> 7) % self.width \
+                for seed in self.seeds]
+
+    def frequency(self, key):
+        return min(row[idx] for row, idx in zip(self.table, self._indexes(key)))
+
+    def increment(self, key):
+        added = False
+        for row, idx in zip(self.table, self._indexes(key)):
+            if row[idx] < 15:
+                row[idx] += 1
+                added = True
+
+        if added:
+            self.additions += 1
+            if self.additions >= self.sample_size:
+                self._reset()
+
+    def _reset(self):
+        for row in self.table:
+            for idx in range(self.width):
+                row[idx] >>= 1
+        self.additions //= 2
+
+_window = OrderedDict()
+_probation = OrderedDict()
+_protected = OrderedDict()
+_sketch = None
+_window_max = 1
+_protected_max = 1
+_main_max = 1
+evictions = 0
+
+lock = RLock()
+
+def clear():
+    '''drop all the keys and reset the sizes from conf.lru_cache_max'''
+    global _sketch, _window_max, _protected_max, _main_max, evictions
+    with lock:
+        size = max(conf.lru_cache_max, 2)
+        _window.clear()
+        _probation.clear()
+        _protected.clear()
+        _window_max = max(size // 100, 1)
+        _main_max = size - _window_max
+        _protected_max = max(_main_max * 8 // 10, 1)
+        _sketch = _Sketch(size)
+        evictions = 0
+
+def _segment(key):
+    for segment in (_window, _probation, _protected):
+        if key in segment:
+            return segment
+    return None
+
+def _evict_window():
+    global evictions
+    while len(_window) > _window_max:
+        key, val = _window.popitem(last=False)
+        if len(_probation) + len(_protected) < _main_max:
+            _probation[key] = val
+            continue
+
+        if not _probation:
+            # every main key is protected, compete with the protected victim
+            victim_key, victim_val = _protected.popitem(last=False)
+            _probation[victim_key] = victim_val
+
+        victim = next(iter(_probation))
+        if _sketch.frequency(key) > _sketch.frequency(victim):
+            _probation.pop(victim)
+            _probation[key] = val
+            key = victim
+        evictions += 1
+        if conf.cache_metrics:
+            metrics.record_eviction(key)
+
+def _promote(key):
+    val = _probation.pop(key)
+    _protected[key] = val
+    while len(_protected) > _protected_max:
+        old_key, old_val = _protected.popitem(last=False)
+        _probation[old_key] = old_val
+
+def get(key, *args, **kwargs):
+    with lock:
+        if _sketch is None:
+            clear()
+        _sketch.increment(key)
+        segment = _segment(key)
+        if segment is None:
+            return None
+
+        if segment is _probation:
+            val = _probation[key]
+            _promote(key)
+            return val
+
+        segment.move_to_end(key)
+        return segment[key]
+
+def get_multi(keys, *args, **kwargs):
+    retval = {}
+    with lock:
+        for key in keys:
+            val = get(key)
+            if val is not None:
+                retval[key] = val
+    return retval
+
+def set(key, val, *args, **kwargs):
+    with lock:
+        if _sketch is None:
+            clear()
+        segment = _segment(key)
+        if segment is not None:
+            segment[key] = val
+            segment.move_to_end(key)
+            return
+
+        _window[key] = val
+        _evict_window()
+
+def set_multi(mapping, *args, **kwargs):
+    for key, val in mapping.items():
+        set(key, val, *args, **kwargs)
+    return []
+
+def delete(key, *args, **kwargs):
+    with lock:
+        segment = _segment(key)
+        if segment is not None:
+            segment.pop(key)
+
+def incr(key, *args, **kwargs):
+    with lock:
+        val = to_int(get(key) or 0) + 1
+        set(key, val)
+        return val
+
+def decr(key, *args, **kwargs):
+    with lock:
+        val = to_int(get(key) or 0) - 1
+        set(key, val)
+        return val
+
+def stats():
+    '''the entry count and rejected or evicted keys of the cache'''
+    with lock:
+        return {
+            'bytes': 0,
+            'entries': len(_window) + len(_probation) + len(_protected),
+            'evictions': evictions,
+        }
+
+def keys(limit=None):
+    '''the keys from the most valuable, protected, probation then window'''
+    with lock:
+        retval = []
+        for segment in (_protected, _probation, _window):
+            retval.extend(reversed(segment))
+    if limit:
+        retval = retval[:limit]
+    return retval
@@ -1,11 +1,18 @@
-__all__ = ['get', 'set', 'delete', 'incr', 'decr']
+__all__ = ['get', 'get_multi', 'set', 'set_multi', 'delete', 'incr', 'decr',
+    'stats', 'keys']
 
 def get(key, *args, **kwargs):
         return None
 
+def get_multi(keys, *args, **kwargs):
+    return {}
+
 def set(key, val, *args, **kwargs):
     pass
 
+def set_multi(mapping, *args, **kwargs):
+    return []
+
 def delete(key, *args, **kwargs):
     pass
 
@@ -14,3 +21,9 @@ def incr(key, *args, **kwargs):
 
 def decr(key, *args, **kwargs):
     return 0
+
+def stats():
+    return {}
+
+def keys(limit=None):
+    return []
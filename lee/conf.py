@@ -1,11 +1,34 @@
 memcached = False # list for the memcached host
 cache_timeout = 0
+generation_cache_time = 0 # the seconds the cache generations of memcached are kept in process, 0 is never
 lru_cache = False # if use lru_cache set it true
 lru_cache_max = 128
+lru_cache_max_bytes = 0 # if set the lru_cache store pickled values in the budget
+cache_policy = 'lru' # the in-process cache policy: lru or tinylfu
+shm_cache = False # if use the cross-process shared memory cache set it true
+shm_cache_path = None # set by lee.connect, /dev/shm/lee_cache_ and the hash of the DSN
+shm_cache_size = 64 * 1024 * 1024
+shm_cache_slot_size = 1024
 is_cache = False
+cache_metrics = False # if count the cache metrics per table set it true
+cache_metrics_top_k = 20 # the count of hot keys tracked per table
 
 path = ':memory:' # the path
 
 use_mysql = False
 
+query_stats = False # if count the latency histograms per sql set it true
+slow_query_time = 0 # log the query slower than it (seconds)
+index_advisor = False # if record the query shapes for lee.advisor set it true
+
+lazy_schema = False # if create the tables on the first query set it true
+schema_cache = None # the file of the schema fingerprints, skip the unchanged schemas
+
 mysql = {}
+
+shards = [] # the parsed DSNs of the shards, see lee.shard
+shard_vnodes = 64
+
+replicas = [] # the parsed DSNs of the read replicas, see lee.replica
+replica_sticky_time = 1 # the reads stay on the primary after a write (seconds)
+replica_retry_time = 30 # skip the replica failed the health check (seconds)
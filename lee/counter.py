@@ -0,0 +1,215 @@
+'''
+the counters of the tables.
+
+the batched increments of Table.incr(..., batch=True) are folded in process
+and written by one UPDATE per row and column every Model.incr_interval
+seconds, the pending increments are flushed at exit or by
+lee.counter.flush().
+
+the sharded counter spread the increments of a hot counter on N rows of the
+lee_counter table, the value is the sum of the rows::
+
+    views = lee.counter.ShardedCounter('views', shards=16)
+    views.incr()
+    views.value()
+
+the rows of a counter are found by the name, so the shard count can be
+changed online by resize, the values of the removed shards are moved to the
+first shard in one transaction.
+'''
+from . import cache as mc, conf
+from .models import Model
+from .utils import logger
+from _thread import RLock
+import atexit
+import random
+import threading
+import time
+
+__all__ = ['Accumulator', 'accumulator', 'flush', 'ShardedCounter']
+
+_accumulators = {}
+_lock = RLock()
+
+class Accumulator(object):
+    '''fold the increments of a table'''
+
+    __slots__ = ['table', 'interval', 'pending', 'lock', 'thread']
+
+    def __init__(self, table):
+        self.table = table
+        self.interval = table._model.incr_interval
+        self.pending = {}
+        self.lock = RLock()
+        self.thread = threading.Thread(target=self._run, daemon=True,
+                name='lee-counter-{}'.format(table._model.table_name))
+        self.thread.start()
+
+    def add(self, pk, column, delta):
+        with self.lock:
+            key = (pk, column)
+            self.pending[key] = self.pending.get(key, 0) + delta
+
+    def flush(self):
+        with self.lock:
+            pending, self.pending = self.pending, {}
+
+        for (pk, column), delta in pending.items():
+            if not delta:
+                continue
+            try:
+                if self.table.incr(pk, column, delta) is None:
+                    logger.error('%s %s of %s dropped: no row',
+                            self.table._model.table_name, column, pk)
+            except Exception as e:
+                logger.exception(e)
+
+    def _run(self):
+        while True:
+            time.sleep(self.interval)
+            self.flush()
+
+def accumulator(table):
+    '''the accumulator of the table, start it on the first use'''
+    acc = _accumulators.get(table._model.table_name)
+    if acc is None:
+        with _lock:
+            acc = _accumulators.get(table._model.table_name)
+            if acc is None:
+                acc = _accumulators[table._model.table_name] = Accumulator(table)
+    return acc
+
+def flush():
+    '''write all the pending increments'''
+    for acc in list(_accumulators.values()):
+        acc.flush()
+
+atexit.register(flush)
+
+class _Counter(Model):
+    table_name = 'lee_counter'
+    auto_cache = False
+    columns = [
+        {'name': 'id',    'type': 'str', 'primary': True, 'length': 80},
+        {'name': 'name',  'type': 'str', 'length': 64, 'index': True},
+        {'name': 'value', 'type': 'int', 'default': 0},
+    ]
+
+_table = None
+
+def _get_table():
+    global _table
+    if _table is None:
+        from .table import Table
+        with _lock:
+            if _table is None:
+                _table = Table(_Counter)
+    return _table
+
+class ShardedCounter(object):
+    '''
+    the counter on shards rows of the lee_counter table
+
+    @shards:
+        the count of the rows, the write throughput scales with it
+
+    @affinity:
+        random pick a random row for every increment, thread always use the
+        row of the current thread
+
+    @cache_timeout:
+        the seconds the sum is cached by lee.cache, 0 is not cached
+    '''
+
+    __slots__ = ['name', 'shards', 'affinity', 'cache_timeout']
+
+    def __init__(self, name, shards=16, affinity='random', cache_timeout=1):
+        self.name = name
+        self.shards = shards
+        self.affinity = affinity
+        self.cache_timeout = cache_timeout
+
+    def _row_id(self, idx):
+        return '{}:{}'.format(self.name, idx)
+
+    def _pick(self):
+        if self.affinity == 'thread':
+            return threading.get_ident() % self.shards
+        return random.randrange(self.shards)
+
+    def incr(self, delta=1):
+        table = _get_table()
+        row_id = self._row_id(self._pick())
+        if table.incr(row_id, 'value', delta) is None:
+            try:
+                table.save({'id': row_id, 'name': self.name, 'value': 0})
+            except Exception as e:
+                # created by the other writer at the same time
+                logger.debug('create counter row %s: %s', row_id, e)
+            table.incr(row_id, 'value', delta)
+
+    def decr(self, delta=1):
+        self.incr(-delta)
+
+    def _cache_key(self):
+        return mc.gen_key('lee_counter', 'sum', self.name)
+
+    def value(self):
+        '''the sum of the rows, cached for cache_timeout seconds'''
+        use_cache = conf.is_cache and self.cache_timeout
+        if use_cache:
+            cached = mc.get(self._cache_key())
+            # the lru cache has no timeout, check the age of the value
+            if cached and cached['at'] + self.cache_timeout > time.time():
+                return cached['value']
+
+        ret = _get_table().find_one({'name': self.name}, 'sum(`value`) AS `total`',
+                cache=False)
+        total = (ret['total'] if ret else 0) or 0
+        if use_cache:
+            mc.set(self._cache_key(), {'value': total, 'at': time.time()},
+                    self.cache_timeout)
+        return total
+
+    def resize(self, shards):
+        '''
+        change the shard count online, the values of the removed rows are
+        added to the first row
+        '''
+        from .query import query
+
+        table = _get_table()
+        removed = [self._row_id(idx) for idx in range(shards, self.shards)]
+        self.shards = shards
+        if not removed:
+            return
+
+        table.save({'id': self._row_id(0), 'name': self.name})
+        marks = ', '.join(['?'] * len(removed))
+
+        @query(autocommit=True)
+        def _merge(cur):
+            # lock the first row before the sum, the removed rows are locked by
+            # FOR UPDATE on MySQL, by the write lock of the database on sqlite
+            first = (self._row_id(0), )
+            sql = 'UPDATE `lee_counter` SET `value` = `value` WHERE `id` = ?'
+            logger.debug('Query> SQL: %s | ARGS: %s', sql, first)
+            cur.execute(sql, first)
+
+            sql = 'SELECT SUM(`value`) AS `total` FROM `lee_counter` WHERE `id` IN ({}){}'.format(
+                    marks, ' FOR UPDATE' if conf.use_mysql else '')
+            logger.debug('Query> SQL: %s | ARGS: %s', sql, tuple(removed))
+            cur.execute(sql, tuple(removed))
+            ret = cur.fetchone()
+            total = (ret['total'] if ret else 0) or 0
+
+            sql = 'UPDATE `lee_counter` SET `value` = `value` + ? WHERE `id` = ?'
+            args = (total, ) + first
+            logger.debug('Query> SQL: %s | ARGS: %s', sql, args)
+            cur.execute(sql, args)
+            sql = 'DELETE FROM `lee_counter` WHERE `id` IN ({})'.format(marks)
+            logger.debug('Query> SQL: %s | ARGS: %s', sql, tuple(removed))
+            cur.execute(sql, tuple(removed))
+
+        _merge()
+        _get_table()._invalidate_queries()
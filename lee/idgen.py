@@ -0,0 +1,163 @@
+'''
+the block allocating hi/lo id generator, every block of block_size ids is
+reserved by one atomic statement on the lee_sequence table, then the ids are
+handed out in process::
+
+    user_ids = lee.idgen.IdGenerator('user', block_size=1000)
+    user_id = user_ids.next()
+
+the ids are unique over the processes but only ordered in one process, the
+ids of a block not used before the exit are lost.
+
+with snowflake=True the ids are time ordered and generated in process, the
+bits of the 63 bits id are::
+
+    | 41 bits milliseconds since EPOCH | 10 bits worker id | 12 bits sequence |
+
+the sequence counts the ids of the same millisecond, the generator waits for
+the next millisecond after 4096 ids. the worker id must be unique over the
+processes generating the ids of the name at the same time, by default it is
+reserved from the lee_sequence table (the sequence name:worker modulo 1024)::
+
+    event_ids = lee.idgen.IdGenerator('event', snowflake=True)
+    event_ids = lee.idgen.IdGenerator('event', snowflake=True, worker_id=7)
+'''
+from . import conf
+from .models import Model
+from .utils import logger
+from _thread import RLock
+import sqlite3
+import time
+
+__all__ = ['IdGenerator', 'reserve', 'EPOCH', 'WORKER_BITS', 'SEQUENCE_BITS']
+
+EPOCH = 1577836800000 # 2020-01-01 in milliseconds
+WORKER_BITS = 10
+SEQUENCE_BITS = 12
+
+class _Sequence(Model):
+    table_name = 'lee_sequence'
+    auto_cache = False
+    columns = [
+        {'name': 'name',    'type': 'str', 'primary': True, 'length': 64},
+        {'name': 'last_id', 'type': 'int', 'default': 0},
+    ]
+
+_table = None
+_lock = RLock()
+
+def _get_table():
+    global _table
+    if _table is None:
+        from .table import Table
+        with _lock:
+            if _table is None:
+                _table = Table(_Sequence)
+    return _table
+
+def reserve(name, size):
+    '''reserve size ids of the sequence name, return the last id of the block'''
+    from .query import query
+    _get_table()
+
+    @query(autocommit=True)
+    def _reserve(cur):
+        args = (name, size)
+        if conf.use_mysql:
+            # the LAST_INSERT_ID(expr) of the update is the lastrowid, it is 0
+            # if the row is inserted
+            sql = 'INSERT INTO `lee_sequence` (`name`, `last_id`) VALUES (?, ?) ' \
+                    'ON DUPLICATE KEY UPDATE `last_id` = LAST_INSERT_ID(`last_id` + VALUES(`last_id`))'
+            logger.debug('Query> SQL: %s | ARGS: %s', sql, args)
+            cur.execute(sql, args)
+            return cur.lastrowid or size
+
+        if sqlite3.sqlite_version_info >= (3, 35, 0):
+            sql = 'INSERT INTO `lee_sequence` (`name`, `last_id`) VALUES (?, ?) ' \
+                    'ON CONFLICT(`name`) DO UPDATE SET `last_id` = `last_id` + excluded.`last_id` ' \
+                    'RETURNING `last_id`'
+            logger.debug('Query> SQL: %s | ARGS: %s', sql, args)
+            cur.execute(sql, args)
+            return cur.fetchone()['last_id']
+
+        # the old sqlite has no RETURNING, the update locks the database
+        sql = 'INSERT OR IGNORE INTO `lee_sequence` (`name`, `last_id`) VALUES (?, 0)'
+        cur.execute(sql, (name, ))
+        sql = 'UPDATE `lee_sequence` SET `last_id` = `last_id` + ? WHERE `name` = ?'
+        cur.execute(sql, (size, name))
+        cur.execute('SELECT `last_id` FROM `lee_sequence` WHERE `name` = ?', (name, ))
+        return cur.fetchone()['last_id']
+
+    return _reserve()
+
+class IdGenerator(object):
+    '''
+    the thread safe id generator of the sequence name
+
+    @block_size:
+        the ids reserved by one statement
+
+    @snowflake:
+        generate the time ordered ids
+
+    @worker_id:
+        the worker id of the snowflake ids, 0 to 1023, default is reserved
+        from the lee_sequence table
+    '''
+
+    __slots__ = ['name', 'block_size', 'snowflake', 'worker_id', '_next',
+            '_last', '_last_ms', '_sequence', '_lock']
+
+    def __init__(self, name, block_size=1000, snowflake=False, worker_id=None):
+        if worker_id is not None and not 0 <= worker_id < (1 << WORKER_BITS):
+            raise ValueError('the worker id {} is not in [0, {})'.format(
+                worker_id, 1 << WORKER_BITS))
+        self.name = name
+        self.block_size = block_size
+        self.snowflake = snowflake
+        self.worker_id = worker_id
+        self._next = 1
+        self._last = 0
+        self._last_ms = 0
+        self._sequence = 0
+        self._lock = RLock()
+
+    def _seq(self):
+        if self._next > self._last:
+            last = reserve(self.name, self.block_size)
+            self._next = last - self.block_size + 1
+            self._last = last
+        seq = self._next
+        self._next += 1
+        return seq
+
+    def _snowflake(self):
+        if self.worker_id is None:
+            self.worker_id = reserve(self.name + ':worker', 1) % (1 << WORKER_BITS)
+
+        # never go back if the clock does
+        now = max(int(time.time() * 1000) - EPOCH, self._last_ms)
+        if now == self._last_ms:
+            self._sequence = (self._sequence + 1) & ((1 << SEQUENCE_BITS) - 1)
+            if self._sequence == 0:
+                # the sequence of the millisecond is exhausted
+                while now <= self._last_ms:
+                    time.sleep(0.0001)
+                    now = int(time.time() * 1000) - EPOCH
+        else:
+            self._sequence = 0
+        self._last_ms = now
+        return (now << (WORKER_BITS + SEQUENCE_BITS)) | \
+                (self.worker_id << SEQUENCE_BITS) | self._sequence
+
+    def next(self):
+        with self._lock:
+            if self.snowflake:
+                return self._snowflake()
+            return self._seq()
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        return self.next()
@@ -8,9 +8,18 @@ class Model(object):
     columns = []
     auto_cache = True
     cache_timeout = 0
+    query_cache = False
+    cache_hydrate = False
     auto_create_table = True
     spec_index = ()
     spec_uniq = ()
+    sharded = False
+    shard_key = None # the function of the primary key tuple return the shard index
+    write_behind = False # if save by the background writer set it true, see lee.writer
+    write_behind_batch = 500
+    write_behind_interval = 1
+    write_behind_max = 10000
+    incr_interval = 1 # the seconds between the writes of the batched Table.incr
     __slots__ = ['_table', '__dict__', '_changed']
 
     def __init__(self, table, payload = {}):
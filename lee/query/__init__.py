@@ -1,6 +1,8 @@
-from lee import conf
+from lee import conf, trace, schema, replica, shard
+from .instrument import add_hook, remove_hook, query_stats, reset_query_stats
 
-__all__ = ['query', 'create_table', 'show_tables', 'diff_table', 'desc_table']
+__all__ = ['query', 'create_table', 'create_tables', 'show_tables', 'diff_table', 'desc_table',
+    'explain', 'gen_index_sql', 'add_hook', 'remove_hook', 'query_stats', 'reset_query_stats']
 
 def _dispatch():
     if conf.use_mysql:
@@ -19,16 +21,40 @@ class query(object):
         self.autocommit = autocommit
         self.keyword = keyword
 
+    def _call(self, callback, args, kwargs):
+        if trace.enabled():
+            with trace.span(callback.__name__, 'query'):
+                return _dispatch().query(self.keyword, self.autocommit)\
+                        (callback)(*args, **kwargs)
+
+        return _dispatch().query(self.keyword, self.autocommit)\
+                (callback)(*args, **kwargs)
+
     def __call__(self, callback):
         def wrapper(*args, **kwargs):
-            return _dispatch().query(self.keyword, self.autocommit)\
-                    (callback)(*args, **kwargs)
+            if schema._pending:
+                schema.flush()
+
+            if conf.replicas and shard.current() is None:
+                if self.autocommit:
+                    try:
+                        return self._call(callback, args, kwargs)
+                    finally:
+                        replica.wrote()
+                return replica.run(lambda: self._call(callback, args, kwargs),
+                        query)
+
+            return self._call(callback, args, kwargs)
 
         return wrapper
 
 def create_table(table_name, columns, spec_index=(), spec_uniq=()):
     return _dispatch().create_table(table_name, columns, spec_index, spec_uniq)
 
+def create_tables(tables):
+    '''create the tables of [(table_name, columns, spec_index, spec_uniq)] in one transaction'''
+    return _dispatch().create_tables(tables)
+
 def show_tables():
     return _dispatch().show_tables()
 
@@ -37,3 +63,9 @@ def diff_table(table_name, columns, spec_index=(), spec_uniq=()):
 
 def desc_table(table_name):
     return _dispatch().desc_table(table_name)
+
+def explain(sql, args=()):
+    return _dispatch().explain(sql, args)
+
+def gen_index_sql(table_name, idx):
+    return _dispatch().gen_index_sql(table_name, idx)
@@ -0,0 +1,215 @@
+'''
+query instrumentation.
+
+when a hook is registered, or conf.query_stats or conf.slow_query_time is set,
+the cursor passed to the query wrappers is an instrumented cursor, every
+execute emit an event::
+
+    {
+        'sql': the sql,
+        'args': the args,
+        'fingerprint': the sql with the literals replaced by ?,
+        'table': the first table name of the sql,
+        'operation': SELECT, INSERT, UPDATE, DELETE ...,
+        'rows': the affected or fetched rows,
+        'elapsed': the seconds spent on execute and fetch,
+    }
+
+the before_execute hooks get the event without rows and elapsed.
+'''
+from _thread import RLock
+from lee import conf
+from lee.utils import logger
+import re
+import time
+
+__all__ = ['add_hook', 'remove_hook', 'enabled', 'fingerprint', 'Cursor',
+    'query_stats', 'reset_query_stats']
+
+BUCKETS = (0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1, 5)
+
+_before_hooks = []
+_after_hooks = []
+_stats = {}
+lock = RLock()
+
+_re_string = re.compile(r"'(?:[^']|'')*'|\"(?:[^\"]|\"\")*\"")
+_re_number = re.compile(r'\b\d+(?:\.\d+)?\b')
+_re_in = re.compile(r'\(\s*\?(?:\s*,\s*\?)*\s*\)')
+_re_or = re.compile(r'(\(`[^()]+\)(?: OR \(`[^()]+\))+)')
+_re_space = re.compile(r'\s+')
+_re_table = re.compile(r'\b(?:FROM|INTO|UPDATE|TABLE(?:\s+IF\s+NOT\s+EXISTS)?|ON)'
+        r'\s+`?(\w+)`?', re.I)
+
+def add_hook(before_execute=None, after_execute=None):
+    '''
+    register the callbacks, each one is called with the event dict
+
+    @before_execute:
+        called before the sql is execute
+
+    @after_execute:
+        called after the sql is execute and the rows are fetched
+    '''
+    with lock:
+        if before_execute:
+            _before_hooks.append(before_execute)
+        if after_execute:
+            _after_hooks.append(after_execute)
+
+def remove_hook(before_execute=None, after_execute=None):
+    '''unregister the callbacks register by add_hook'''
+    with lock:
+        if before_execute in _before_hooks:
+            _before_hooks.remove(before_execute)
+        if after_execute in _after_hooks:
+            _after_hooks.remove(after_execute)
+
+def enabled():
+    return bool(_before_hooks or _after_hooks or conf.query_stats or \
+            conf.slow_query_time > 0)
+
+def fingerprint(sql):
+    '''
+    >>> fingerprint('SELECT * FROM `a` WHERE `id` IN (?, ?, ?) AND `v` = "x" LIMIT 10')
+    'SELECT * FROM `a` WHERE `id` IN (...) AND `v` = ? LIMIT ?'
+    '''
+    sql = _re_string.sub('?', sql)
+    sql = _re_number.sub('?', sql)
+    sql = _re_in.sub('(...)', sql)
+    sql = _re_or.sub('(...)', sql)
+    return _re_space.sub(' ', sql).strip()
+
+def _parse(sql):
+    operation = sql.lstrip().split(' ', 1)[0].upper()
+    table = _re_table.search(sql)
+    if table:
+        table = table.group(1)
+    return operation, table
+
+def _call(hooks, event):
+    for hook in list(hooks):
+        try:
+            hook(event)
+        except Exception as e:
+            logger.exception(e)
+
+def _record(event):
+    elapsed = event['elapsed']
+    if conf.slow_query_time > 0 and elapsed >= conf.slow_query_time:
+        logger.warning('Slow query> %.6fs SQL: %s | ARGS: %s', elapsed,
+                event['sql'], event['args'])
+
+    if conf.query_stats:
+        with lock:
+            stat = _stats.get(event['fingerprint'])
+            if stat is None:
+                stat = _stats[event['fingerprint']] = {
+                    'table': event['table'],
+                    'operation': event['operation'],
+                    'count': 0,
+                    'rows': 0,
+                    'total_time': 0.0,
+                    'max_time': 0.0,
+                    'buckets': [0] * (len(BUCKETS) + 1),
+                }
+            stat['count'] += 1
+            stat['rows'] += event['rows']
+            stat['total_time'] += elapsed
+            stat['max_time'] = max(stat['max_time'], elapsed)
+            idx = 0
+            while idx < len(BUCKETS) and elapsed > BUCKETS[idx]:
+                idx += 1
+            stat['buckets'][idx] += 1
+
+    _call(_after_hooks, event)
+
+def query_stats():
+    '''
+    the latency histograms per sql fingerprint, the buckets are the counts of
+    the elapsed time under each of BUCKETS seconds and over the last one
+    '''
+    with lock:
+        retval = {}
+        for key, stat in _stats.items():
+            stat = dict(stat, buckets=list(stat['buckets']))
+            stat['avg_time'] = stat['total_time'] / stat['count']
+            retval[key] = stat
+        return retval
+
+def reset_query_stats():
+    with lock:
+        _stats.clear()
+
+class Cursor(object):
+    '''the instrumented cursor proxy'''
+
+    __slots__ = ['_cur', '_event']
+
+    def __init__(self, cur):
+        self._cur = cur
+        self._event = None
+
+    def __getattr__(self, key):
+        return getattr(self._cur, key)
+
+    def __iter__(self):
+        return iter(self.fetchall())
+
+    def execute(self, sql, args=(), *others, **kwargs):
+        self.finish()
+        operation, table = _parse(sql)
+        event = {
+            'sql': sql,
+            'args': args,
+            'fingerprint': fingerprint(sql),
+            'table': table,
+            'operation': operation,
+        }
+        if _before_hooks:
+            _call(_before_hooks, event)
+
+        start = time.perf_counter()
+        try:
+            return self._cur.execute(sql, args, *others, **kwargs)
+        finally:
+            event['elapsed'] = time.perf_counter() - start
+            rowcount = getattr(self._cur, 'rowcount', -1)
+            if operation == 'SELECT' or not rowcount or rowcount < 0:
+                rowcount = 0
+            event['rows'] = rowcount
+            self._event = event
+
+    def _fetch(self, method, *args):
+        start = time.perf_counter()
+        rets = getattr(self._cur, method)(*args)
+        if self._event is not None:
+            self._event['elapsed'] += time.perf_counter() - start
+        return rets
+
+    def fetchone(self):
+        ret = self._fetch('fetchone')
+        if ret is not None and self._event is not None:
+            self._event['rows'] += 1
+        return ret
+
+    def fetchmany(self, *args):
+        rets = self._fetch('fetchmany', *args)
+        if self._event is not None:
+            self._event['rows'] += len(rets)
+        if not rets:
+            self.finish()
+        return rets
+
+    def fetchall(self):
+        rets = self._fetch('fetchall')
+        if self._event is not None:
+            self._event['rows'] += len(rets)
+        self.finish()
+        return rets
+
+    def finish(self):
+        '''emit the event of the last execute'''
+        event, self._event = self._event, None
+        if event is not None:
+            _record(event)
@@ -1,8 +1,12 @@
 import oursql
-from lee.conf import mysql as _mysql
-from lee.utils import logger
+from lee.utils import logger, normalize_index
+from lee import trace, shard, replica
+from . import instrument
 
-__all__ = ['query', 'create_table', 'show_tables', 'diff_table', 'desc_table']
+import threading
+
+__all__ = ['query', 'create_table', 'create_tables', 'show_tables', 'diff_table', 'desc_table',
+    'explain', 'gen_index_sql']
 
 map_mysql_types = {
     'str': 'VARCHAR',
@@ -16,11 +20,14 @@ map_mysql_types = {
     'float': 'FLOAT'
 }
 
-MYSQL_CONN=None
+# every thread has its own connection of every database
+_local = threading.local()
 def _get_conn(conn=None):
-    global MYSQL_CONN
-    if MYSQL_CONN and not conn:
-        conn = MYSQL_CONN
+    conns = getattr(_local, 'conns', None)
+    if conns is None:
+        conns = _local.conns = {}
+    if not conn:
+        conn = conns.get(shard.key())
 
     if conn:
         try:
@@ -30,6 +37,7 @@ def _get_conn(conn=None):
             conn = None
 
     if conn is None:
+        _mysql = shard.mysql()
         conn = oursql.connect(
                     host = _mysql.get('host', 'localhost'),
                     port = _mysql.get('port', 3306),
@@ -39,7 +47,7 @@ def _get_conn(conn=None):
                     default_cursor = oursql.DictCursor,
                     use_unicode = True
                 )
-        MYSQL_CONN = conn
+        conns[shard.key()] = conn
     return conn
 
 class query:
@@ -61,6 +69,8 @@ class query:
 
                 conn = _get_conn()
                 cur = conn.cursor()
+                if instrument.enabled():
+                    cur = instrument.Cursor(cur)
 
                 # Add the connection handle as a keyword argument.
                 kwargs[self.keyword] = cur
@@ -71,12 +81,23 @@ class query:
             try:
                 rv = callback(*args, **kwargs)
                 if self.autocommit:
-                    conn.commit()
+                    if trace.enabled():
+                        with trace.span('commit', 'commit'):
+                            conn.commit()
+                    else:
+                        conn.commit()
+                cur = kwargs[self.keyword]
+                if isinstance(cur, instrument.Cursor) and rv is not cur:
+                    cur.finish()
             except oursql.IntegrityError as e:
                 logger.exception(e)
                 conn.rollback()
                 #raise e
             except oursql.OperationalError as e:
+                # lee.replica runs the health check and the read on the
+                # primary if the replica is down
+                if replica.current() is not None:
+                    raise
                 logger.exception(e)
                 #raise e
             except oursql.CollatedWarningsError as e:
@@ -139,9 +160,50 @@ def desc_table(table_name, cur):
 
     return columns
 
+@query()
+def _index_list(table_name, cur):
+    cur.execute('SHOW INDEX FROM `{}`'.format(table_name))
+    indexes = {}
+    for ret in cur.fetchall():
+        idx = indexes.setdefault(ret['Key_name'], {
+            'unique': not ret['Non_unique'],
+            'columns': [],
+        })
+        idx['columns'].append((ret['Seq_in_index'], ret['Column_name'],
+            'DESC' if ret['Collation'] == 'D' else 'ASC'))
+
+    for idx in indexes.values():
+        idx['columns'] = [col[1:] for col in sorted(idx['columns'])]
+    return indexes
+
+def _gen_keys(idx):
+    '''the key part of idx, the include columns are append to the key'''
+    keys = ['`{}`{}'.format(column, ' DESC' if direction == 'DESC' else '') \
+            for column, direction in idx['columns']]
+    keys.extend(['`{}`'.format(column) for column in idx['include']])
+    if idx['where']:
+        logger.warning('partial index is unsupported by MySQL, ignore the where of %s',
+                idx['name'])
+    return ', '.join(keys)
+
+def _diff_spec_index(table_name, spec_index, spec_uniq):
+    old_indexes = _index_list(table_name) or {}
+    sql = []
+    specs = [(idx, True) for idx in spec_uniq] + [(idx, False) for idx in spec_index]
+    for idx, unique in specs:
+        idx = normalize_index(idx)
+        old_idx = old_indexes.get(idx['name'])
+        if old_idx:
+            cols = idx['columns'] + [(col, 'ASC') for col in idx['include']]
+            if old_idx['columns'] == cols and old_idx['unique'] == unique:
+                continue
+            sql.append('ALTER TABLE `{}` DROP INDEX `{}`;'.format(table_name, idx['name']))
+        sql.append(gen_index_sql(table_name, idx, unique))
+    return sql
+
 def diff_table(table_name, columns, spec_index, spec_uniq):
     '''
-    diff the column change
+    diff the column change and the spec_index, spec_uniq change
     '''
     old_columns = desc_table(table_name)
     old_columns = dict(map(lambda x: (x['name'], x), old_columns))
@@ -238,6 +300,8 @@ def diff_table(table_name, columns, spec_index, spec_uniq):
             else:
                 sql.append('ALTER TABLE `{}` ADD  INDEX `{}` (`{}`);'.format(table_name, column['name'], column['name']))
 
+    sql.extend(_diff_spec_index(table_name, spec_index, spec_uniq))
+
     return sql
 
 def gen_opts(column):
@@ -309,27 +373,61 @@ def gen_create_table_sql(table_name, columns, spec_index, spec_uniq):
     uniqs = list(map(lambda x: '`{}`'.format(x['name']), uniqs))
     index = list(map(lambda x: '`{}`'.format(x['name']), index))
     column_sql.append('PRIMARY KEY ({})'.format(', '.join(primarys)))
-    spec_uniq_names = list(map(lambda x: x[1], spec_uniq))
-    spec_index_names = list(map(lambda x: x[1], spec_index))
+    spec_uniq = list(map(normalize_index, spec_uniq))
+    spec_index = list(map(normalize_index, spec_index))
+    spec_uniq_names = list(map(lambda x: x['columns'][0][0], spec_uniq))
+    spec_index_names = list(map(lambda x: x['columns'][0][0], spec_index))
     for uniq in uniqs:
         if uniq[1:-1] not in spec_uniq_names:
             column_sql.append('UNIQUE KEY {} ({})'.format(uniq, uniq))
 
     for uniq in spec_uniq:
-        column_sql.append('UNIQUE KEY `{}` (`{}`)'.format(uniq[0], '`, `'.join(uniq[1:])))
+        column_sql.append('UNIQUE KEY `{}` ({})'.format(uniq['name'], _gen_keys(uniq)))
 
     for idx in index:
         if idx[1:-1] not in spec_index_names:
             column_sql.append('KEY {} ({})'.format(idx, idx))
 
     for idx in spec_index:
-        column_sql.append('KEY `{}` (`{}`)'.format(idx[0], '`, `'.join(idx[1:])))
+        column_sql.append('KEY `{}` ({})'.format(idx['name'], _gen_keys(idx)))
 
     return 'CREATE TABLE IF NOT EXISTS `{}` ({})'.format(\
             table_name, ', '.join(column_sql)) +\
             ' ENGINE=InnoDB DEFAULT CHARSET=utf8;'
+
+def gen_index_sql(table_name, idx, unique=False):
+    '''
+    the sql to create the spec_index (or spec_uniq if unique) entry idx, also
+    see lee.utils.normalize_index
+    '''
+    idx = normalize_index(idx)
+    return 'ALTER TABLE `{}` ADD {}INDEX `{}` ({});'.format(table_name,
+            'UNIQUE ' if unique else '', idx['name'], _gen_keys(idx))
+
+@query()
+def explain(sql, args, cur):
+    '''
+    explain the sql, return the plan and if it is a full table scan or a
+    filesort
+    '''
+    cur.execute('EXPLAIN ' + sql, args)
+    plan = cur.fetchall()
+    return {
+        'plan': plan,
+        'full_scan': any(ret.get('type') == 'ALL' for ret in plan),
+        'filesort': any('filesort' in (ret.get('Extra') or '') for ret in plan),
+    }
+
 @query(autocommit=True)
 def create_table(table_name, columns, spec_index, spec_uniq, cur):
     sql = gen_create_table_sql(table_name, columns, spec_index, spec_uniq)
-    logger.debug('Query> SQL: {}'.format(sql))
+    logger.debug('Query> SQL: %s', sql)
     cur.execute(sql)
+
+@query(autocommit=True)
+def create_tables(tables, cur):
+    # the DDL of MySQL always commit implicitly, only share the connection
+    for table_name, columns, spec_index, spec_uniq in tables:
+        sql = gen_create_table_sql(table_name, columns, spec_index, spec_uniq)
+        logger.debug('Query> SQL: %s', sql)
+        cur.execute(sql)
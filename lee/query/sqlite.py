@@ -1,10 +1,14 @@
 import sqlite3 as sqlite
-from lee import conf
-from lee.utils import logger
+from lee import trace, shard
+from lee.utils import logger, normalize_index
+from . import instrument
 
 import atexit
+import re
+import threading
 
-__all__ = ['query', 'create_table', 'show_tables', 'diff_table', 'desc_table']
+__all__ = ['query', 'create_table', 'create_tables', 'show_tables', 'diff_table', 'desc_table',
+    'explain', 'gen_index_sql']
 
 map_sqlite_types = {
     'str': 'TEXT',
@@ -29,22 +33,46 @@ def dict_factory(cursor, row):
     return retval
 
 
+# every thread has its own connection of every database, except the
+# in-memory database which can not be shared by connections
 SQLITE_CONN=None
+_local = threading.local()
+def _is_memory():
+    return shard.path() in ('', ':memory:')
+
+def _conns():
+    conns = getattr(_local, 'conns', None)
+    if conns is None:
+        conns = _local.conns = {}
+    return conns
+
 def _get_conn(conn=None):
     global SQLITE_CONN
-    if SQLITE_CONN and not conn:
-        conn = SQLITE_CONN
+    if not conn:
+        if _is_memory():
+            conn = SQLITE_CONN
+        else:
+            conn = _conns().get(shard.path())
 
     if conn is None:
-        conn = sqlite.connect(conf.path)
+        conn = sqlite.connect(shard.path(), check_same_thread=not _is_memory())
 
         conn.row_factory = dict_factory
 
-        SQLITE_CONN = conn
-        atexit.register(SQLITE_CONN.close)
+        if _is_memory():
+            SQLITE_CONN = conn
+        else:
+            _conns()[shard.path()] = conn
+        if threading.current_thread() is threading.main_thread():
+            atexit.register(conn.close)
 
     return conn
 
+def _reset_conn():
+    global SQLITE_CONN
+    SQLITE_CONN = None
+    _conns().pop(shard.path(), None)
+
 class query:
     __slots__ = ['autocommit', 'keyword']
     def __init__(self, keyword='cur', autocommit=False):
@@ -63,15 +91,22 @@ class query:
                 try:
                     conn = _get_conn()
                     cur = conn.cursor()
+                    if instrument.enabled():
+                        cur = instrument.Cursor(cur)
                     kws[self.keyword] = cur
                     ret = fn(*args, **kws)
                     if self.autocommit:
-                        conn.commit()
+                        if trace.enabled():
+                            with trace.span('commit', 'commit'):
+                                conn.commit()
+                        else:
+                            conn.commit()
+                    if isinstance(cur, instrument.Cursor) and ret is not cur:
+                        cur.finish()
                     return ret
                 except sqlite.ProgrammingError as e:
                     if e.args[0].find('closed') > -1:
-                        global SQLITE_CONN
-                        SQLITE_CONN = None
+                        _reset_conn()
                         err_count += 1
                     else:
                         break
@@ -88,49 +123,93 @@ def show_tables(cur):
 
 @query()
 def desc_table(table_name, cur):
-    cur.execute('select `type`, `name`, `sql` from `sqlite_master` where `tbl_name` = ?', (table_name, ))
+    cur.execute('PRAGMA table_info(`{}`)'.format(table_name))
     cols = cur.fetchall()
+    # {'cid': 0, 'name': 'id', 'type': 'INTEGER', 'notnull': 1, 'dflt_value': None, 'pk': 1}
     columns = {}
     for col in cols:
-        if not col['sql']:
+        column = {'name': col['name']}
+        if col['type']:
+            column['type'] = col['type']
+        if col['pk']:
+            column['primary'] = True
+        columns[col['name']] = column
+
+    cur.execute('PRAGMA index_list(`{}`)'.format(table_name))
+    for idx in cur.fetchall():
+        if idx['origin'] == 'pk':
             continue
-        start = col['sql'].find('(') + 1
-        end = col['sql'].find(')')
-        fields = col['sql'][start:end].replace('`', '').replace('"', '').replace("'", "")
-        fields = [field.strip() for field in fields.split(',') if field.strip()]
-        if col['type'] == 'table':
-            for field in fields:
-                column = {}
-                field_list = [f for f in field.split(' ') if f]
-                column['name'] = field_list[0]
-
-                if len(field_list) >= 2:
-                    column['type'] = field_list[1]
-
-                field = field.lower()
-                if field.find('unique') > -1:
-                    column['unique'] = True
-
-                if field.find('primary') > -1:
-                    column['primary'] = True
-                if column['name'] not in columns.keys():
-                    columns[column['name']] = {}
-
-                columns[column['name']].update(column)
-        else:
-            column = {}
-            column['name'] = fields[0]
+        cur.execute('PRAGMA index_info(`{}`)'.format(idx['name']))
+        fields = cur.fetchall()
+        if not fields or fields[0]['name'] not in columns:
+            continue
+        column = columns[fields[0]['name']]
+        # the unique constraint of the column, or the index create by lee
+        if idx['origin'] == 'u' and len(fields) == 1:
+            column['unique'] = True
+        elif idx['origin'] == 'c':
             column['index'] = True
-
-            if column['name'] not in columns.keys():
-                columns[column['name']] = {}
-
-            columns[column['name']].update(column)
     return list(columns.values())
 
+@query()
+def _index_list(table_name, cur):
+    cur.execute('PRAGMA index_list(`{}`)'.format(table_name))
+    rets = cur.fetchall()
+    indexes = {}
+    for ret in rets:
+        if ret['origin'] != 'c':
+            continue
+        cur.execute('PRAGMA index_xinfo(`{}`)'.format(ret['name']))
+        cols = [(col['name'], 'DESC' if col['desc'] else 'ASC') \
+                for col in cur.fetchall() if col['key']]
+        cur.execute('select `sql` from `sqlite_master` where `type` = "index" and `name` = ?',
+                (ret['name'], ))
+        sql = cur.fetchone()
+        where = _re_where.search(sql['sql'] or '') if sql else None
+        indexes[ret['name']] = {
+            'unique': bool(ret['unique']),
+            'columns': cols,
+            'where': where.group(1) if where else None,
+        }
+    return indexes
+
+_re_where = re.compile(r'\)\s+where\s+(.+)$', re.I | re.S)
+
+def _normalize_where(where):
+    if not where:
+        return None
+    return ' '.join(where.replace('`', '').replace('"', '').split()).lower()
+
+def _index_name(table_name, idx, unique=False):
+    return '{}_{}_{}'.format(table_name, idx['name'],
+            'unique_index' if unique else 'index')
+
+def _gen_indexes(table_name, columns, spec_index, spec_uniq):
+    '''the (index name, normalized idx, unique) of all the index of the table'''
+    primarys = [column for column in columns if column.get('primary')]
+    indexes = []
+    for column in columns:
+        if column.get('primary'):
+            if len(primarys) > 1 and not column.get('unique'):
+                indexes.append((column['name'], column['name']))
+        elif column.get('index') and not column.get('unique'):
+            indexes.append((column['name'], column['name']))
+
+    retval = []
+    for idx in indexes:
+        idx = normalize_index(idx)
+        retval.append((_index_name(table_name, idx), idx, False))
+    for idx in spec_uniq:
+        idx = normalize_index(idx)
+        retval.append((_index_name(table_name, idx, True), idx, True))
+    for idx in spec_index:
+        idx = normalize_index(idx)
+        retval.append((_index_name(table_name, idx), idx, False))
+    return retval
+
 def diff_table(table_name, columns, spec_index, spec_uniq):
     '''
-    only diff the column change unsupport index
+    diff the new columns and the index change, the columns are never drop
     '''
     old_columns = desc_table(table_name)
     fields = list(map(lambda x: x['name'], old_columns))
@@ -148,6 +227,22 @@ def diff_table(table_name, columns, spec_index, spec_uniq):
     # for column in drop_columns:
     #     sql.append('ALTER TABLE `{}` DROP COLUMN `{}`;'.format(table_name, column['name']))
 
+    old_indexes = _index_list(table_name) or {}
+    for name, idx, unique in _gen_indexes(table_name, columns, spec_index, spec_uniq):
+        old_idx = old_indexes.pop(name, None)
+        if old_idx:
+            cols = idx['columns'] + [(col, 'ASC') for col in idx['include']]
+            if old_idx['columns'] == cols and old_idx['unique'] == unique and \
+                    _normalize_where(old_idx['where']) == _normalize_where(idx['where']):
+                continue
+            sql.append('DROP INDEX IF EXISTS `{}`;'.format(name))
+        sql.append(gen_index_sql(table_name, idx, unique) + ';')
+
+    # only drop the index named by lee
+    for name in old_indexes.keys():
+        if name.startswith(table_name + '_') and name.endswith('_index'):
+            sql.append('DROP INDEX IF EXISTS `{}`;'.format(name))
+
     return sql
 
 def gen_opts(column):
@@ -178,7 +273,6 @@ def gen_opts(column):
 def gen_create_table_sql(table_name, columns, spec_index, spec_uniq):
     primarys = []
     column_sql = []
-    index = []
 
     for column in columns:
         if column.get('primary'):
@@ -186,8 +280,6 @@ def gen_create_table_sql(table_name, columns, spec_index, spec_uniq):
         else:
             opts = gen_opts(column)
             column_sql.append('`{}` {}'.format(column['name'], opts))
-            if column.get('index') and not column.get('unique'):
-                index.append(column)
 
     if primarys:
         if len(primarys) == 1:
@@ -212,29 +304,64 @@ def gen_create_table_sql(table_name, columns, spec_index, spec_uniq):
                 if not column.get('unique'):
                     opts = gen_opts(column)
                     column_sql.append('`{}` {}'.format(column['name'], opts))
-                    index.append(column)
     sql = ['create table if not exists `{}` ({})'.format(table_name,
             ', '.join(column_sql))]
 
-    for column in index:
-        sql.append('create index if not exists' + \
-                ' {0}_{1}_index on `{0}`(`{1}`)'.format(\
-                    table_name, column['name']))
-
-    for uniq in spec_uniq:
-        sql.append('create index if not exists' + \
-                ' {0}_{1}_unique_index on `{0}`(`{2}`)'.format(\
-                table_name, uniq[0], '`, `'.join(uniq[1:])))
+    for _, idx, unique in _gen_indexes(table_name, columns, spec_index, spec_uniq):
+        sql.append(gen_index_sql(table_name, idx, unique))
 
-    for idx in spec_index:
-        sql.append('create index if not exists' + \
-                ' {0}_{1}_index on `{0}`(`{2}`)'.format(\
-                table_name, idx[0], '`, `'.join(idx[1:])))
+    return sql
 
+def gen_index_sql(table_name, idx, unique=False):
+    '''
+    the sql to create the spec_index (or spec_uniq if unique) entry idx, also
+    see lee.utils.normalize_index
+    '''
+    idx = normalize_index(idx)
+    keys = ['`{}`{}'.format(column, ' DESC' if direction == 'DESC' else '') \
+            for column, direction in idx['columns']]
+    keys.extend(['`{}`'.format(column) for column in idx['include']])
+    sql = 'create {}index if not exists {} on `{}`({})'.format(\
+            'unique ' if unique else '', _index_name(table_name, idx, unique),
+            table_name, ', '.join(keys))
+    if idx['where']:
+        sql += ' where {}'.format(idx['where'])
     return sql
 
+_re_full_scan = re.compile(r'^SCAN (TABLE )?`?\w+`?( AS \w+)?$')
+
+@query()
+def explain(sql, args, cur):
+    '''
+    explain the sql, return the plan and if it is a full table scan or need a
+    temp b-tree to sort (filesort)
+    '''
+    cur.execute('EXPLAIN QUERY PLAN ' + sql, args)
+    plan = [ret['detail'] for ret in cur.fetchall()]
+    return {
+        'plan': plan,
+        'full_scan': any(_re_full_scan.match(detail) for detail in plan),
+        'filesort': any(detail.startswith('USE TEMP B-TREE') for detail in plan),
+    }
+
 @query(autocommit=True)
 def create_table(table_name, columns, spec_index, spec_uniq, cur):
     for sql in gen_create_table_sql(table_name, columns, spec_index, spec_uniq):
-        logger.debug('Query> SQL: {}'.format(sql))
+        logger.debug('Query> SQL: %s', sql)
         cur.execute(sql)
+
+@query(autocommit=True)
+def create_tables(tables, cur):
+    # one transaction to sync the database file once, a savepoint so a
+    # transaction already open on the connection is kept
+    cur.execute('SAVEPOINT lee_schema')
+    try:
+        for table_name, columns, spec_index, spec_uniq in tables:
+            for sql in gen_create_table_sql(table_name, columns, spec_index, spec_uniq):
+                logger.debug('Query> SQL: %s', sql)
+                cur.execute(sql)
+    except Exception:
+        cur.execute('ROLLBACK TO SAVEPOINT lee_schema')
+        cur.execute('RELEASE SAVEPOINT lee_schema')
+        raise
+    cur.execute('RELEASE SAVEPOINT lee_schema')
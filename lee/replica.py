@@ -0,0 +1,191 @@
+'''
+the read replicas of the default database::
+
+    lee.connect('mysql://primary:3306?user=u&passwd=p&db=app',
+            replicas=['mysql://replica1:3306?user=u&passwd=p&db=app',
+                      'mysql://replica2:3306?user=u&passwd=p&db=app'],
+            replica_sticky_time=2)
+
+the read only query wrappers (not autocommit) run on the replicas by round
+robin, the writes and all the queries of Table.save run on the primary.
+
+after a write the reads of the same session stay on the primary for
+replica_sticky_time seconds, so the handlers read their own writes. the
+session is the current thread, or the block of::
+
+    with lee.replica.session():
+        ...
+
+which also follows the calls of lee.aio on the thread pool.
+
+a replica failed the health check (SELECT 1) is skipped for
+replica_retry_time seconds, the read is retried on the primary.
+
+the rows read from a replica may be behind the primary, so they are cached
+for replica_sticky_time at most by memcached and shm_cache, and not by the
+in-process caches which have no timeout.
+'''
+from . import conf
+from .utils import logger
+from _thread import RLock
+import contextvars
+import itertools
+import math
+import threading
+import time
+
+__all__ = ['configure', 'current', 'using', 'primary', 'session', 'wrote',
+    'choose', 'mark_down', 'is_down', 'run', 'cache_timeout']
+
+_local = threading.local()
+_session = contextvars.ContextVar('lee_replica_session', default=None)
+_counter = itertools.count()
+_down = {}
+_lock = RLock()
+
+def configure(replicas, sticky_time=1, retry_time=30):
+    '''set the replicas, call by lee.connect'''
+    from .shard import parse_dsn
+    conf.replicas = [parse_dsn(dsn) for dsn in replicas or []]
+    conf.replica_sticky_time = sticky_time
+    conf.replica_retry_time = retry_time
+    with _lock:
+        _down.clear()
+
+def current():
+    '''the index of the replica of the current query, None is the primary'''
+    return getattr(_local, 'replica', None)
+
+class using(object):
+    '''run the block on the replica of index'''
+
+    __slots__ = ['index', 'old']
+
+    def __init__(self, index):
+        self.index = index
+        self.old = None
+
+    def __enter__(self):
+        self.old = current()
+        _local.replica = self.index
+        return self
+
+    def __exit__(self, *args):
+        _local.replica = self.old
+
+class primary(object):
+    '''run all the queries of the block on the primary'''
+
+    __slots__ = []
+
+    def __enter__(self):
+        _local.primary = getattr(_local, 'primary', 0) + 1
+        return self
+
+    def __exit__(self, *args):
+        _local.primary -= 1
+
+class session(object):
+    '''the scope of the read your writes, default is the thread'''
+
+    __slots__ = ['state', 'token']
+
+    def __init__(self):
+        self.state = {'last_write': 0}
+        self.token = None
+
+    def __enter__(self):
+        self.token = _session.set(self.state)
+        return self
+
+    def __exit__(self, *args):
+        _session.reset(self.token)
+
+def _state():
+    state = _session.get()
+    if state is None:
+        state = getattr(_local, 'state', None)
+        if state is None:
+            state = _local.state = {'last_write': 0}
+    return state
+
+def wrote():
+    '''record a write of the session'''
+    if conf.replicas:
+        _state()['last_write'] = time.time()
+
+def _readable():
+    if getattr(_local, 'primary', 0):
+        return False
+    return time.time() - _state()['last_write'] >= conf.replica_sticky_time
+
+def cache_timeout(timeout):
+    '''the cache timeout of the rows read now, None if they are not cached'''
+    from .shard import current as shard_current
+    if current() is None and (not conf.replicas or \
+            shard_current() is not None or not _readable()):
+        return timeout
+    if not conf.memcached and not conf.shm_cache:
+        return None
+    sticky = max(math.ceil(conf.replica_sticky_time), 1)
+    if timeout and timeout < sticky:
+        return timeout
+    return sticky
+
+def is_down(idx):
+    until = _down.get(idx)
+    if until is None:
+        return False
+    if until < time.time():
+        with _lock:
+            _down.pop(idx, None)
+        return False
+    return True
+
+def mark_down(idx):
+    with _lock:
+        _down[idx] = time.time() + conf.replica_retry_time
+
+def choose():
+    '''the index of the next healthy replica by round robin, or None'''
+    count = len(conf.replicas)
+    start = next(_counter)
+    for offset in range(count):
+        idx = (start + offset) % count
+        if not is_down(idx):
+            return idx
+    return None
+
+def _check(idx, query):
+    @query()
+    def _ping(cur):
+        cur.execute('SELECT 1')
+        return cur.fetchall()
+
+    try:
+        with using(idx):
+            return _ping() is not None
+    except Exception:
+        return False
+
+def run(call, query):
+    '''
+    run the read only call on a replica if there is one available, the call
+    run on the primary if the replica failed the health check
+    '''
+    if not conf.replicas or current() is not None or not _readable():
+        return call()
+
+    idx = choose()
+    if idx is None:
+        return call()
+
+    try:
+        with using(idx):
+            return call()
+    except Exception as e:
+        if _check(idx, query):
+            raise
+        logger.warning('replica %s is down: %s', idx, e)
+        mark_down(idx)
+    return call()
@@ -0,0 +1,264 @@
+'''
+the scatter-gather of the sharded tables, the queries without a shard (see
+lee.shard.using) run on all the shards at the same time on a bounded thread
+pool, so the latency is the one of the slowest shard.
+
+the rows are merged by a k-way merge on the order, every shard only returns
+offset + limit rows. the aggregates count, sum, min, max and avg (by sum and
+count) of the column are combined, with the group by the group columns.
+'''
+from concurrent.futures import ThreadPoolExecutor
+from _thread import RLock
+from . import shard
+import functools
+import heapq
+import os
+import re
+
+__all__ = ['gather', 'merge', 'sort', 'parse_limit', 'parse_order', 'rewrite_column',
+    'add_order_columns', 'combine']
+
+_executor = None
+_lock = RLock()
+_re_agg = re.compile(r'^(count|sum|min|max|avg)\s*\((.*)\)(?:\s+as\s+`?(\w+)`?)?$',
+        re.I | re.S)
+_re_alias = re.compile(r'\s+as\s+`?(\w+)`?$', re.I)
+
+def _get_executor():
+    global _executor
+    if _executor is None:
+        with _lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(min(32, (os.cpu_count() or 1) * 4),
+                        thread_name_prefix='lee-scatter')
+    return _executor
+
+def _on_shard(idx, func, args, kwargs):
+    with shard.using(idx):
+        return func(*args, **kwargs)
+
+def gather(func, *args, **kwargs):
+    '''run func on every shard at the same time, return the results by shard'''
+    futures = [_get_executor().submit(_on_shard, idx, func, args, kwargs) \
+            for idx in range(shard.count())]
+    return [future.result() for future in futures]
+
+def parse_limit(limit):
+    '''
+    the (offset, count) of the limit of parse_query, count is None if no limit
+
+    >>> parse_limit('')
+    (0, None)
+    >>> parse_limit(10)
+    (0, 10)
+    >>> parse_limit('20, 10')
+    (20, 10)
+    '''
+    limit = str(limit or '').strip()
+    if limit.lower().startswith('limit'):
+        limit = limit[5:]
+    if not limit:
+        return 0, None
+    parts = [int(part) for part in limit.split(',')]
+    if len(parts) == 2:
+        return parts[0], parts[1]
+    return 0, parts[0]
+
+def parse_order(order):
+    '''
+    the [(column, desc)] of the order of parse_query
+
+    >>> parse_order({'id': 'DESC'})
+    [('id', True)]
+    >>> parse_order(['a', 'b'])
+    [('a', False), ('b', False)]
+    '''
+    if not order:
+        return []
+    if isinstance(order, dict):
+        order = list(order.items())
+    elif not isinstance(order, list):
+        return [(order, False)]
+    retval = []
+    for item in order:
+        if isinstance(item, (list, tuple)):
+            retval.append((item[0], str(item[1]).upper() == 'DESC'))
+        else:
+            retval.append((item, False))
+    return retval
+
+@functools.total_ordering
+class _Key(object):
+    '''compare the rows like the database, the NULL is the smallest'''
+
+    __slots__ = ['values', 'desc']
+
+    def __init__(self, values, desc):
+        self.values = values
+        self.desc = desc
+
+    def __eq__(self, other):
+        return self.values == other.values
+
+    def __lt__(self, other):
+        for val, other_val, desc in zip(self.values, other.values, self.desc):
+            if val == other_val:
+                continue
+            if val is None:
+                less = True
+            elif other_val is None:
+                less = False
+            else:
+                less = val < other_val
+            return less != desc
+        return False
+
+def _sort_key(order):
+    columns = [column for column, _ in order]
+    desc = [desc for _, desc in order]
+    return lambda row: _Key([row.get(column) for column in columns], desc)
+
+def merge(results, order=None, limit=''):
+    '''merge the sorted rows of every shard, then apply the limit'''
+    order = parse_order(order)
+    offset, count = parse_limit(limit)
+    if order:
+        rows = heapq.merge(*results, key=_sort_key(order))
+    else:
+        rows = (row for rets in results for row in rets)
+
+    retval = []
+    for idx, row in enumerate(rows):
+        if idx < offset:
+            continue
+        if count is not None and len(retval) >= count:
+            break
+        retval.append(row)
+    return retval
+
+def sort(rows, order=None, limit=''):
+    '''sort the rows then apply the limit'''
+    if order:
+        order = parse_order(order)
+        for name, _ in order:
+            if rows and name not in rows[0]:
+                raise ValueError('the order column {} is not in the columns'.format(name))
+        rows = sorted(rows, key=_sort_key(order))
+    return merge([rows], order, limit)
+
+def _split_columns(column):
+    '''split the column on the commas out of the brackets'''
+    columns = []
+    depth = 0
+    start = 0
+    for idx, char in enumerate(column):
+        if char == '(':
+            depth += 1
+        elif char == ')':
+            depth -= 1
+        elif char == ',' and depth == 0:
+            columns.append(column[start:idx].strip())
+            start = idx + 1
+    columns.append(column[start:].strip())
+    return columns
+
+def add_order_columns(column, order):
+    '''
+    add the order columns not in the column to the select of the shards, the
+    merge needs them, return the column and the added names
+
+    >>> add_order_columns('name, score AS s', {'s': 'DESC', 'id': 'ASC'})
+    ('name, score AS s, `id`', ['id'])
+    >>> add_order_columns('*', 'id')
+    ('*', [])
+    '''
+    names = []
+    for col in _split_columns(column):
+        if col == '*' or col.endswith('.*'):
+            return column, []
+        alias = _re_alias.search(col)
+        names.append(alias.group(1) if alias else col.strip('`'))
+    added = [name for name, _ in parse_order(order) if name not in names]
+    if not added:
+        return column, []
+    return ', '.join([column] + ['`{}`'.format(name) for name in added]), added
+
+def rewrite_column(column):
+    '''
+    rewrite the aggregates of the column for the shards, return the column
+    and the aggregates [(func, name, shard names)], the aggregates is None
+    without aggregate
+
+    >>> rewrite_column('count(*)')
+    ('count(*)', [('count', 'count(*)', ['count(*)'])])
+    >>> rewrite_column('avg(score) as score')[0]
+    'sum(score) AS `__sum_0`, count(score) AS `__count_0`'
+    '''
+    aggregates = []
+    columns = []
+    for idx, col in enumerate(_split_columns(column)):
+        agg = _re_agg.search(col)
+        if not agg:
+            columns.append(col)
+            continue
+        func = agg.group(1).lower()
+        name = agg.group(3) or col
+        if func == 'avg':
+            names = ['__sum_{}'.format(idx), '__count_{}'.format(idx)]
+            columns.append('sum({0}) AS `{1}`, count({0}) AS `{2}`'.format(
+                agg.group(2), *names))
+        else:
+            names = [agg.group(3) or col]
+            columns.append(col)
+        aggregates.append((func, name, names))
+
+    if not aggregates:
+        return column, None
+    return ', '.join(columns), aggregates
+
+def _add(a, b):
+    if a is None:
+        return b
+    if b is None:
+        return a
+    return a + b
+
+def _pick(func):
+    def pick(a, b):
+        if a is None:
+            return b
+        if b is None:
+            return a
+        return func(a, b)
+    return pick
+
+_combiners = {
+    'count': _add,
+    'sum': _add,
+    'min': _pick(min),
+    'max': _pick(max),
+}
+
+def combine(results, aggregates, group=None):
+    '''combine the aggregated rows of every shard, by the group columns'''
+    groups = {}
+    for rets in results:
+        for row in rets:
+            key = tuple(row.get(column) for column in group or ())
+            old = groups.get(key)
+            if old is None:
+                groups[key] = dict(row)
+                continue
+            for func, _, names in aggregates:
+                combiner = _combiners.get(func, _add)
+                for name in names:
+                    old[name] = combiner(old.get(name), row.get(name))
+
+    rows = list(groups.values())
+    for row in rows:
+        for func, name, names in aggregates:
+            if func == 'avg':
+                total = row.pop(names[0], None)
+                count = row.pop(names[1], None)
+                row[name] = total / count if count else None
+    return rows
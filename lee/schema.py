@@ -0,0 +1,126 @@
+'''
+the lazy schema bootstrap, enabled by lee.connect(..., lazy_schema=True).
+
+the Table constructions only record the tables to create, on the first query
+the tables are checked by one show_tables and all the missing tables and
+their index are created in one transaction, the sharded tables on every
+shard.
+
+with schema_cache the fingerprints of the created schemas are saved on disk,
+the unchanged schemas on the same database skip the introspection entirely,
+remove the file to check them again.
+'''
+from . import conf, shard
+from .utils import logger
+from _thread import RLock
+import hashlib
+import json
+import os
+
+__all__ = ['defer', 'flush', 'pending', 'fingerprint']
+
+_pending = []
+_flushing = False
+_lock = RLock()
+
+def fingerprint(table_name, columns, spec_index=(), spec_uniq=()):
+    '''the md5 of the schema, the callable defaults are ignored'''
+    cols = [sorted((key, 'callable' if callable(val) else val) \
+            for key, val in column.items()) for column in columns]
+    schema = [table_name, cols, list(spec_index), list(spec_uniq)]
+    return hashlib.md5(repr(schema).encode()).hexdigest()
+
+def _database():
+    '''the key of the connected database in the schema cache'''
+    if conf.use_mysql:
+        mysql = shard.mysql()
+        return 'mysql://{}:{}/{}'.format(mysql.get('host'),
+                mysql.get('port'), mysql.get('db'))
+
+    path = shard.path()
+    if path in ('', ':memory:') or not os.path.exists(path):
+        return None
+    # the inode changes if the database file is recreated
+    return 'sqlite://{}#{}'.format(os.path.abspath(path),
+            os.stat(path).st_ino)
+
+def _load_cache():
+    if not conf.schema_cache or not os.path.exists(conf.schema_cache):
+        return {}
+    try:
+        with open(conf.schema_cache) as f:
+            return json.load(f)
+    except (OSError, ValueError) as e:
+        logger.warning('load schema cache %s failed: %s', conf.schema_cache, e)
+        return {}
+
+def _save_cache(fingerprints):
+    database = _database()
+    if not conf.schema_cache or not database:
+        return
+    cache = _load_cache()
+    known = set(cache.get(database, []))
+    known.update(fingerprints)
+    cache[database] = sorted(known)
+    tmp = '{}.{}'.format(conf.schema_cache, os.getpid())
+    try:
+        with open(tmp, 'w') as f:
+            json.dump(cache, f)
+        os.replace(tmp, conf.schema_cache)
+    except OSError as e:
+        logger.warning('save schema cache %s failed: %s', conf.schema_cache, e)
+
+def pending():
+    return bool(_pending)
+
+def defer(table_name, columns, spec_index=(), spec_uniq=(), sharded=False):
+    '''record the table to create on the first query, on every shard if sharded'''
+    sign = fingerprint(table_name, columns, spec_index, spec_uniq)
+    with _lock:
+        _pending.append((table_name, columns, spec_index, spec_uniq, sign, sharded))
+
+def _create(items):
+    '''create the missing tables of items on the current database'''
+    from .query import show_tables, create_tables
+    database = _database()
+    if database:
+        known = set(_load_cache().get(database, ()))
+        items = [item for item in items if item[4] not in known]
+    if not items:
+        return
+
+    tables = show_tables() or []
+    missing = []
+    for item in items:
+        if item[0] not in tables:
+            tables.append(item[0])
+            missing.append(item)
+    if missing:
+        create_tables([item[:4] for item in missing])
+    _save_cache([item[4] for item in items])
+
+def flush():
+    '''create all the pending tables, one transaction per database'''
+    global _flushing
+    if not _pending:
+        return
+    with _lock:
+        # the queries of the flush itself are issued by the same thread
+        if _flushing or not _pending:
+            return
+        _flushing = True
+        try:
+            databases = {}
+            for item in _pending:
+                indexes = [None]
+                if item[5] and shard.count():
+                    indexes = range(shard.count())
+                for idx in indexes:
+                    databases.setdefault(idx, []).append(item)
+
+            for idx, items in databases.items():
+                with shard.using(idx):
+                    _create(items)
+            _pending[:] = []
+        finally:
+            _flushing = False
@@ -0,0 +1,156 @@
+'''
+the horizontal sharding, the rows of the models with sharded = True are
+routed to one of the shards by the primary key::
+
+    lee.connect('sqlite://data/main.db', shards=[
+        'sqlite://data/shard0.db',
+        'sqlite://data/shard1.db',
+        'sqlite://data/shard2.db',
+    ])
+
+    class Event(Model):
+        table_name = 'event'
+        sharded = True
+        columns = [...]
+
+find_by_id, del_by_id, save and strict_save go to the shard of the primary
+key, by the consistent hash ring with virtual nodes of the shard DSNs, or by
+the shard_key(pk) function of the model which return the shard index (eg: a
+key range scheme). save needs the primary key of a sharded model.
+
+the other operations run on the shard selected by::
+
+    with lee.shard.using(1):
+        Event.find_all(...)
+
+or on the default database.
+
+add a shard to the ring only move about 1/n of the keys, the cache keys of
+the sharded rows have the shard so the moved rows are never read from the
+cache of the old shard.
+'''
+from . import conf, replica
+from bisect import bisect
+import hashlib
+import threading
+
+__all__ = ['Ring', 'using', 'current', 'count', 'route', 'key', 'path', 'mysql',
+    'parse_dsn']
+
+_local = threading.local()
+_ring = None
+
+def parse_dsn(dsn):
+    '''parse the DSN of lee.connect to {'use_mysql', 'path', 'mysql'}'''
+    import urllib.parse
+    p = urllib.parse.urlparse(dsn)
+    if p.scheme == 'mysql':
+        netloc = p.netloc.split(':', 1)
+        mysql = {'host': netloc[0]}
+        if len(netloc) == 2:
+            mysql['port'] = int(netloc[1])
+        else:
+            mysql['port'] = 3306
+        mysql.update(urllib.parse.parse_qsl(p.query))
+        return {'use_mysql': True, 'path': None, 'mysql': mysql}
+
+    return {'use_mysql': False, 'path': p.netloc + p.path, 'mysql': {}}
+
+class Ring(object):
+    '''
+    the consistent hash ring, every node has vnodes points on the ring
+
+    >>> ring = Ring(['a', 'b', 'c'])
+    >>> ring.node('user:1') in ('a', 'b', 'c')
+    True
+    '''
+
+    __slots__ = ['nodes', 'vnodes', '_points', '_owners']
+
+    def __init__(self, nodes, vnodes=64):
+        self.nodes = list(nodes)
+        self.vnodes = vnodes
+        points = []
+        for node in self.nodes:
+            for idx in range(vnodes):
+                points.append((self._hash('{}#{}'.format(node, idx)), node))
+        points.sort()
+        self._points = [point for point, _ in points]
+        self._owners = [node for _, node in points]
+
+    @staticmethod
+    def _hash(key):
+        return int(hashlib.md5(key.encode()).hexdigest()[:16], 16)
+
+    def node(self, key):
+        '''the node own the key'''
+        idx = bisect(self._points, self._hash(key)) % len(self._points)
+        return self._owners[idx]
+
+def configure(shards, vnodes=64):
+    '''set the shards, call by lee.connect'''
+    global _ring
+    conf.shards = [parse_dsn(dsn) for dsn in shards or []]
+    conf.shard_vnodes = vnodes
+    # the DSN is the node name, so the order of the shards does not matter
+    _ring = Ring(list(shards), vnodes) if shards else None
+
+def count():
+    return len(conf.shards)
+
+def current():
+    '''the index of the current shard, None is the default database'''
+    return getattr(_local, 'shard', None)
+
+class using(object):
+    '''run the block on the shard of index, None is the default database'''
+
+    __slots__ = ['index', 'old']
+
+    def __init__(self, index):
+        if index is not None and not 0 <= index < count():
+            raise IndexError('shard {} out of range'.format(index))
+        self.index = index
+        self.old = None
+
+    def __enter__(self):
+        self.old = current()
+        _local.shard = self.index
+        return self
+
+    def __exit__(self, *args):
+        _local.shard = self.old
+
+def route(model, pk):
+    '''the shard index of the primary key pk (a tuple) of the model'''
+    if model.shard_key is not None:
+        return model.shard_key(pk)
+    dsn = _ring.node(':'.join(str(val) for val in pk))
+    return _ring.nodes.index(dsn)
+
+def _database():
+    idx = current()
+    if idx is None:
+        idx = replica.current()
+        if idx is None:
+            return None
+        return conf.replicas[idx]
+    return conf.shards[idx]
+
+def key():
+    '''the key of the current database, the shard and the replica'''
+    return (current(), replica.current())
+
+def path():
+    '''the sqlite path of the current database'''
+    database = _database()
+    if database is None:
+        return conf.path
+    return database['path']
+
+def mysql():
+    '''the mysql config of the current database'''
+    database = _database()
+    if database is None:
+        return conf.mysql
+    return database['mysql']
@@ -2,17 +2,62 @@ from .query import create_table, show_tables, diff_table, query
 from .utils import parse, parse_query
 from . import cache as mc
 from .utils import logger
-from . import conf
+from . import conf, trace
+from .workload import captured
+from . import advisor, schema, shard, scatter, replica, writer, counter
+from .cache import metrics
+import functools
 import inspect
+import hashlib
+import time
 
 __all__ = ['Table']
 
 _query = query
 
+def _routed(get_pk):
+    '''run the method on the shard of the primary key of the sharded model'''
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(self, *args, **kwargs):
+            if not self._model.sharded or not shard.count():
+                return func(self, *args, **kwargs)
+
+            pk = tuple(get_pk(self, *args, **kwargs))
+            if None in pk or len(pk) != len(self._pris):
+                raise ValueError('the primary key of the sharded table {} is required'.format(
+                    self._model.table_name))
+            with shard.using(shard.route(self._model, pk)):
+                return func(self, *args, **kwargs)
+        return wrapper
+    return decorator
+
+def _on_primary(func):
+    '''run all the queries of the method on the primary, not the replicas'''
+    @functools.wraps(func)
+    def wrapper(self, *args, **kwargs):
+        with replica.primary():
+            return func(self, *args, **kwargs)
+    return wrapper
+
+def _args_pk(self, *args):
+    return args
+
+def _obj_pk(self, obj, *args):
+    return [obj.get(pri) for pri in self._pris]
+
+def _to_pk(pk):
+    if isinstance(pk, (list, tuple)):
+        return tuple(pk)
+    return (pk, )
+
+def _incr_pk(self, pk, *args, **kwargs):
+    return _to_pk(pk)
+
 class Table(object):
     '''
     Table.TABLES:
-        all the table on the connection database
+        all the table on the connection database, it is None with lazy_schema
 
     Table.defaults:
         the default values of columns
@@ -42,7 +87,8 @@ class Table(object):
     '''
     TABLES = None
 
-    __slots__ = ['name', '_model', '_pris', '_uniqs', 'defaults', '_pri_field', '_extra']
+    __slots__ = ['name', '_model', '_pris', '_uniqs', 'defaults', '_pri_field',
+            '_extra', '_schema_hash']
 
     def __init__(self, model):
         self._model = model
@@ -51,12 +97,22 @@ class Table(object):
         self._extra = {}
         self.name = model.table_name
 
-        if Table.TABLES is None:
-            Table.TABLES = show_tables()
+        if conf.lazy_schema:
+            if model.auto_create_table:
+                schema.defer(model.table_name, model.columns, model.spec_index,
+                        model.spec_uniq, model.sharded)
+        elif model.sharded and shard.count():
+            if model.auto_create_table:
+                for idx in range(shard.count()):
+                    with shard.using(idx):
+                        create_table(model.table_name, model.columns, model.spec_index, model.spec_uniq)
+        else:
+            if Table.TABLES is None:
+                Table.TABLES = show_tables()
 
-        if model.auto_create_table and model.table_name not in Table.TABLES:
-            Table.TABLES.append(model.table_name)
-            create_table(model.table_name, model.columns, model.spec_index, model.spec_uniq)
+            if model.auto_create_table and model.table_name not in Table.TABLES:
+                Table.TABLES.append(model.table_name)
+                create_table(model.table_name, model.columns, model.spec_index, model.spec_uniq)
 
         self.defaults = {}
         for column in model.columns:
@@ -70,6 +126,10 @@ class Table(object):
 
         self._pri_field = ', '.join(['`{}`'.format(pri) for pri in self._pris])
 
+        fields = [(column['name'], column.get('type'), bool(column.get('primary')))
+                for column in model.columns]
+        self._schema_hash = hashlib.md5(repr(fields).encode()).hexdigest()[:8]
+
     def __call__(self, *args, **kwargs):
         return self._model(self, *args, **kwargs)
 
@@ -150,7 +210,7 @@ class Table(object):
             sql = 'SELECT {} FROM `{}` WHERE `{}` = ?'.format(field,
                     self._model.table_name, column_name)
             args = (uniq_key, )
-            logger.debug('Query> SQL: {} | ARGS: {}'.format(sql, args))
+            logger.debug('Query> SQL: %s | ARGS: %s', sql, args)
             cur.execute(sql, args)
             ret = cur.fetchone()
             if ret:
@@ -166,29 +226,207 @@ class Table(object):
         else:
             return _find_by_uniq
 
-    def _gen_cache_key(self, args):
+    def _gen_cache_key(self, args, generation=None):
         cols = []
         for k, v in zip(self._pris, args):
             cols.append(k)
             cols.append(v)
-        mc_key = mc.gen_key(self._model.table_name, *cols)
+        if generation is None:
+            generation = mc.generation(self._model.table_name)
+        if self._model.sharded and shard.current() is not None:
+            cols.insert(0, 's{}'.format(shard.current()))
+        mc_key = mc.gen_key(self._model.table_name, self._schema_hash,
+                generation, *cols)
         return mc_key
 
+    def invalidate_all(self):
+        '''
+        drop all the cached rows and query results of the table by bump the
+        table generation
+        '''
+        self._invalidate_queries()
+        return mc.bump_generation(self._model.table_name)
+
+    def _query_namespace(self):
+        return mc.gen_key(self._model.table_name, 'query')
+
+    def _invalidate_queries(self):
+        if self._model.query_cache and conf.is_cache:
+            mc.bump_generation(self._query_namespace())
+
+    def _gen_query_cache_key(self, column, where, values, scatter=None):
+        params = (column, where, values)
+        if scatter is not None:
+            params += (scatter, )
+        digest = hashlib.md5(repr(params).encode()).hexdigest()
+        cols = [digest]
+        if self._model.sharded and shard.current() is not None:
+            cols.insert(0, 's{}'.format(shard.current()))
+        return mc.gen_key(self._query_namespace(), self._schema_hash,
+                mc.generation(self._query_namespace()), *cols)
+
+    def _get_cache_timeout(self, cache_timeout=None):
+        if cache_timeout is not None:
+            return cache_timeout
+
+        if self._model.cache_timeout > 0:
+            return self._model.cache_timeout
+
+        return conf.cache_timeout
+
+    def _read_cache_timeout(self, cache_timeout=None):
+        '''the cache timeout of the rows read now, None if they are not cached'''
+        return replica.cache_timeout(self._get_cache_timeout(cache_timeout))
+
+    def _can_hydrate(self, column):
+        return column == '*' and self._pris and self._model.auto_cache
+
+    def _cached_query(self, column, where, values, fetch, cache_timeout,
+            hydrated = False, scatter = None):
+        '''
+        run the fetch with the query cache, when the rows can be load by
+        primary key only the primary keys are cached and the rows are hydrated
+        by find_by_id through the row cache. hydrated is True if the fetch
+        already load the rows through the row cache.
+
+        scatter is the (limit, order) of the merge if the fetch gather the rows
+        of all the shards, the rows are cached as is because find_by_id only
+        read the current database.
+
+        the entry keeps its expire time, the in-process caches have no timeout.
+        '''
+        mc_key = self._gen_query_cache_key(column, where, values, scatter)
+        hydrate = scatter is None and self._can_hydrate(column)
+        entry = mc.get(mc_key)
+        if entry is not None and (not entry['expire'] or entry['expire'] > time.time()):
+            cached = entry['rows']
+            if not hydrate:
+                return [dict(ret) for ret in cached]
+            return self._find_by_ids(cached)
+
+        rets = fetch()
+        if rets is None:
+            return rets
+
+        if hydrate:
+            cached = [[ret[pri] for pri in self._pris] for ret in rets]
+            if rets and not hydrated:
+                generation = mc.generation(self._model.table_name)
+                self._cache_set_multi(dict((self._gen_cache_key(args, generation),
+                    ret) for args, ret in zip(cached, rets)))
+        else:
+            cached = [dict(ret) for ret in rets]
+
+        timeout = self._read_cache_timeout(cache_timeout)
+        if timeout is not None:
+            expire = time.time() + timeout if timeout else 0
+            mc.set(mc_key, {'rows': cached, 'expire': expire}, timeout)
+        return rets
+
+    def _use_cache_hydrate(self, column, group):
+        return self._model.cache_hydrate and conf.is_cache and not group and \
+                self._can_hydrate(column)
+
+    def _find_by_ids(self, ids, chunk_size=500):
+        '''
+        load the rows by the primary key list keep the order, the cached rows
+        are read by one cache multi get and the missing rows are select by
+        `IN` query and write back to the cache.
+        '''
+        generation = mc.generation(self._model.table_name)
+        keys = [self._gen_cache_key(args, generation) for args in ids]
+        start_time = time.perf_counter()
+        cached = mc.get_multi(keys)
+        if conf.cache_metrics:
+            metrics.record_get(self._model.table_name,
+                    [mc.gen_key(*args) for args in ids], len(cached),
+                    time.perf_counter() - start_time)
+
+        missing = [args for key, args in zip(keys, ids) if key not in cached]
+        loaded = {}
+        for start in range(0, len(missing), chunk_size):
+            for ret in self._select_by_ids(missing[start:start + chunk_size]):
+                args = [ret[pri] for pri in self._pris]
+                loaded[self._gen_cache_key(args, generation)] = ret
+
+        if loaded:
+            self._cache_set_multi(loaded)
+
+        rets = []
+        for key in keys:
+            ret = cached.get(key) or loaded.get(key)
+            if ret:
+                rets.append(dict(ret))
+        return rets
+
+    def _select_by_ids(self, ids):
+        if not ids:
+            return []
+
+        @_query()
+        def _select(cur):
+            if len(self._pris) == 1:
+                where = '`{}` IN ({})'.format(self._pris[0],
+                        ', '.join(['?'] * len(ids)))
+                args = tuple(args[0] for args in ids)
+            else:
+                part = '({})'.format(' AND '.join(['`{}` = ?'.format(pri) \
+                        for pri in self._pris]))
+                where = ' OR '.join([part] * len(ids))
+                args = tuple(arg for args in ids for arg in args)
+
+            sql = 'SELECT * FROM `{}` WHERE {}'.format(self._model.table_name,
+                    where)
+            logger.debug('Query> SQL: %s | ARGS: %s', sql, args)
+            cur.execute(sql, args)
+            return cur.fetchall()
+
+        return _select() or []
+
     def _cache_get(self, args):
         mc_key = self._gen_cache_key(args)
-        return mc.get(mc_key)
+        if not conf.cache_metrics:
+            return mc.get(mc_key)
+
+        start_time = time.perf_counter()
+        ret = mc.get(mc_key)
+        metrics.record_get(self._model.table_name, [mc.gen_key(*args)],
+                int(ret is not None), time.perf_counter() - start_time)
+        return ret
 
     def _cache_set(self, obj):
+        timeout = self._read_cache_timeout()
+        if timeout is None:
+            return
         obj = obj.copy()
         args = [obj[pri] for pri in self._pris]
         mc_key = self._gen_cache_key(args)
 
-        if self._model.cache_timeout > 0:
-            cache_timeout = self._model.cache_timeout
-        else:
-            cache_timeout = conf.cache_timeout
+        mc.set(mc_key, obj, timeout)
+        if conf.cache_metrics:
+            metrics.record_set(self._model.table_name, [obj])
+
+    def _cache_set_multi(self, mapping):
+        '''set the rows by one cache multi set, mapping is cache key to row'''
+        timeout = self._read_cache_timeout()
+        if timeout is None:
+            return
+        mapping = dict((key, obj.copy()) for key, obj in mapping.items())
+        mc.set_multi(mapping, timeout)
+        if conf.cache_metrics:
+            metrics.record_set(self._model.table_name, list(mapping.values()))
+
+    def cache_metrics(self):
+        '''
+        the cache metrics of the table: hits, misses, hit_ratio, sets,
+        deletes, evictions, bytes, get latency and the hot keys, enable it by
+        lee.connect(..., cache_metrics=True)
+        '''
+        return metrics.snapshot(self._model.table_name)
 
-        mc.set(mc_key, obj, cache_timeout)
+    def reset_cache_metrics(self):
+        '''reset the cache metrics of the table'''
+        metrics.reset(self._model.table_name)
 
     def _cache_del(self, obj):
         if isinstance(obj, (tuple, list)):
@@ -197,7 +435,11 @@ class Table(object):
             args = [obj[pri] for pri in self._pris]
         mc_key = self._gen_cache_key(args)
         mc.delete(mc_key)
+        if conf.cache_metrics:
+            metrics.record_delete(self._model.table_name)
 
+    @captured('find_by_id')
+    @_routed(_args_pk)
     def find_by_id(self, *args):
         '''find by primary key difine on the model column'''
         pri_len = len(self._pris)
@@ -212,7 +454,7 @@ class Table(object):
                 where = ' AND '.join(['`{}` = ?'.format(pri) for pri in self._pris])
                 sql = 'SELECT * FROM `{}` WHERE {}'.format( \
                         self._model.table_name, where)
-                logger.debug('Query> SQL: {} | ARGS: {}'.format(sql, args))
+                logger.debug('Query> SQL: %s | ARGS: %s', sql, args)
                 cur.execute(sql, args)
                 ret = cur.fetchone()
                 if ret:
@@ -232,7 +474,7 @@ class Table(object):
                 sql = 'SELECT {} FROM `{}` WHERE `{}` = ?'.format(self._pri_field,
                         self._model.table_name, column_name)
                 args = (uniq_key, )
-                logger.debug('Query> SQL: {} | ARGS: {}'.format(sql, args))
+                logger.debug('Query> SQL: %s | ARGS: %s', sql, args)
                 cur.execute(sql, args)
                 ret = cur.fetchone()
                 if ret:
@@ -242,14 +484,17 @@ class Table(object):
             sql = 'DELETE FROM `{}` WHERE `{}` = ?'.format(\
                     self._model.table_name, column_name)
             args = (uniq_key, )
-            logger.debug('Query> SQL: {} | ARGS: {}'.format(sql, args))
+            logger.debug('Query> SQL: %s | ARGS: %s', sql, args)
             cur.execute(sql, args)
+            self._invalidate_queries()
 
         if uniq_key:
             return _del_by_uniq(uniq_key)
         else:
             return _del_by_uniq
 
+    @captured('del_by_id')
+    @_routed(_args_pk)
     def del_by_id(self, *args):
         '''del by primary key difine on the model column'''
         pri_len = len(self._pris)
@@ -262,20 +507,26 @@ class Table(object):
                 where = ' AND '.join(['`{}` = ?'.format(pri) for pri in self._pris])
                 sql = 'DELETE FROM `{}` WHERE {}'.format( \
                         self._model.table_name, where)
-                logger.debug('Query> SQL: {} | ARGS: {}'.format(sql, args))
+                logger.debug('Query> SQL: %s | ARGS: %s', sql, args)
                 cur.execute(sql, args)
+                self._invalidate_queries()
 
         _del_by_id(*args)
 
+    @captured('save')
+    @_routed(_obj_pk)
+    @_on_primary
     def save(self, obj):
         '''
         save the obj to database, if has one update it, otherwise create it,
         dect by primary key or unique key
         '''
+        if self._model.write_behind and not writer.flushing():
+            return writer.get(self).save(obj)
 
         @query(autocommit=True)
         def _save(sql, args, cur):
-            logger.debug('Query> SQL: {} | ARGS: {}'.format(sql, args))
+            logger.debug('Query> SQL: %s | ARGS: %s', sql, args)
             cur.execute(sql, args)
             return cur.lastrowid
 
@@ -296,11 +547,11 @@ class Table(object):
         old_obj = None
         if pris:
             old_obj = self.find_one(list(zip(self._pris, pris)),
-                    self._pri_field)
+                    self._pri_field, cache=False)
         else:
             for column_name, column_value in uniqs:
                 old_obj = self.find_one([(column_name, column_value)],
-                        self._pri_field)
+                        self._pri_field, cache=False)
                 if old_obj:
                     break
 
@@ -319,6 +570,7 @@ class Table(object):
             _save(sql, args)
             if self._model.auto_cache and conf.is_cache:
                 self._cache_del(old_obj)
+            self._invalidate_queries()
 
             return None
         else:
@@ -347,15 +599,21 @@ class Table(object):
             sql = 'INSERT INTO `{}` ({}) VALUES ({})'.format(self._model.table_name, part_k, part_v)
             args = tuple(use_values)
 
-            return _save(sql, args)
+            retval = _save(sql, args)
+            self._invalidate_queries()
+            return retval
 
+    @captured('strict_save')
+    @_routed(_obj_pk)
     def strict_save(self, obj, changed):
         '''
         update obj changed to database dect by primary key
         '''
+        if self._model.write_behind and not writer.flushing():
+            return writer.get(self).strict_save(obj, changed)
         @query(autocommit=True)
         def _strict_save(sql, args, cur):
-            logger.debug('Query> SQL: {} | ARGS: {}'.format(sql, args))
+            logger.debug('Query> SQL: %s | ARGS: %s', sql, args)
             cur.execute(sql, args)
 
         changed = parse(changed, self._model.columns)
@@ -390,13 +648,94 @@ class Table(object):
         _strict_save(sql, args)
         if self._model.auto_cache and conf.is_cache:
             self._cache_del(obj)
+        self._invalidate_queries()
 
         return None
 
+    @captured('incr')
+    @_routed(_incr_pk)
+    def incr(self, pk, column, delta = 1, batch = False):
+        '''
+        add delta to the column of the row of primary key pk by one UPDATE,
+        return the new value, or None if the row is not found. the cached row
+        is updated with the new value instead of deleted.
+
+        @batch:
+            fold the increments in process and write them every
+            Model.incr_interval seconds, return None, also see lee.counter
+        '''
+        pk = _to_pk(pk)
+        if column in self._pris or column not in [col['name'] for col in self._model.columns]:
+            raise ValueError('{} is not a counter column of {}'.format(column,
+                self._model.table_name))
+
+        if batch:
+            counter.accumulator(self).add(pk, column, delta)
+            return None
+
+        use_cache = self._model.auto_cache and conf.is_cache
+        where = ' AND '.join(['`{}` = ?'.format(pri) for pri in self._pris])
+
+        @query(autocommit=True)
+        def _incr(cur):
+            sql = 'UPDATE `{0}` SET `{1}` = COALESCE(`{1}`, 0) + ? WHERE {2}'.format(
+                    self._model.table_name, column, where)
+            args = (delta, ) + pk
+            logger.debug('Query> SQL: %s | ARGS: %s', sql, args)
+            cur.execute(sql, args)
+
+            # read the value before the commit, the row is still locked so the
+            # cache is updated in the order of the increments
+            sql = 'SELECT `{}` FROM `{}` WHERE {}'.format(column,
+                    self._model.table_name, where)
+            logger.debug('Query> SQL: %s | ARGS: %s', sql, pk)
+            cur.execute(sql, pk)
+            ret = cur.fetchone()
+            if ret is None:
+                return None
+
+            if use_cache:
+                mc_key = self._gen_cache_key(pk)
+                obj = mc.get(mc_key)
+                if obj:
+                    obj[column] = ret[column]
+                    mc.set(mc_key, obj, self._get_cache_timeout())
+            return ret[column]
+
+        try:
+            retval = _incr()
+        except Exception:
+            if use_cache:
+                self._cache_del(pk)
+            raise
+        self._invalidate_queries()
+        return retval
+
+    def decr(self, pk, column, delta = 1, batch = False):
+        '''subtract delta from the column, also see Table.incr'''
+        return self.incr(pk, column, -delta, batch)
+
+    @captured('find_one')
     def find_one(self, query = None, column = '*', order = None, group = None,
-            is_or = False):
+            is_or = False, cache = None, cache_timeout = None):
+
+        '''
+        find one by query, also see lee.utils.parse_query
 
-        '''find one by query, also see lee.utils.parse_query'''
+        @cache:
+            use the query cache, default is Model.query_cache
+
+        @cache_timeout:
+            the query cache timeout of this call
+        '''
+
+        if self._scatter():
+            rets = self.find_all(query, column, 1, order, group, is_or,
+                    cache=cache, cache_timeout=cache_timeout)
+            return rets[0] if rets else None
+
+        if conf.index_advisor:
+            advisor.observe(self._model.table_name, query, order, group, is_or)
 
         where, values = parse_query(self._model.columns, query, 1, order, group, is_or)
 
@@ -405,52 +744,352 @@ class Table(object):
 
             sql = 'SELECT {} FROM `{}` {}'.format(column, self._model.table_name, where)
             args = tuple(values)
-            logger.debug('Query> SQL: {} | ARGS: {}'.format(sql, args))
+            logger.debug('Query> SQL: %s | ARGS: %s', sql, args)
 
             cur.execute(sql, args)
 
             return cur.fetchone()
 
-        ret = _find_one()
+        if self._use_query_cache(cache):
+            def fetch():
+                ret = _find_one()
+                if ret:
+                    return [ret]
+                return []
+            rets = self._cached_query(column, where, values, fetch,
+                    cache_timeout)
+            ret = rets[0] if rets else None
+        else:
+            ret = _find_one()
+
         if ret:
             ret = self._model(self, ret)
         return ret
 
+    @captured('find_all')
     def find_all(self, query = None, column = '*', limit = '', order = None,
-            group = None, is_or = False, page = None):
+            group = None, is_or = False, page = None, cache = None,
+            cache_timeout = None):
+
+        '''
+        find all by query, also see lee.utils.parse_query
 
-        '''find all by query, also see lee.utils.parse_query'''
+        @cache:
+            use the query cache, default is Model.query_cache
+
+        @cache_timeout:
+            the query cache timeout of this call
+        '''
 
         if limit and page:
             start = int(limit) * int(page)
             limit = '{}, {}'.format(start, limit)
 
-        where, values = parse_query(self._model.columns, query, limit, order, group,
-                is_or)
+        if conf.index_advisor:
+            advisor.observe(self._model.table_name, query, order, group, is_or)
+
+        is_scatter = self._scatter()
+        shard_limit = limit
+        shard_order = order
+        aggregates = None
+        order_columns = []
+        if is_scatter:
+            # every shard returns the rows up to the end of the page
+            column, aggregates = scatter.rewrite_column(column)
+            offset, count = scatter.parse_limit(limit)
+            shard_limit = ''
+            if aggregates is not None or group:
+                # the combined rows are sorted after the combine
+                shard_order = None
+            else:
+                # the merge compares the rows by the order columns
+                column, order_columns = scatter.add_order_columns(column, order)
+                if count is not None:
+                    shard_limit = offset + count
+
+        where, values = parse_query(self._model.columns, query, shard_limit,
+                shard_order, group, is_or)
+
+        hydrate = not is_scatter and self._use_cache_hydrate(column, group)
+        if hydrate:
+            field = self._pri_field
+        else:
+            field = column
 
         @_query()
         def _find_all(cur):
 
-            sql = 'SELECT {} FROM `{}` {}'.format(column, self._model.table_name, where)
+            sql = 'SELECT {} FROM `{}` {}'.format(field, self._model.table_name, where)
             args = tuple(values)
-            logger.debug('Query> SQL: {} | ARGS: {}'.format(sql, args))
+            logger.debug('Query> SQL: %s | ARGS: %s', sql, args)
 
             cur.execute(sql, args)
 
             return cur.fetchall()
 
-        return [self._model(self, ret) for ret in _find_all()]
+        def fetch():
+            if is_scatter:
+                results = scatter.gather(_find_all)
+                if aggregates is None and not group:
+                    rows = scatter.merge(results, order, limit)
+                    for row in rows:
+                        for name in order_columns:
+                            row.pop(name, None)
+                    return rows
+                rows = scatter.combine(results, aggregates or [], group)
+                return scatter.sort(rows, order, limit)
+
+            rets = _find_all()
+            if hydrate and rets:
+                ids = [[ret[pri] for pri in self._pris] for ret in rets]
+                rets = self._find_by_ids(ids)
+            return rets
+
+        if self._use_query_cache(cache):
+            rets = self._cached_query(column, where, values, fetch,
+                    cache_timeout, hydrated=hydrate,
+                    scatter=(limit, order) if is_scatter else None)
+        else:
+            rets = fetch()
+
+        rets = rets or []
+        if trace.enabled():
+            with trace.span('models', 'model', {'table': self._model.table_name,
+                    'count': len(rets)}):
+                return [self._model(self, ret) for ret in rets]
+
+        return [self._model(self, ret) for ret in rets]
+
+    def count(self, query = None, is_or = False, cache = None):
+        '''count the rows by query, also see lee.utils.parse_query'''
+        ret = self.find_one(query, 'count(*) AS `count`', is_or=is_or, cache=cache)
+        if ret:
+            return ret['count']
+        return 0
+
+    def _iter_chunks(self, where, values, column='*', chunk_size=500):
+        @_query()
+        def _execute(cur):
+            sql = 'SELECT {} FROM `{}` {}'.format(column, self._model.table_name, where)
+            args = tuple(values)
+            logger.debug('Query> SQL: %s | ARGS: %s', sql, args)
+
+            cur.execute(sql, args)
+
+            return cur
+
+        cur = _execute()
+        if cur is None:
+            return
+
+        while True:
+            rets = cur.fetchmany(chunk_size)
+            if not rets:
+                break
+            yield rets
+
+    def iter_all(self, query = None, column = '*', limit = '', order = None,
+            group = None, is_or = False, chunk_size = 500):
+
+        '''
+        like find_all but fetch the rows by chunk of chunk_size from one cursor
+        and yield them one by one, with Model.cache_hydrate the primary keys
+        are select first and the rows are load by chunk through the row cache
+        '''
+
+        if conf.index_advisor:
+            advisor.observe(self._model.table_name, query, order, group, is_or)
+
+        where, values = parse_query(self._model.columns, query, limit, order, group,
+                is_or)
+
+        if self._use_cache_hydrate(column, group):
+            # the cursor is drained before the rows are load, the connection
+            # of MySQL can not run a query with the unread rows
+            ids = [[ret[pri] for pri in self._pris] \
+                    for rets in self._iter_chunks(where, values, self._pri_field,
+                        chunk_size) for ret in rets]
+            for start in range(0, len(ids), chunk_size):
+                for ret in self._find_by_ids(ids[start:start + chunk_size],
+                        chunk_size):
+                    yield self._model(self, ret)
+            return
+
+        for rets in self._iter_chunks(where, values, column, chunk_size):
+            for ret in rets:
+                yield self._model(self, ret)
+
+    def warm_cache(self, query = None, limit = '', order = None, is_or = False,
+            chunk_size = 500):
+
+        '''
+        load the rows by query into the cache, the rows are stream by chunk and
+        each chunk is write by one cache multi set, return the count of rows
+        '''
+
+        if not self._pris or not conf.is_cache:
+            return 0
+
+        where, values = parse_query(self._model.columns, query, limit, order,
+                None, is_or)
+
+        generation = mc.generation(self._model.table_name)
+        count = 0
+        for rets in self._iter_chunks(where, values, '*', chunk_size):
+            mapping = {}
+            for ret in rets:
+                args = [ret[pri] for pri in self._pris]
+                mapping[self._gen_cache_key(args, generation)] = ret
+            self._cache_set_multi(mapping)
+            count += len(rets)
+
+        return count
+
+    def preload_cache(self, path, chunk_size = 500):
+
+        '''
+        load the rows of the keys dump by lee.cache.dump_keys into the cache,
+        the keys of the other tables or an other schema are skipped, return the
+        count of rows
+        '''
+
+        if not self._pris or not conf.is_cache:
+            return 0
 
+        prefix = mc.gen_key(self._model.table_name, self._schema_hash)
+        pri_len = len(self._pris)
+        ids = []
+        with open(path) as f:
+            for key in f:
+                key = key.rstrip('\n')
+                if not key.startswith(prefix + ':'):
+                    continue
+
+                parts = key.split(':', 3)
+                if len(parts) != 4:
+                    continue
+
+                if pri_len == 1:
+                    cols = parts[3].split(':', 1)
+                else:
+                    cols = parts[3].split(':')
+                if len(cols) != pri_len * 2 or cols[0::2] != self._pris:
+                    continue
+
+                obj = parse(dict(zip(self._pris, cols[1::2])), self._model.columns)
+                ids.append([obj[pri] for pri in self._pris])
+
+        count = 0
+        for start in range(0, len(ids), chunk_size):
+            count += len(self._find_by_ids(ids[start:start + chunk_size]))
+
+        return count
+
+    def export(self, fp, format = 'jsonl', query = None, limit = '', order = None,
+            is_or = False, chunk_size = 1000, processes = 0, progress = None):
+
+        '''
+        write the rows by query to the text file fp in jsonl or csv, the rows
+        are stream by chunk of chunk_size, return the count of rows, the
+        sharded table is export shard by shard, also see lee.transfer
+        '''
+
+        from . import transfer
+
+        where, values = parse_query(self._model.columns, query, limit, order,
+                None, is_or)
+
+        def chunks():
+            if not self._scatter():
+                yield from self._iter_chunks(where, values, '*', chunk_size)
+                return
+            for idx in range(shard.count()):
+                with shard.using(idx):
+                    yield from self._iter_chunks(where, values, '*', chunk_size)
+
+        return transfer.dump(chunks(), fp, format, processes, progress)
+
+    def import_(self, fp, format = 'jsonl', batch_size = 1000, processes = 0,
+            progress = None):
+
+        '''
+        insert the rows of the text file fp written by export, every batch of
+        batch_size rows is insert in one transaction, the rows of the sharded
+        table go to the shard of the primary key, return the count of rows
+        '''
+
+        from . import transfer
+
+        table_name = self._model.table_name
+        routed = self._model.sharded and shard.count()
+
+        @_query(autocommit=True)
+        def _insert(groups, cur):
+            # a savepoint, not BEGIN, so a transaction already open on the
+            # connection is neither an error nor rolled back with the batch
+            cur.execute('SAVEPOINT lee_import')
+            try:
+                for keys, values in groups:
+                    writer.insert_values(cur, table_name, keys, values)
+            except Exception:
+                cur.execute('ROLLBACK TO SAVEPOINT lee_import')
+                cur.execute('RELEASE SAVEPOINT lee_import')
+                raise
+            cur.execute('RELEASE SAVEPOINT lee_import')
+
+        def insert(rows):
+            # the runs of the rows with the same columns by shard
+            shards = {}
+            for row in rows:
+                idx = None
+                if routed:
+                    pk = tuple(row.get(pri) for pri in self._pris)
+                    if None in pk or not pk:
+                        raise ValueError('the primary key of the sharded table {} is required'.format(
+                            table_name))
+                    idx = shard.route(self._model, pk)
+
+                groups = shards.setdefault(idx, [])
+                keys = tuple(row.keys())
+                if not groups or groups[-1][0] != keys:
+                    groups.append((keys, []))
+                groups[-1][1].append(tuple(row.values()))
+
+            for idx, groups in shards.items():
+                with shard.using(idx):
+                    _insert(groups)
+
+        try:
+            return transfer.load(fp, insert, format, batch_size, processes,
+                    progress)
+        finally:
+            if self._model.auto_cache and conf.is_cache:
+                self.invalidate_all()
+            else:
+                self._invalidate_queries()
+
+    def _scatter(self):
+        '''if the query of the sharded table run on all the shards'''
+        return self._model.sharded and shard.count() and shard.current() is None
+
+    def _use_query_cache(self, cache):
+        if not self._model.query_cache or not conf.is_cache:
+            return False
+        if cache is None:
+            return True
+        return cache
+
+    @captured('del_all')
     def del_all(self, query = None, limit = '', order = None, group = None,
             is_or = False):
 
-        '''delete all by query, also see lee.utils.parse_query'''
-
-        if self._model.auto_cache and conf.is_cache:
-            old_objs = self.find_all(query, self._pri_field, limit, order, group, is_or)
+        '''
+        delete all by query, also see lee.utils.parse_query, the limit of the
+        sharded table is per shard
+        '''
 
-            for old_obj in old_objs:
-                self._cache_del(old_obj)
+        if conf.index_advisor:
+            advisor.observe(self._model.table_name, query, order, group, is_or)
 
         where, values = parse_query(self._model.columns, query, limit, order, group,
                 is_or)
@@ -459,8 +1098,17 @@ class Table(object):
         def _del_all(cur):
             sql = 'DELETE FROM `{}` {}'.format(self._model.table_name, where)
             args = tuple(values)
-            logger.debug('Query> SQL: {} | ARGS: {}'.format(sql, args))
+            logger.debug('Query> SQL: %s | ARGS: %s', sql, args)
 
             cur.execute(sql, args)
 
-        return _del_all()
+        if self._scatter():
+            retval = scatter.gather(_del_all)[0]
+        else:
+            retval = _del_all()
+        if self._model.auto_cache and conf.is_cache:
+            self.invalidate_all()
+        else:
+            self._invalidate_queries()
+
+        return retval
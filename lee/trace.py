@@ -0,0 +1,127 @@
+'''
+record the query wrappers, sql statements, cache calls, model construction
+batches and commits as spans in the Chrome trace event format, the file can
+be open by chrome://tracing or https://ui.perfetto.dev
+
+eg::
+
+    lee.trace.start('/tmp/lee.trace.json')
+    handle_request()
+    lee.trace.stop()
+'''
+from _thread import RLock
+import json
+import os
+import threading
+import time
+
+__all__ = ['start', 'stop', 'enabled', 'span', 'add_span']
+
+_fp = None
+_buffer = []
+_buffer_size = 1000
+_lock = RLock()
+
+def enabled():
+    return _fp is not None
+
+def _now():
+    return time.perf_counter() * 1000000
+
+def start(path, buffer_size=1000):
+    '''
+    start the tracer, the events are write to path every buffer_size events
+
+    @path:
+        the trace file
+
+    @buffer_size:
+        the max events keep in memory
+    '''
+    global _fp, _buffer_size
+    from .query import instrument
+    with _lock:
+        if _fp is not None:
+            stop()
+        _fp = open(path, 'w')
+        _fp.write('[\n')
+        _buffer_size = buffer_size
+        instrument.add_hook(after_execute=_on_sql)
+
+def stop():
+    '''flush the events and close the trace file'''
+    global _fp
+    from .query import instrument
+    with _lock:
+        if _fp is None:
+            return
+        instrument.remove_hook(after_execute=_on_sql)
+        _flush()
+        _fp.write(json.dumps({'name': 'process_name', 'ph': 'M',
+            'pid': os.getpid(), 'args': {'name': 'lee'}}))
+        _fp.write('\n]\n')
+        _fp.close()
+        _fp = None
+
+def _flush():
+    for event in _buffer:
+        _fp.write(json.dumps(event, default=str))
+        _fp.write(',\n')
+    _fp.flush()
+    _buffer.clear()
+
+def add_span(name, cat, ts, dur, args=None):
+    '''
+    add a complete event, ts and dur are microseconds of the perf_counter
+    clock
+    '''
+    event = {
+        'name': name,
+        'cat': cat,
+        'ph': 'X',
+        'ts': ts,
+        'dur': dur,
+        'pid': os.getpid(),
+        'tid': threading.get_ident(),
+    }
+    if args:
+        event['args'] = args
+    with _lock:
+        if _fp is None:
+            return
+        _buffer.append(event)
+        if len(_buffer) >= _buffer_size:
+            _flush()
+
+def _on_sql(event):
+    dur = event['elapsed'] * 1000000
+    add_span(event['fingerprint'], 'sql', _now() - dur, dur, {
+        'table': event['table'],
+        'operation': event['operation'],
+        'rows': event['rows'],
+    })
+
+class span(object):
+    '''
+    the context manager record the block as a span
+
+    eg::
+
+        with lee.trace.span('find_all', 'query', {'table': 'user'}):
+            ...
+    '''
+
+    __slots__ = ['name', 'cat', 'args', 'ts']
+
+    def __init__(self, name, cat, args=None):
+        self.name = name
+        self.cat = cat
+        self.args = args
+        self.ts = 0
+
+    def __enter__(self):
+        self.ts = _now()
+        return self
+
+    def __exit__(self, *args):
+        add_span(self.name, self.cat, self.ts, _now() - self.ts, self.args)
@@ -0,0 +1,294 @@
+'''
+the streaming export and import of the tables in JSON lines or CSV::
+
+    with open('user.jsonl', 'w') as f:
+        User.export(f, query={'created_at_$gte': start})
+
+    with open('user.jsonl') as f:
+        User.import_(f, batch_size=1000)
+
+or by the command line::
+
+    lee dump sqlite://data/main.db user -o user.jsonl.gz
+    lee load sqlite://data/copy.db user user.jsonl.gz --processes 4
+
+the rows are read by chunks from one cursor and written by multi-row INSERTs
+of batch_size rows in one transaction, so the memory does not grow with the
+table. the values are the stored values: the json columns are their text and
+the pickle columns their bytes, nothing is unpickled on the way.
+
+in JSON lines the bytes are {"$b64": "..."}. in CSV the first record is the
+column names, NULL is \\N, the bytes are \\x and the hex, the strings start
+with a backslash get one more, and every other value is text, so prefer JSON
+lines for the untyped sqlite columns.
+
+with processes the chunks are encoded or decoded by a process pool, the
+database side stay in the current process and the order of the rows is kept.
+'''
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+import argparse
+import base64
+import csv
+import gzip
+import io
+import itertools
+import json
+import sys
+import time
+
+__all__ = ['FORMATS', 'dump', 'load', 'dump_main', 'load_main']
+
+FORMATS = ('jsonl', 'csv')
+
+def _check_format(format):
+    if format not in FORMATS:
+        raise ValueError('unknown format {}, use one of {}'.format(format,
+            ', '.join(FORMATS)))
+
+def _json_default(val):
+    if isinstance(val, (bytes, bytearray, memoryview)):
+        return {'$b64': base64.b64encode(bytes(val)).decode('ascii')}
+    # the decimal and the datetime of MySQL
+    return str(val)
+
+def _json_hook(obj):
+    if len(obj) == 1 and '$b64' in obj:
+        return base64.b64decode(obj['$b64'])
+    return obj
+
+def _csv_value(val):
+    if val is None:
+        return '\\N'
+    if isinstance(val, (bytes, bytearray, memoryview)):
+        return '\\x' + bytes(val).hex()
+    if isinstance(val, str) and val.startswith('\\'):
+        return '\\' + val
+    return val
+
+def _csv_unvalue(val):
+    if val.startswith('\\'):
+        if val == '\\N':
+            return None
+        if val.startswith('\\x'):
+            return bytes.fromhex(val[2:])
+        return val[1:]
+    return val
+
+def _encode(format, keys, rows):
+    '''return the count of rows and the text'''
+    if format == 'jsonl':
+        return len(rows), ''.join(json.dumps(row, default=_json_default,
+            ensure_ascii=False, separators=(',', ':')) + '\n' for row in rows)
+
+    out = io.StringIO()
+    writer = csv.writer(out, lineterminator='\n')
+    writer.writerows([_csv_value(row.get(key)) for key in keys] for row in rows)
+    return len(rows), out.getvalue()
+
+def _decode(format, keys, text):
+    if format == 'jsonl':
+        return [json.loads(line, object_hook=_json_hook) \
+                for line in text.split('\n') if line.strip()]
+
+    return [dict(zip(keys, [_csv_unvalue(val) for val in record])) \
+            for record in csv.reader(io.StringIO(text)) if record]
+
+def _read_records(fp, format, count):
+    '''read the text of count records, a CSV record may be many lines'''
+    if format == 'jsonl':
+        return ''.join(itertools.islice(fp, count))
+
+    lines = []
+    quotes = 0
+    for line in fp:
+        lines.append(line)
+        # the record is not finished in a quoted field
+        quotes += line.count('"')
+        if quotes % 2 == 0:
+            count -= 1
+            if count <= 0:
+                break
+    return ''.join(lines)
+
+def _map(func, items, processes):
+    '''map func on the argument tuples of items in order, by a process pool'''
+    if not processes:
+        for args in items:
+            yield func(*args)
+        return
+
+    with ProcessPoolExecutor(processes) as pool:
+        pending = deque()
+        for args in items:
+            pending.append(pool.submit(func, *args))
+            # bound the chunks in flight
+            if len(pending) >= processes * 2:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+def dump(chunks, fp, format='jsonl', processes=0, progress=None):
+    '''
+    write the chunks (the lists of rows) to the text file fp, return the count
+    of rows
+
+    @progress:
+        the function called by the count of rows after every chunk
+    '''
+    _check_format(format)
+    keys = []
+
+    def items():
+        for rows in chunks:
+            if not rows:
+                continue
+            if not keys:
+                keys.extend(rows[0].keys())
+                if format == 'csv':
+                    out = io.StringIO()
+                    csv.writer(out, lineterminator='\n').writerow(keys)
+                    fp.write(out.getvalue())
+            yield (format, keys, rows)
+
+    count = 0
+    for size, text in _map(_encode, items(), processes):
+        fp.write(text)
+        count += size
+        if progress:
+            progress(count)
+    return count
+
+def load(fp, insert, format='jsonl', batch_size=1000, processes=0,
+        progress=None):
+    '''
+    read the rows of the text file fp and call insert by the lists of
+    batch_size rows, return the count of rows
+    '''
+    _check_format(format)
+    keys = None
+    if format == 'csv':
+        header = _read_records(fp, format, 1)
+        if not header:
+            return 0
+        keys = next(csv.reader(io.StringIO(header)))
+
+    def items():
+        while True:
+            text = _read_records(fp, format, batch_size)
+            if not text:
+                break
+            yield (format, keys, text)
+
+    count = 0
+    for rows in _map(_decode, items(), processes):
+        if not rows:
+            continue
+        insert(rows)
+        count += len(rows)
+        if progress:
+            progress(count)
+    return count
+
+def _open(path, mode):
+    if path == '-':
+        stream = sys.stdout if 'w' in mode else sys.stdin
+        return io.TextIOWrapper(stream.buffer, encoding='utf-8', newline='')
+    if path.endswith('.gz'):
+        return gzip.open(path, mode + 't', encoding='utf-8', newline='')
+    return open(path, mode, encoding='utf-8', newline='')
+
+def _guess_format(path, format):
+    if format:
+        return format
+    name = path[:-3] if path.endswith('.gz') else path
+    if name.endswith('.csv'):
+        return 'csv'
+    return 'jsonl'
+
+class _Progress(object):
+    '''print the count and the rate of rows to stderr'''
+
+    __slots__ = ['name', 'start', 'last']
+
+    def __init__(self, name):
+        self.name = name
+        self.start = time.time()
+        self.last = 0
+
+    def __call__(self, count, done=False):
+        now = time.time()
+        if not done and now - self.last < 0.5:
+            return
+        self.last = now
+        spent = now - self.start
+        sys.stderr.write('\r{}: {} rows, {:.0f} rows/s'.format(self.name, count,
+            count / spent if spent else 0))
+        if done:
+            sys.stderr.write('\n')
+        sys.stderr.flush()
+
+def _get_table(name):
+    '''the Table of the existing table name'''
+    from . import desc_table, show_tables
+    from .table import Table
+    from .models import Model
+
+    if name not in show_tables():
+        raise SystemExit('no table {}'.format(name))
+
+    # the SQL types of the database, the untyped sqlite columns have none
+    columns = [dict(column, type=column.get('type', '')) for column in desc_table(name)]
+    model = type('_' + name.capitalize(), (Model, ), {
+        'table_name': name,
+        'columns': columns,
+        'auto_create_table': False,
+        'auto_cache': False,
+        '__slots__': [],
+    })
+    return Table(model)
+
+def _parser(prog):
+    parser = argparse.ArgumentParser(prog=prog)
+    parser.add_argument('--format', choices=FORMATS, help='the format, default by the file name or jsonl')
+    parser.add_argument('--processes', type=int, default=0, help='encode or decode by a pool of processes')
+    parser.add_argument('-q', '--quiet', action='store_true', help='no progress')
+    parser.add_argument('path', help='sqlite://path/to/the/sqlite\nmysql://host:port?user=dbuser&passwd=dbpasswd&db=dbname')
+    parser.add_argument('table', help='the table name')
+    return parser
+
+def dump_main(argv=None):
+    parser = _parser('lee dump')
+    parser.add_argument('--query', help='the query of lee.utils.parse_query in JSON')
+    parser.add_argument('--chunk-size', type=int, default=1000, help='the rows fetched at once')
+    parser.add_argument('-o', '--output', default='-', help='the output file, .gz is compressed, default stdout')
+    args = parser.parse_args(argv)
+
+    from . import connect
+    connect(args.path)
+    table = _get_table(args.table)
+    progress = None if args.quiet else _Progress(args.table)
+    with _open(args.output, 'w') as fp:
+        count = table.export(fp, _guess_format(args.output, args.format),
+                query=json.loads(args.query) if args.query else None,
+                chunk_size=args.chunk_size, processes=args.processes,
+                progress=progress)
+    if progress:
+        progress(count, done=True)
+
+def load_main(argv=None):
+    parser = _parser('lee load')
+    parser.add_argument('--batch-size', type=int, default=1000, help='the rows inserted in one transaction')
+    parser.add_argument('input', nargs='?', default='-', help='the input file, .gz is compressed, default stdin')
+    args = parser.parse_args(argv)
+
+    from . import connect
+    connect(args.path)
+    table = _get_table(args.table)
+    progress = None if args.quiet else _Progress(args.table)
+    with _open(args.input, 'r') as fp:
+        count = table.import_(fp, _guess_format(args.input, args.format),
+                batch_size=args.batch_size, processes=args.processes,
+                progress=progress)
+    if progress:
+        progress(count, done=True)
@@ -5,7 +5,7 @@ import re
 import logging
 
 __all__ = ['unparse', 'parse', 'parse_query', 'logger', 'to_int', 'to_float',
-    'to_str']
+    'to_str', 'normalize_index']
 
 logger = logging.getLogger('lee')
 
@@ -387,6 +387,45 @@ def parse_query(columns, query = None, limit = '', order = None, group = None,
 
     return ' '.join(where), values
 
+def normalize_index(idx):
+    '''
+    normalize a spec_index or spec_uniq entry, the entry is a tuple of the
+    index name and the columns, or a dict::
+
+        {
+            'name': 'score_created',
+            'columns': ['score', ('created_at', 'DESC')],
+            'include': ['name'],       # covering columns append to the key
+            'where': '`score` > 0',    # partial index, sqlite only
+        }
+
+    >>> normalize_index(('name_score', 'name', ('score', 'desc')))
+    {'name': 'name_score', 'columns': [('name', 'ASC'), ('score', 'DESC')], 'include': [], 'where': None}
+    >>> normalize_index({'name': 'score', 'columns': ['score'], 'include': ['name'], 'where': '`score` > 0'})
+    {'name': 'score', 'columns': [('score', 'ASC')], 'include': ['name'], 'where': '`score` > 0'}
+    '''
+    if isinstance(idx, dict):
+        name = idx['name']
+        columns = idx['columns']
+        include = list(idx.get('include') or [])
+        where = idx.get('where') or None
+    else:
+        name = idx[0]
+        columns = idx[1:]
+        include = []
+        where = None
+
+    _columns = []
+    for column in columns:
+        if isinstance(column, (list, tuple)):
+            column, direction = column
+        else:
+            direction = 'ASC'
+        _columns.append((column, direction.upper()))
+
+    return {'name': name, 'columns': _columns, 'include': include,
+            'where': where}
+
 if __name__ == '__main__':
     import doctest
     doctest.testmod()
@@ -0,0 +1,273 @@
+'''
+capture the Table operations to an append-only JSON lines log and replay it.
+
+capture::
+
+    lee.workload.start_capture('/tmp/lee.workload.jsonl')
+    ...
+    lee.workload.stop_capture()
+
+replay against a copy of the database::
+
+    lee replay sqlite://path/to/copy.db /tmp/lee.workload.jsonl --threads 8
+
+the first line of the log is a header, every other line is one top-level
+operation (the operations issued by an other one are not recorded)::
+
+    {"ts": seconds since the capture start, "tid": thread id,
+     "table": table name, "op": method name, "args": [...], "kwargs": {...},
+     "elapsed": seconds}
+
+by default the values of the primary keys, queries and saved rows are
+anonymised: the numbers are kept, the other values are replaced by a salted
+hash, so the shape of the workload is kept but not the data.
+'''
+from _thread import RLock
+import argparse
+import functools
+import hashlib
+import importlib
+import inspect
+import json
+import os
+import queue
+import threading
+import time
+
+__all__ = ['start_capture', 'stop_capture', 'capturing', 'captured', 'replay',
+    'main']
+
+_fp = None
+_salt = ''
+_anonymize = True
+_start = 0
+_lock = RLock()
+_local = threading.local()
+
+def capturing():
+    return _fp is not None
+
+def start_capture(path, anonymize=True):
+    '''
+    start to record the Table operations to path, the log is append
+
+    @anonymize:
+        replace the values by salted hash
+    '''
+    global _fp, _salt, _anonymize, _start
+    with _lock:
+        if _fp is not None:
+            stop_capture()
+        _fp = open(path, 'a')
+        _salt = os.urandom(8).hex()
+        _anonymize = anonymize
+        _start = time.time()
+        _fp.write(json.dumps({'version': 1, 'start': _start,
+            'anonymize': anonymize}) + '\n')
+
+def stop_capture():
+    global _fp
+    with _lock:
+        if _fp is not None:
+            _fp.close()
+            _fp = None
+
+def _anonymize_value(val):
+    if val is None or isinstance(val, (bool, int, float)):
+        return val
+    if isinstance(val, (list, tuple)):
+        return [_anonymize_value(v) for v in val]
+    if not _anonymize:
+        return val if isinstance(val, str) else repr(val)
+    digest = hashlib.md5((_salt + repr(val)).encode()).hexdigest()[:12]
+    return 'anon:' + digest
+
+def _anonymize_row(row):
+    return dict((key, _anonymize_value(val)) for key, val in row.items())
+
+def _anonymize_query(query):
+    if not query:
+        return query
+    if isinstance(query, dict):
+        return _anonymize_row(query)
+    return [list(item[:-1]) + [_anonymize_value(item[-1])] for item in query]
+
+_anonymizers = {
+    'args': _anonymize_value,
+    'query': _anonymize_query,
+    'obj': _anonymize_row,
+    'changed': _anonymize_row,
+}
+
+def _write(table_name, op, func, args, kwargs, start, elapsed):
+    params = inspect.signature(func).bind(None, *args, **kwargs).arguments
+    params.pop('self', None)
+    varargs = params.pop('args', ())
+    record = {
+        'ts': start - _start,
+        'tid': threading.get_ident(),
+        'table': table_name,
+        'op': op,
+        'args': _anonymize_value(list(varargs)),
+        'kwargs': dict((key, _anonymizers.get(key, lambda x: x)(val)) \
+                for key, val in params.items()),
+        'elapsed': elapsed,
+    }
+    line = json.dumps(record, default=repr, separators=(',', ':'))
+    with _lock:
+        if _fp is not None:
+            _fp.write(line + '\n')
+
+def captured(op):
+    '''the decorator of the Table methods to record'''
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(self, *args, **kwargs):
+            if _fp is None or getattr(_local, 'active', False):
+                return func(self, *args, **kwargs)
+
+            _local.active = True
+            start = time.time()
+            try:
+                return func(self, *args, **kwargs)
+            finally:
+                _local.active = False
+                try:
+                    _write(self._model.table_name, op, func, args, kwargs,
+                            start, time.time() - start)
+                except Exception:
+                    pass
+        return wrapper
+    return decorator
+
+def _load_tables(names, models=None):
+    from . import Table, Model, desc_table
+    tables = {}
+    if models:
+        module = importlib.import_module(models)
+        for val in vars(module).values():
+            if isinstance(val, Table):
+                tables[val.name] = val
+
+    for name in names:
+        if name in tables:
+            continue
+        # the SQL types of the database, the untyped sqlite columns have none
+        columns = [dict(column, type=column.get('type', '')) \
+                for column in desc_table(name)]
+        model = type('_Replay_{}'.format(name), (Model, ), {
+            'table_name': name,
+            'columns': columns,
+            'auto_create_table': False,
+            '__slots__': [],
+        })
+        tables[name] = Table(model)
+    return tables
+
+def _percentile(times, pct):
+    return times[min(int(len(times) * pct), len(times) - 1)]
+
+def replay(path, threads=1, speed=1.0, models=None):
+    '''
+    replay the log on the connected database, return the throughput and the
+    latency percentiles (seconds) of all the operations and of each one
+
+    @threads:
+        the count of worker threads
+
+    @speed:
+        the replay speed, 2 is twice faster than the capture, 0 is as fast as
+        possible
+
+    @models:
+        the module name define the Tables, default build the Tables from
+        the database schema
+    '''
+    with open(path) as f:
+        records = [json.loads(line) for line in f if line.strip()]
+    records = [record for record in records if 'op' in record]
+    tables = _load_tables(set(record['table'] for record in records), models)
+
+    jobs = queue.Queue(maxsize=threads * 100)
+    latency = []
+    errors = []
+    lock = RLock()
+
+    def worker():
+        while True:
+            record = jobs.get()
+            if record is None:
+                break
+            func = getattr(tables[record['table']], record['op'])
+            start = time.perf_counter()
+            try:
+                func(*record['args'], **record['kwargs'])
+            except Exception as e:
+                with lock:
+                    errors.append(repr(e))
+            with lock:
+                latency.append((record['op'], time.perf_counter() - start))
+
+    workers = [threading.Thread(target=worker) for _ in range(threads)]
+    for thread in workers:
+        thread.start()
+
+    start = time.perf_counter()
+    for record in records:
+        if speed > 0:
+            delay = record['ts'] / speed - (time.perf_counter() - start)
+            if delay > 0:
+                time.sleep(delay)
+        jobs.put(record)
+
+    for thread in workers:
+        jobs.put(None)
+    for thread in workers:
+        thread.join()
+    elapsed = time.perf_counter() - start
+
+    def summary(times):
+        times = sorted(times)
+        if not times:
+            return {'count': 0}
+        return {
+            'count': len(times),
+            'p50': _percentile(times, 0.5),
+            'p95': _percentile(times, 0.95),
+            'p99': _percentile(times, 0.99),
+            'max': times[-1],
+        }
+
+    ops = {}
+    for op, spent in latency:
+        ops.setdefault(op, []).append(spent)
+
+    return {
+        'count': len(latency),
+        'errors': len(errors),
+        'elapsed': elapsed,
+        'throughput': len(latency) / elapsed if elapsed else 0,
+        'latency': summary([spent for _, spent in latency]),
+        'ops': dict((op, summary(times)) for op, times in ops.items()),
+    }
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='lee replay')
+    parser.add_argument('--threads', type=int, default=1, help='the count of worker threads')
+    parser.add_argument('--speed', type=float, default=1.0,
+            help='the replay speed, 2 is twice faster, 0 is as fast as possible')
+    parser.add_argument('--models', help='the module define the Tables, default read the database schema')
+    parser.add_argument('-o', '--output', help='the output file of the JSON result')
+    parser.add_argument('path', help='sqlite://path/to/the/sqlite\nmysql://host:port?user=dbuser&passwd=dbpasswd&db=dbname')
+    parser.add_argument('log', help='the workload log')
+    args = parser.parse_args(argv)
+
+    from . import connect
+    connect(args.path)
+    result = replay(args.log, args.threads, args.speed, args.models)
+    output = json.dumps(result, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output)
+    else:
+        print(output)
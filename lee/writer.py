@@ -0,0 +1,238 @@
+'''
+the write-behind writer of the high volume append tables, enable it on the
+model::
+
+    class Event(Model):
+        table_name = 'event'
+        write_behind = True
+        write_behind_batch = 500     # the max rows of one flush
+        write_behind_interval = 1    # the max seconds a row wait in the queue
+        write_behind_max = 10000     # the max rows in the queue
+        columns = [...]
+
+Table.save and strict_save only put the row in the queue of the table and
+return None, a background thread writes the queue by batches: the rows
+without primary key and unique key by multi-row INSERTs in one transaction,
+the other saves by Table.save, the saves and strict_saves in a row of the
+same primary key (or unique key) are coalesced to one.
+
+the save blocks when the queue is full. the queues are flushed at exit, or
+by lee.writer.flush(). if a batch of INSERTs fails it is rolled back and the
+rows are inserted one by one, only the failed rows are logged and dropped.
+'''
+from .utils import logger, parse
+from _thread import RLock
+import atexit
+import queue
+import threading
+import time
+
+__all__ = ['get', 'flush', 'flushing', 'insert_values', 'Writer']
+
+_writers = {}
+_lock = RLock()
+_local = threading.local()
+_FLUSH = object()
+
+# the max bind variables of one sqlite statement
+MAX_VARIABLES = 999
+
+def flushing():
+    '''if the current thread is writing a batch'''
+    return getattr(_local, 'flushing', False)
+
+class Writer(object):
+    '''the write-behind queue of a table'''
+
+    __slots__ = ['table', 'batch_size', 'interval', 'queue', 'thread']
+
+    def __init__(self, table):
+        model = table._model
+        self.table = table
+        self.batch_size = model.write_behind_batch
+        self.interval = model.write_behind_interval
+        self.queue = queue.Queue(model.write_behind_max)
+        self.thread = threading.Thread(target=self._run, daemon=True,
+                name='lee-writer-{}'.format(model.table_name))
+        self.thread.start()
+
+    def _with_defaults(self, obj):
+        obj = dict(obj)
+        for key, val in self.table.defaults.items():
+            if obj.get(key) is None:
+                obj[key] = val() if callable(val) else val
+
+        for column in self.table._model.columns:
+            if column.get('required') and obj.get(column['name']) is None:
+                raise Exception("{} {} is required.".format(
+                    self.table._model.table_name, column['name']))
+        return obj
+
+    def save(self, obj):
+        key = self._pk(obj)
+        if key is None:
+            # the row of the unique key is updated by Table.save if it exists
+            key = self._unique_key(obj)
+        if key is None:
+            # the defaults are the values of the save time
+            obj = self._with_defaults(obj)
+        self.queue.put(('save', key, dict(obj), None))
+
+    def strict_save(self, obj, changed):
+        pk = self._pk(obj)
+        if pk is None:
+            logger.error('UPDATE {}'.format(str(changed)))
+            return
+        self.queue.put(('strict_save', pk, dict(obj), dict(changed)))
+
+    def flush(self):
+        '''write all the rows in the queue and wait them written'''
+        if not self.thread.is_alive():
+            return
+        self.queue.put(_FLUSH)
+        self.queue.join()
+
+    def _pk(self, obj):
+        pk = tuple(obj.get(pri) for pri in self.table._pris)
+        if not pk or None in pk:
+            return None
+        return pk
+
+    def _unique_key(self, obj):
+        for uniq in self.table._uniqs:
+            if obj.get(uniq) is not None:
+                return ('unique', uniq, obj[uniq])
+        return None
+
+    def _run(self):
+        while True:
+            batch = [self.queue.get()]
+            deadline = time.time() + self.interval
+            while batch[-1] is not _FLUSH and len(batch) < self.batch_size:
+                timeout = deadline - time.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(self.queue.get(timeout=timeout))
+                except queue.Empty:
+                    break
+
+            items = [item for item in batch if item is not _FLUSH]
+            _local.flushing = True
+            try:
+                if items:
+                    self._write(items)
+            except Exception as e:
+                logger.exception(e)
+            finally:
+                _local.flushing = False
+                for _ in batch:
+                    self.queue.task_done()
+
+    def _write(self, items):
+        inserts = []
+        ops = []
+        for op, pk, obj, changed in items:
+            if pk is None:
+                inserts.append(obj)
+                continue
+            # coalesce the same operations of the same primary key in a row
+            last = ops[-1] if ops else None
+            if last and last[0] == op and last[1] == pk:
+                last[2].update(obj)
+                if changed:
+                    last[3].update(changed)
+            else:
+                ops.append([op, pk, obj, changed])
+
+        if inserts:
+            self._insert(inserts)
+
+        for op, pk, obj, changed in ops:
+            try:
+                if op == 'save':
+                    self.table.save(obj)
+                else:
+                    self.table.strict_save(obj, changed)
+            except Exception as e:
+                logger.error('%s %s of %s dropped: %s',
+                        self.table._model.table_name, op, pk, e)
+
+    def _insert(self, rows):
+        '''insert the rows by multi-row INSERTs of the same columns'''
+        from .query import query
+
+        table_name = self.table._model.table_name
+        columns = self.table._model.columns
+        # the runs of the rows with the same columns, keep the insert order
+        groups = []
+        for row in rows:
+            row = parse(row, columns)
+            keys = tuple(column['name'] for column in columns \
+                    if row.get(column['name']) is not None)
+            if not groups or groups[-1][0] != keys:
+                groups.append((keys, []))
+            groups[-1][1].append(tuple(row[key] for key in keys))
+
+        @query(autocommit=True)
+        def _execute(groups, cur):
+            try:
+                for keys, values in groups:
+                    insert_values(cur, table_name, keys, values)
+            except Exception:
+                # the chunks inserted before the error are never committed
+                cur.connection.rollback()
+                raise
+            # the MySQL query wrapper return None on the IntegrityError
+            return True
+
+        try:
+            done = _execute(groups)
+        except Exception as e:
+            logger.warning('%s insert of %s rows failed, retry one by one: %s',
+                    table_name, len(rows), e)
+            done = False
+
+        if not done:
+            for keys, values in groups:
+                for value in values:
+                    try:
+                        done = _execute([(keys, [value])])
+                    except Exception as e:
+                        logger.error('%s row %r dropped: %s', table_name,
+                                dict(zip(keys, value)), e)
+                        continue
+                    if not done:
+                        logger.error('%s row %r dropped', table_name,
+                                dict(zip(keys, value)))
+        self.table._invalidate_queries()
+
+def insert_values(cur, table_name, keys, values):
+    '''insert the values (the tuples of the keys) by multi-row INSERTs'''
+    part_k = ', '.join(['`{}`'.format(k) for k in keys])
+    part_v = '({})'.format(', '.join(['?'] * len(keys)))
+    size = max(MAX_VARIABLES // max(len(keys), 1), 1)
+    for start in range(0, len(values), size):
+        chunk = values[start:start + size]
+        sql = 'INSERT INTO `{}` ({}) VALUES {}'.format(table_name,
+                part_k, ', '.join([part_v] * len(chunk)))
+        args = tuple(val for value in chunk for val in value)
+        logger.debug('Query> SQL: %s | ARGS: %s', sql, args)
+        cur.execute(sql, args)
+
+def get(table):
+    '''the writer of the table, start it on the first use'''
+    writer = _writers.get(table._model.table_name)
+    if writer is None:
+        with _lock:
+            writer = _writers.get(table._model.table_name)
+            if writer is None:
+                writer = _writers[table._model.table_name] = Writer(table)
+    return writer
+
+def flush():
+    '''write all the rows in the queues of all the tables'''
+    for writer in list(_writers.values()):
+        writer.flush()
+
+atexit.register(flush)
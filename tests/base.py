@@ -0,0 +1,57 @@
+'''the shared fixture of the tests, every test runs on new sqlite databases'''
+from lee import conf, schema, writer, counter, idgen, replica, shard
+from lee import cache as mc
+from lee.cache import lru_cache, tinylfu, metrics
+from lee.table import Table
+from lee.query import add_hook, remove_hook
+import lee
+import os
+import shutil
+import tempfile
+import unittest
+
+class TestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp(prefix='lee-test-')
+        _reset()
+
+    def tearDown(self):
+        writer.flush()
+        counter.flush()
+        _reset()
+        shutil.rmtree(self.tmp, ignore_errors=True)
+
+    def path(self, name):
+        return os.path.join(self.tmp, name)
+
+    def dsn(self, name='main.db'):
+        return 'sqlite://' + self.path(name)
+
+    def connect(self, name='main.db', **kwargs):
+        # the table list is cached for the first database
+        Table.TABLES = None
+        lee.connect(self.dsn(name), **kwargs)
+
+    def record_sql(self):
+        '''the list of the sql executed from now'''
+        sqls = []
+        hook = lambda event: sqls.append(event['sql'])
+        add_hook(after_execute=hook)
+        self.addCleanup(remove_hook, after_execute=hook)
+        return sqls
+
+def _reset():
+    Table.TABLES = None
+    del schema._pending[:]
+    lru_cache.clear()
+    tinylfu.clear()
+    metrics.reset()
+    mc._generations.clear()
+    writer._writers.clear()
+    counter._accumulators.clear()
+    counter._table = None
+    idgen._table = None
+    shard.configure(None)
+    replica.configure(None)
+    conf.memcached = False
@@ -0,0 +1,65 @@
+from lee import Model, Table, advisor, workload
+from tests.base import TestCase
+import json
+
+class _Order(Model):
+    table_name = 'orders'
+    columns = [
+        {'name': 'id',         'type': 'int', 'primary': True, 'auto_increment': True},
+        {'name': 'user_id',    'type': 'int'},
+        {'name': 'status',     'type': 'int'},
+        {'name': 'created_at', 'type': 'int'},
+    ]
+
+class AdvisorTest(TestCase):
+
+    def setUp(self):
+        super().setUp()
+        advisor.reset()
+        self.addCleanup(advisor.reset)
+        self.connect(index_advisor=True)
+        self.Order = Table(_Order)
+
+    def test_observe_shapes(self):
+        self.Order.find_all({'user_id': 1}, order={'created_at': 'desc'})
+        self.Order.find_all({'user_id': 2}, order={'created_at': 'desc'})
+        self.Order.find_all({'status_$gt': 1})
+        shapes = advisor.shapes()
+        self.assertEqual(len(shapes), 2)
+        self.assertEqual(shapes[0]['count'], 2)
+        self.assertEqual(shapes[0]['filters'], (('user_id', 'eq'), ))
+        self.assertEqual(shapes[0]['order'], (('created_at', 'DESC'), ))
+
+    def test_advise_index(self):
+        self.Order.find_all({'user_id': 1, 'created_at_$gt': 5},
+                order={'id': 'asc'})
+        result = advisor.advise()
+        self.assertEqual(len(result), 1)
+        item = result[0]
+        self.assertTrue(item['full_scan'])
+        self.assertEqual(item['spec_index'],
+                ('user_id_created_at', 'user_id', 'created_at'))
+        self.assertIn('CREATE INDEX', item['sql_index'].upper())
+
+        self.assertEqual(advisor.advise(min_count=2), [])
+        advisor.reset()
+        self.assertEqual(advisor.shapes(), [])
+
+    def test_or_query_no_index(self):
+        self.Order.find_all({'user_id': 1, 'status': 2}, is_or=True)
+        item = advisor.advise()[0]
+        self.assertIsNone(item['spec_index'])
+
+    def test_load_log(self):
+        path = self.path('workload.jsonl')
+        workload.start_capture(path, anonymize=False)
+        self.addCleanup(workload.stop_capture)
+        self.Order.find_all({'status': 1})
+        self.Order.count({'status': 1})
+        workload.stop_capture()
+        advisor.reset()
+
+        advisor.load_log(path)
+        shapes = advisor.shapes()
+        self.assertEqual(len(shapes), 1)
+        self.assertEqual(shapes[0]['filters'], (('status', 'eq'), ))
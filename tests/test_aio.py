@@ -0,0 +1,82 @@
+from lee import Model, Table, aio
+from tests.base import TestCase
+import asyncio
+import threading
+import time
+
+class _Visit(Model):
+    table_name = 'visit'
+    columns = [
+        {'name': 'id',     'type': 'int', 'primary': True, 'auto_increment': True},
+        {'name': 'name',   'type': 'str', 'unique': True},
+        {'name': 'visits', 'type': 'int', 'default': 0},
+    ]
+
+class AioTest(TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.connect(lru_cache=True)
+        self.addCleanup(aio.shutdown)
+        self.Visit = Table(_Visit)
+        self.AsyncVisit = aio.AsyncTable(self.Visit, max_concurrency=2)
+
+    def test_crud(self):
+        AsyncVisit = self.AsyncVisit
+
+        async def main():
+            pk = await AsyncVisit.save({'name': 'a'})
+            user = await AsyncVisit.find_by_id(pk)
+            user['visits'] += 1
+            await AsyncVisit.strict_save(user)
+            # the other attributes are wrapped too
+            found = await AsyncVisit.find_by_name('a')
+            count = await AsyncVisit.count()
+            await AsyncVisit.del_by_id(pk)
+            return found, count, await AsyncVisit.find_all()
+
+        found, count, rest = asyncio.run(main())
+        self.assertEqual(found['visits'], 1)
+        self.assertEqual(count, 1)
+        self.assertEqual(rest, [])
+
+    def test_max_concurrency(self):
+        running = []
+        peak = []
+        lock = threading.Lock()
+
+        def slow():
+            with lock:
+                running.append(1)
+                peak.append(len(running))
+            time.sleep(0.02)
+            with lock:
+                running.pop()
+
+        async def main():
+            await asyncio.gather(*[self.AsyncVisit._run(slow) \
+                    for _ in range(6)])
+
+        asyncio.run(main())
+        self.assertEqual(len(peak), 6)
+        self.assertLessEqual(max(peak), 2)
+
+    def test_timeout(self):
+        async def main():
+            await aio.run(time.sleep, 0.2, timeout=0.01)
+
+        with self.assertRaises(asyncio.TimeoutError):
+            asyncio.run(main())
+
+    def test_cache_helpers(self):
+        async def main():
+            await aio.cache_set('k', 1)
+            await aio.cache_set_multi({'a': 2, 'b': 3})
+            got = await aio.cache_get('k'), await aio.cache_get_multi(['a', 'b'])
+            await aio.cache_delete('k')
+            return got, await aio.cache_get('k')
+
+        (val, vals), deleted = asyncio.run(main())
+        self.assertEqual(val, 1)
+        self.assertEqual(vals, {'a': 2, 'b': 3})
+        self.assertIsNone(deleted)
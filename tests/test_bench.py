@@ -0,0 +1,35 @@
+from lee import bench
+from tests.base import TestCase
+import contextlib
+import io
+import json
+
+class BenchTest(TestCase):
+
+    def test_run(self):
+        result = bench.run(self.dsn(), rows=20)
+        self.assertEqual(result['rows'], 20)
+        names = set((ret['name'], ret['backend']) for ret in result['results'])
+        for backend in ('uncache', 'lru'):
+            self.assertIn(('save_insert', backend), names)
+            self.assertIn(('find_by_id_hit', backend), names)
+            self.assertIn(('find_all_10', backend), names)
+            self.assertNotIn(('find_all_100', backend), names)
+        self.assertIn(('parse', 'none'), names)
+        for ret in result['results']:
+            self.assertLessEqual(ret['p50_us'], ret['p95_us'])
+            self.assertGreater(ret['count'], 0)
+
+    def test_main_output(self):
+        output = self.path('result.json')
+        bench.main(['--rows', '10', '--backend', 'lru', '-o', output,
+            self.dsn()])
+        with open(output) as f:
+            result = json.load(f)
+        self.assertEqual(set(ret['backend'] for ret in result['results']),
+                {'lru', 'none'})
+
+        out = io.StringIO()
+        with contextlib.redirect_stdout(out):
+            bench.main(['--rows', '10', '--backend', 'uncache', self.dsn()])
+        self.assertEqual(json.loads(out.getvalue())['rows'], 10)
@@ -0,0 +1,58 @@
+from lee import Model, Table, query_budget
+from lee.budget import QueryBudgetExceeded
+from tests.base import TestCase
+
+class _Item(Model):
+    table_name = 'item'
+    columns = [
+        {'name': 'id', 'type': 'int', 'primary': True},
+    ]
+
+class QueryBudgetTest(TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.connect()
+        self.Item = Table(_Item)
+        for idx in range(1, 6):
+            self.Item.save({'id': idx})
+
+    def test_counts(self):
+        with query_budget() as budget:
+            self.Item.find_all()
+            self.Item.find_by_id(1)
+        self.assertEqual(budget.queries, 2)
+        self.assertEqual(budget.errors(), [])
+
+    def test_n_plus_one(self):
+        with self.assertRaises(QueryBudgetExceeded):
+            with query_budget(max_repeats=2, raise_error=True):
+                for idx in range(1, 6):
+                    self.Item.find_by_id(idx)
+
+    def test_max_queries_warns(self):
+        with self.assertLogs('lee', 'WARNING'):
+            with query_budget(max_queries=1) as budget:
+                self.Item.find_all()
+                self.Item.find_all()
+        self.assertEqual(len(budget.repeated()), 1)
+
+    def test_cache_calls(self):
+        self.connect('cached.db', lru_cache=True)
+        Item = Table(_Item)
+        Item.save({'id': 1})
+        with query_budget(max_cache_calls=100) as budget:
+            Item.find_by_id(1)
+            Item.find_by_id(1)
+        self.assertGreater(budget.cache_calls, 0)
+        self.assertEqual(budget.errors(), [])
+
+    def test_nested_and_hooks_removed(self):
+        from lee.query import instrument
+        with query_budget() as outer:
+            with query_budget() as inner:
+                self.Item.find_all()
+            self.Item.find_all()
+        self.assertEqual(inner.queries, 1)
+        self.assertEqual(outer.queries, 2)
+        self.assertFalse(instrument.enabled())
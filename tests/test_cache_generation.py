@@ -0,0 +1,101 @@
+from lee import Model, Table, conf, query
+from lee import cache as mc
+from lee.cache import lru_cache
+from unittest import mock
+from tests.base import TestCase
+
+class _User(Model):
+    table_name = 'user'
+    columns = [
+        {'name': 'id',   'type': 'int', 'primary': True, 'auto_increment': True},
+        {'name': 'name', 'type': 'str'},
+    ]
+
+class _Untyped(Model):
+    # the columns of desc_table have no type for the untyped sqlite columns
+    table_name = 'untyped'
+    auto_create_table = False
+    columns = [
+        {'name': 'id',   'type': 'int', 'primary': True},
+        {'name': 'data'},
+    ]
+
+class GenerationTest(TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.connect(lru_cache=True, lru_cache_max=1000)
+        self.ops = []
+        mc.add_hook(self.ops.append)
+
+    def tearDown(self):
+        mc.remove_hook(self.ops.append)
+        super().tearDown()
+
+    def test_invalidate_all(self):
+        User = Table(_User)
+        User.save({'name': 'a'})
+        User.find_by_id(1)
+        key = User._gen_cache_key([1])
+        self.assertIsNotNone(mc.get(key))
+
+        User.invalidate_all()
+        self.assertNotEqual(User._gen_cache_key([1]), key)
+        self.assertEqual(User.find_by_id(1)['name'], 'a')
+
+    def test_bump_is_one_incr(self):
+        old = mc.generation('ns')
+        del self.ops[:]
+        new = mc.bump_generation('ns')
+        self.assertEqual(self.ops, ['incr'])
+        self.assertEqual(new, old + 1)
+        self.assertEqual(mc.generation('ns'), new)
+
+    def test_bump_missing_key(self):
+        old = mc.generation('ns')
+        lru_cache.clear()
+        new = mc.bump_generation('ns')
+        self.assertGreaterEqual(new, mc._MIN_GENERATION)
+        self.assertEqual(mc.generation('ns'), new)
+        self.assertNotEqual(new, 1)
+        self.assertGreaterEqual(new, old)
+
+    def test_concurrent_bumps(self):
+        old = mc.generation('ns')
+        mc.bump_generation('ns')
+        mc.bump_generation('ns')
+        self.assertEqual(mc.generation('ns'), old + 2)
+
+    def test_memcached_generation_cached_in_process(self):
+        conf.memcached = ['127.0.0.1:11211']
+        conf.generation_cache_time = 60
+        with mock.patch.object(mc, '_dispatch', return_value=lru_cache):
+            val = mc.generation('ns')
+            del self.ops[:]
+            self.assertEqual(mc.generation('ns'), val)
+            self.assertEqual(self.ops, [])
+
+            # the bump of this process is seen at once
+            self.assertEqual(mc.generation('ns'), val)
+            new = mc.bump_generation('ns')
+            self.assertEqual(mc.generation('ns'), new)
+
+            conf.generation_cache_time = 0
+            lru_cache.set(mc._generation_key('ns'), new + 5)
+            self.assertEqual(mc.generation('ns'), new + 5)
+
+    def test_memcached_generation_strict_by_default(self):
+        self.assertEqual(conf.generation_cache_time, 0)
+        conf.memcached = ['127.0.0.1:11211']
+        with mock.patch.object(mc, '_dispatch', return_value=lru_cache):
+            val = mc.generation('ns')
+            # the bump of an other process
+            lru_cache.set(mc._generation_key('ns'), val + 1)
+            self.assertEqual(mc.generation('ns'), val + 1)
+
+    def test_schema_hash_without_type(self):
+        query(autocommit=True)(lambda cur: cur.execute(
+            'CREATE TABLE `untyped` (`id` INTEGER PRIMARY KEY, `data`)'))()
+        Untyped = Table(_Untyped)
+        self.assertEqual(len(Untyped._schema_hash), 8)
+        self.assertEqual(Untyped.count(), 0)
@@ -0,0 +1,77 @@
+from lee import Model, Table
+from lee import cache as mc
+from tests.base import TestCase
+
+class _Item(Model):
+    table_name = 'item'
+    cache_hydrate = True
+    columns = [
+        {'name': 'id',   'type': 'int', 'primary': True, 'auto_increment': True},
+        {'name': 'kind', 'type': 'str'},
+    ]
+
+class _CachedItem(_Item):
+    query_cache = True
+
+class HydrateTest(TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.connect(lru_cache=True, lru_cache_max=1000)
+        self.ops = []
+        mc.add_hook(self.ops.append)
+        self.addCleanup(mc.remove_hook, self.ops.append)
+
+    def _fill(self, model):
+        table = Table(model)
+        for idx in range(10):
+            table.save({'kind': 'odd' if idx % 2 else 'even'})
+        return table
+
+    def test_find_all_selects_primary_keys(self):
+        Item = self._fill(_Item)
+        first = Item.find_all({'kind': 'odd'}, order='id')
+        sqls = self.record_sql()
+        again = Item.find_all({'kind': 'odd'}, order='id')
+        self.assertEqual(len(sqls), 1)
+        self.assertTrue(sqls[0].startswith('SELECT `id` FROM'))
+        self.assertEqual([dict(item) for item in again], [dict(item) for item in first])
+
+    def test_query_cache_miss_sets_rows_once(self):
+        Item = self._fill(_CachedItem)
+        # create the generation keys first
+        Item.find_all({'kind': 'none'})
+        mc.generation('item')
+        del self.ops[:]
+        rets = Item.find_all({'kind': 'even'})
+        self.assertEqual(len(rets), 5)
+        self.assertEqual(self.ops.count('set_multi'), 1)
+        # only the query result key, the rows are set by the multi set
+        self.assertEqual(self.ops.count('set'), 1)
+
+        sqls = self.record_sql()
+        self.assertEqual(len(Item.find_all({'kind': 'even'})), 5)
+        self.assertEqual(sqls, [])
+
+    def test_find_one_fills_row_cache(self):
+        Item = self._fill(_CachedItem)
+        Item.find_one({'id': 3})
+        sqls = self.record_sql()
+        self.assertEqual(Item.find_one({'id': 3})['id'], 3)
+        self.assertEqual(sqls, [])
+
+    def test_iter_all_hydrated(self):
+        Item = self._fill(_Item)
+        Item.warm_cache()
+        sqls = self.record_sql()
+        ids = [item['id'] for item in Item.iter_all({'kind': 'odd'}, order='id',
+            chunk_size=2)]
+        self.assertEqual(ids, [2, 4, 6, 8, 10])
+        self.assertEqual(len(sqls), 1)
+        self.assertTrue(sqls[0].startswith('SELECT `id` FROM'))
+
+    def test_iter_all_loads_missing_rows(self):
+        Item = self._fill(_Item)
+        items = list(Item.iter_all(chunk_size=3))
+        self.assertEqual([item['id'] for item in items], list(range(1, 11)))
+        self.assertEqual(items[0]['kind'], 'even')
@@ -0,0 +1,72 @@
+from lee import Model, Table
+from lee.cache import metrics, tinylfu
+from tests.base import TestCase
+
+class _Hot(Model):
+    table_name = 'hot'
+    columns = [
+        {'name': 'id', 'type': 'int', 'primary': True},
+    ]
+
+class _Cold(Model):
+    table_name = 'cold'
+    columns = [
+        {'name': 'id', 'type': 'int', 'primary': True},
+    ]
+
+class CacheMetricsTest(TestCase):
+
+    def _fill(self, model, count):
+        table = Table(model)
+        for idx in range(1, count + 1):
+            table.save({'id': idx})
+        return table
+
+    def test_hits_misses_hot_keys(self):
+        self.connect(lru_cache=True, lru_cache_max=1000, cache_metrics=True)
+        Hot = self._fill(_Hot, 3)
+        Hot.reset_cache_metrics()
+        Hot.find_by_id(1)
+        Hot.find_by_id(1)
+        Hot.find_by_id(1)
+        Hot.find_by_id(2)
+        stats = Hot.cache_metrics()
+        self.assertEqual(stats['misses'], 2)
+        self.assertEqual(stats['hits'], 2)
+        self.assertEqual(stats['sets'], 2)
+        self.assertEqual(stats['hot_keys'][0]['key'], '1')
+        self.assertEqual(stats['hot_keys'][0]['count'], 3)
+
+    def _evict(self):
+        Hot = self._fill(_Hot, 5)
+        Cold = self._fill(_Cold, 40)
+        metrics.reset()
+        for idx in range(1, 6):
+            Hot.find_by_id(idx)
+        for idx in range(1, 41):
+            Cold.find_by_id(idx)
+        return Hot, Cold
+
+    def test_lru_evictions_per_table(self):
+        self.connect(lru_cache=True, lru_cache_max=10, cache_metrics=True)
+        Hot, Cold = self._evict()
+        self.assertGreater(Cold.cache_metrics()['evictions'], 0)
+        self.assertGreater(Hot.cache_metrics()['evictions'], 0)
+        total = Hot.cache_metrics()['evictions'] + Cold.cache_metrics()['evictions']
+        # the generation keys are evicted too
+        self.assertLessEqual(total, metrics.snapshot()['backend']['evictions'])
+
+    def test_tinylfu_evictions_per_table(self):
+        self.connect(lru_cache=True, lru_cache_max=10, cache_policy='tinylfu',
+                cache_metrics=True)
+        tinylfu.clear()
+        Hot, Cold = self._evict()
+        self.assertGreater(Cold.cache_metrics()['evictions'], 0)
+        self.assertEqual(sum(table['evictions'] for table in \
+                metrics.snapshot()['tables'].values()),
+                metrics.snapshot()['backend']['evictions'])
+
+    def test_no_metrics_when_disabled(self):
+        self.connect(lru_cache=True, lru_cache_max=10)
+        self._evict()
+        self.assertEqual(metrics.snapshot()['tables'], {})
@@ -0,0 +1,59 @@
+from lee import counter
+from tests.base import TestCase
+import threading
+
+class ShardedCounterTest(TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.connect(lru_cache=True)
+
+    def rows(self, name):
+        return counter._get_table().find_all({'name': name})
+
+    def test_incr_value(self):
+        views = counter.ShardedCounter('views', shards=4, cache_timeout=0)
+        for _ in range(40):
+            views.incr()
+        views.decr(5)
+        self.assertEqual(views.value(), 35)
+        self.assertLessEqual(len(self.rows('views')), 4)
+        self.assertEqual(counter.ShardedCounter('other').value(), 0)
+
+    def test_thread_affinity(self):
+        likes = counter.ShardedCounter('likes', shards=8, affinity='thread',
+                cache_timeout=0)
+
+        def work():
+            for _ in range(25):
+                likes.incr()
+        threads = [threading.Thread(target=work) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(likes.value(), 100)
+
+    def test_cached_value(self):
+        views = counter.ShardedCounter('views', shards=2, cache_timeout=60)
+        views.incr()
+        self.assertEqual(views.value(), 1)
+        views.incr()
+        self.assertEqual(views.value(), 1)
+        views.cache_timeout = 0
+        self.assertEqual(views.value(), 2)
+
+    def test_resize(self):
+        views = counter.ShardedCounter('views', shards=8, cache_timeout=0)
+        for _ in range(100):
+            views.incr()
+        views.resize(2)
+        self.assertEqual(views.shards, 2)
+        self.assertEqual(views.value(), 100)
+        self.assertTrue(all(row['id'] in ('views:0', 'views:1') \
+                for row in self.rows('views')))
+
+        views.resize(4)
+        for _ in range(10):
+            views.incr()
+        self.assertEqual(views.value(), 110)
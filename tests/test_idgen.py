@@ -0,0 +1,81 @@
+from lee import idgen
+from tests.base import TestCase
+import threading
+import time
+
+class IdGeneratorTest(TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.connect()
+
+    def test_reserve(self):
+        self.assertEqual(idgen.reserve('user', 10), 10)
+        self.assertEqual(idgen.reserve('user', 5), 15)
+        self.assertEqual(idgen.reserve('other', 1), 1)
+
+    def test_blocks(self):
+        first = idgen.IdGenerator('user', block_size=3)
+        second = idgen.IdGenerator('user', block_size=3)
+        ids = [first.next(), first.next(), second.next(), first.next(),
+                first.next(), second.next()]
+        self.assertEqual(ids, [1, 2, 4, 3, 7, 5])
+
+    def test_threads_unique(self):
+        gen = idgen.IdGenerator('user', block_size=10)
+        ids = []
+        lock = threading.Lock()
+
+        def work():
+            got = [next(gen) for _ in range(100)]
+            with lock:
+                ids.extend(got)
+        threads = [threading.Thread(target=work) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(sorted(ids), list(range(1, 401)))
+
+class SnowflakeTest(TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.connect()
+
+    def test_layout(self):
+        gen = idgen.IdGenerator('event', snowflake=True, worker_id=5)
+        start = int(time.time() * 1000) - idgen.EPOCH
+        uid = gen.next()
+        self.assertLess(uid, 1 << 63)
+        self.assertEqual((uid >> idgen.SEQUENCE_BITS) & ((1 << idgen.WORKER_BITS) - 1), 5)
+        self.assertGreaterEqual(uid >> (idgen.WORKER_BITS + idgen.SEQUENCE_BITS), start)
+
+    def test_ordered_unique(self):
+        gen = idgen.IdGenerator('event', snowflake=True, worker_id=1)
+        # more than the sequence of one millisecond
+        ids = [gen.next() for _ in range(10000)]
+        self.assertEqual(ids, sorted(ids))
+        self.assertEqual(len(set(ids)), len(ids))
+
+    def test_workers_never_collide(self):
+        first = idgen.IdGenerator('event', snowflake=True, worker_id=1)
+        second = idgen.IdGenerator('event', snowflake=True, worker_id=2)
+        ids = set()
+        for _ in range(2000):
+            ids.add(first.next())
+            ids.add(second.next())
+        self.assertEqual(len(ids), 4000)
+
+    def test_reserved_worker_id(self):
+        first = idgen.IdGenerator('event', snowflake=True)
+        second = idgen.IdGenerator('event', snowflake=True)
+        first.next()
+        second.next()
+        self.assertEqual((first.worker_id, second.worker_id), (1, 2))
+
+    def test_invalid_worker_id(self):
+        with self.assertRaises(ValueError):
+            idgen.IdGenerator('event', snowflake=True, worker_id=1 << idgen.WORKER_BITS)
+        with self.assertRaises(ValueError):
+            idgen.IdGenerator('event', snowflake=True, worker_id=-1)
@@ -0,0 +1,72 @@
+from lee import Model, Table, counter
+from lee import cache as mc
+from tests.base import TestCase
+import logging
+import threading
+
+class _Post(Model):
+    table_name = 'post'
+    incr_interval = 60
+    columns = [
+        {'name': 'id',    'type': 'int', 'primary': True, 'auto_increment': True},
+        {'name': 'title', 'type': 'str'},
+        {'name': 'views', 'type': 'int', 'default': 0},
+    ]
+
+class IncrTest(TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.connect(lru_cache=True)
+        self.Post = Table(_Post)
+        self.Post.save({'title': 'a'})
+
+    def test_incr_decr(self):
+        self.assertEqual(self.Post.incr(1, 'views'), 1)
+        self.assertEqual(self.Post.incr(1, 'views', 5), 6)
+        self.assertEqual(self.Post.decr(1, 'views', 2), 4)
+        self.assertEqual(self.Post.find_by_id(1)['views'], 4)
+        self.assertIsNone(self.Post.incr(2, 'views'))
+
+    def test_cached_row_updated(self):
+        self.Post.find_by_id(1)
+        key = self.Post._gen_cache_key([1])
+        self.Post.incr(1, 'views', 3)
+        self.assertEqual(mc.get(key)['views'], 3)
+        self.assertEqual(self.Post.find_by_id(1)['views'], 3)
+
+    def test_invalid_column(self):
+        with self.assertRaises(ValueError):
+            self.Post.incr(1, 'id')
+        with self.assertRaises(ValueError):
+            self.Post.incr(1, 'missing')
+
+    def test_concurrent(self):
+        def work():
+            for _ in range(50):
+                self.Post.incr(1, 'views')
+        threads = [threading.Thread(target=work) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(self.Post.find_by_id(1)['views'], 200)
+
+    def test_batch(self):
+        sqls = self.record_sql()
+        for _ in range(10):
+            self.assertIsNone(self.Post.incr(1, 'views', batch=True))
+        self.Post.decr(1, 'views', 3, batch=True)
+        self.assertEqual(sqls, [])
+        self.assertEqual(self.Post.find_by_id(1)['views'], 0)
+
+        counter.flush()
+        updates = [sql for sql in sqls if sql.startswith('UPDATE')]
+        self.assertEqual(len(updates), 1)
+        self.assertEqual(self.Post.find_by_id(1)['views'], 7)
+
+    def test_batch_missing_row_logged(self):
+        self.Post.incr(2, 'views', batch=True)
+        with self.assertLogs('lee', logging.ERROR) as logs:
+            counter.flush()
+        self.assertIn('post views of (2,) dropped', logs.output[0])
@@ -0,0 +1,77 @@
+from lee import Model, Table, query
+from lee.query import gen_index_sql, explain
+from lee.utils import normalize_index
+from tests.base import TestCase
+
+_columns = [
+    {'name': 'id',         'type': 'int', 'primary': True, 'auto_increment': True},
+    {'name': 'name',       'type': 'str'},
+    {'name': 'score',      'type': 'int'},
+    {'name': 'created_at', 'type': 'int'},
+]
+
+class _Score(Model):
+    table_name = 'score'
+    columns = _columns
+    spec_index = [
+        ('score_created', 'score', ('created_at', 'DESC')),
+        {'name': 'positive', 'columns': ['score'], 'include': ['name'],
+            'where': '`score` > 0'},
+    ]
+    spec_uniq = [('name_created', 'name', 'created_at')]
+
+class _ScoreV2(Model):
+    table_name = 'score'
+    columns = _columns
+    spec_index = [
+        ('score_created', 'score', 'created_at'),
+        {'name': 'positive', 'columns': ['score'], 'include': ['name'],
+            'where': '`score` > 0'},
+    ]
+    spec_uniq = [('name_created', 'name', 'created_at')]
+
+class IndexTest(TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.connect()
+
+    def test_normalize_index(self):
+        self.assertEqual(normalize_index(('a', 'x', ('y', 'desc'))),
+                {'name': 'a', 'columns': [('x', 'ASC'), ('y', 'DESC')],
+                    'include': [], 'where': None})
+
+    def test_gen_index_sql(self):
+        sql = gen_index_sql('score', {'name': 'positive', 'columns':
+            [('score', 'desc')], 'include': ['name'], 'where': '`score` > 0'})
+        self.assertEqual(sql, 'create index if not exists score_positive_index '
+                'on `score`(`score` DESC, `name`) where `score` > 0')
+
+    def test_create_and_diff(self):
+        Score = Table(_Score)
+        # the created indexes match the spec
+        self.assertEqual(Score.diff_table(), [])
+
+        names = query()(lambda cur: [ret['name'] for ret in cur.execute(
+            'PRAGMA index_list(`score`)').fetchall()])()
+        self.assertIn('score_score_created_index', names)
+        self.assertIn('score_positive_index', names)
+        self.assertIn('score_name_created_unique_index', names)
+
+        plan = explain('SELECT `name` FROM `score` WHERE `score` = ? '
+                'ORDER BY `created_at` DESC', (1, ))
+        self.assertFalse(plan['full_scan'])
+        self.assertFalse(plan['filesort'])
+
+        Score.save({'name': 'a', 'score': 1, 'created_at': 1})
+        with self.assertRaises(Exception):
+            Score.save({'name': 'a', 'score': 2, 'created_at': 1})
+
+    def test_diff_changed_index(self):
+        Table(_Score)
+        sqls = Table(_ScoreV2).diff_table()
+        self.assertEqual(sqls, [
+            'DROP INDEX IF EXISTS `score_score_created_index`;',
+            'create index if not exists score_score_created_index on '
+            '`score`(`score`, `created_at`);',
+        ])
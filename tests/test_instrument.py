@@ -0,0 +1,64 @@
+from lee import Model, Table
+from lee.query import add_hook, remove_hook, query_stats, reset_query_stats
+from lee.query.instrument import fingerprint
+from tests.base import TestCase
+
+class _Log(Model):
+    table_name = 'log'
+    columns = [
+        {'name': 'id',  'type': 'int', 'primary': True, 'auto_increment': True},
+        {'name': 'msg', 'type': 'str'},
+    ]
+
+class InstrumentTest(TestCase):
+
+    def setUp(self):
+        super().setUp()
+        reset_query_stats()
+        self.addCleanup(reset_query_stats)
+
+    def test_hooks(self):
+        self.connect()
+        Log = Table(_Log)
+        before = []
+        after = []
+        # the event is completed after the before hooks, keep a copy
+        on_before = lambda event: before.append(dict(event))
+        add_hook(on_before, after.append)
+        self.addCleanup(remove_hook, on_before, after.append)
+
+        Log.save({'msg': 'a'})
+        Log.save({'msg': 'b'})
+        Log.find_all()
+        self.assertEqual(len(before), len(after))
+        select = [event for event in after if event['operation'] == 'SELECT'][-1]
+        self.assertEqual(select['table'], 'log')
+        self.assertEqual(select['rows'], 2)
+        self.assertGreaterEqual(select['elapsed'], 0)
+        self.assertNotIn('elapsed', before[-1])
+
+    def test_query_stats(self):
+        self.connect(query_stats=True)
+        Log = Table(_Log)
+        for idx in range(3):
+            Log.save({'msg': str(idx)})
+            Log.find_by_id(idx + 1)
+        stats = query_stats()
+        select = [stat for key, stat in stats.items() \
+                if key.startswith('SELECT * FROM `log` WHERE')]
+        self.assertEqual(len(select), 1)
+        self.assertEqual(select[0]['count'], 3)
+        self.assertEqual(sum(select[0]['buckets']), 3)
+        reset_query_stats()
+        self.assertEqual(query_stats(), {})
+
+    def test_slow_log(self):
+        self.connect(slow_query_time=0.0000001)
+        Log = Table(_Log)
+        with self.assertLogs('lee', 'WARNING') as logs:
+            Log.find_all()
+        self.assertTrue(any('Slow query' in line for line in logs.output))
+
+    def test_fingerprint(self):
+        self.assertEqual(fingerprint("SELECT * FROM `a` WHERE `b` = 'x' AND `c` IN (?, ?)"),
+                'SELECT * FROM `a` WHERE `b` = ? AND `c` IN (...)')
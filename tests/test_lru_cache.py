@@ -0,0 +1,46 @@
+from lee.cache import lru_cache
+from tests.base import TestCase
+
+class LRUCacheTest(TestCase):
+
+    def test_entry_limit(self):
+        self.connect(lru_cache=True, lru_cache_max=3)
+        for idx in range(5):
+            lru_cache.set('k{}'.format(idx), idx)
+        self.assertEqual(lru_cache.keys(), ['k4', 'k3', 'k2'])
+        self.assertEqual(lru_cache.stats()['evictions'], 2)
+
+    def test_recent_use_kept(self):
+        self.connect(lru_cache=True, lru_cache_max=2)
+        lru_cache.set('a', 1)
+        lru_cache.set('b', 2)
+        lru_cache.get('a')
+        lru_cache.set('c', 3)
+        self.assertIsNone(lru_cache.get('b'))
+        self.assertEqual(lru_cache.get('a'), 1)
+
+    def test_byte_budget(self):
+        self.connect(lru_cache=True, lru_cache_max=0, lru_cache_max_bytes=1000)
+        for idx in range(20):
+            lru_cache.set('k{}'.format(idx), 'x' * 100)
+        stats = lru_cache.stats()
+        self.assertLessEqual(stats['bytes'], 1000)
+        self.assertGreater(stats['evictions'], 0)
+        self.assertEqual(lru_cache.get('k19'), 'x' * 100)
+        self.assertIsNone(lru_cache.get('k0'))
+
+    def test_serialized_values_are_copies(self):
+        self.connect(lru_cache=True, lru_cache_max_bytes=10000)
+        row = {'id': 1, 'tags': ['a']}
+        lru_cache.set('row', row)
+        row['tags'].append('b')
+        got = lru_cache.get('row')
+        got['id'] = 2
+        self.assertEqual(lru_cache.get('row'), {'id': 1, 'tags': ['a']})
+
+    def test_delete_frees_bytes(self):
+        self.connect(lru_cache=True, lru_cache_max_bytes=10000)
+        lru_cache.set('a', 'x' * 100)
+        self.assertGreater(lru_cache.stats()['bytes'], 100)
+        lru_cache.delete('a')
+        self.assertEqual(lru_cache.stats()['bytes'], 0)
@@ -0,0 +1,58 @@
+from lee import Model, Table, query
+from tests.base import TestCase
+import time
+
+class _Post(Model):
+    table_name = 'post'
+    query_cache = True
+    columns = [
+        {'name': 'id',    'type': 'int', 'primary': True, 'auto_increment': True},
+        {'name': 'topic', 'type': 'str'},
+        {'name': 'score', 'type': 'int', 'default': 0},
+    ]
+
+class QueryCacheTest(TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.connect(lru_cache=True, lru_cache_max=1000)
+        self.Post = Table(_Post)
+        for idx in range(5):
+            self.Post.save({'topic': 'a' if idx % 2 else 'b', 'score': idx})
+
+    def test_find_all_cached(self):
+        first = self.Post.find_all({'topic': 'a'}, order='id')
+        sqls = self.record_sql()
+        again = self.Post.find_all({'topic': 'a'}, order='id')
+        self.assertEqual(sqls, [])
+        self.assertEqual([post['id'] for post in again], [post['id'] for post in first])
+
+    def test_write_invalidates(self):
+        self.assertEqual(len(self.Post.find_all({'topic': 'a'})), 2)
+        self.Post.save({'topic': 'a'})
+        self.assertEqual(len(self.Post.find_all({'topic': 'a'})), 3)
+        self.Post.del_all({'topic': 'a'})
+        self.assertEqual(self.Post.find_all({'topic': 'a'}), [])
+
+    def test_bypass(self):
+        self.Post.find_all({'topic': 'a'})
+        sqls = self.record_sql()
+        self.Post.find_all({'topic': 'a'}, cache=False)
+        self.assertEqual(len(sqls), 1)
+
+    def test_find_one_and_columns(self):
+        self.assertEqual(self.Post.find_one({'score': 3})['topic'], 'a')
+        self.assertEqual(self.Post.count({'topic': 'b'}), 3)
+        sqls = self.record_sql()
+        self.assertEqual(self.Post.find_one({'score': 3})['topic'], 'a')
+        self.assertEqual(self.Post.count({'topic': 'b'}), 3)
+        self.assertEqual(sqls, [])
+
+    def test_timeout_of_the_call(self):
+        self.assertEqual(len(self.Post.find_all({'topic': 'a'}, cache_timeout=1)), 2)
+        # the insert outside lee does not invalidate
+        query(autocommit=True)(lambda cur: cur.execute(
+            "INSERT INTO `post` (`topic`) VALUES ('a')"))()
+        self.assertEqual(len(self.Post.find_all({'topic': 'a'}, cache_timeout=1)), 2)
+        time.sleep(1.1)
+        self.assertEqual(len(self.Post.find_all({'topic': 'a'}, cache_timeout=1)), 3)
@@ -0,0 +1,96 @@
+from lee import Model, Table, replica, query
+from lee import cache as mc
+from tests.base import TestCase
+import lee
+
+class _Item(Model):
+    table_name = 'item'
+    columns = [
+        {'name': 'id',   'type': 'int', 'primary': True, 'auto_increment': True},
+        {'name': 'name', 'type': 'str'},
+    ]
+
+def _insert(path, name):
+    '''write a row straight to the database of path, as the replication'''
+    lee.conf.path, old = path, lee.conf.path
+    try:
+        query(autocommit=True)(lambda cur: cur.execute(
+            'INSERT INTO `item` (`name`) VALUES (?)', (name, )))()
+    finally:
+        lee.conf.path = old
+
+def _row_keys():
+    return [key for key in mc.keys() if '__generation__' not in key]
+
+class ReplicaTest(TestCase):
+
+    def setUp(self):
+        super().setUp()
+        # create the table on the replica first
+        self.connect('replica.db')
+        Table(_Item)
+        self.connect(lru_cache=True, replicas=[self.dsn('replica.db')],
+                replica_sticky_time=60)
+        self.Item = Table(_Item)
+        _insert(self.path('replica.db'), 'replica')
+
+    def test_read_on_replica(self):
+        with replica.session():
+            self.assertEqual(self.Item.find_one({'id': 1})['name'], 'replica')
+            with replica.primary():
+                self.assertIsNone(self.Item.find_one({'id': 1}))
+
+    def test_sticky_after_write(self):
+        with replica.session():
+            self.Item.save({'name': 'primary'})
+            self.assertEqual(self.Item.find_one({'id': 1})['name'], 'primary')
+        with replica.session():
+            self.assertEqual(self.Item.find_one({'id': 1})['name'], 'replica')
+
+    def test_replica_down(self):
+        self.connect(replicas=[self.dsn('missing/replica.db')])
+        Item = Table(_Item)
+        Item.save({'name': 'primary'})
+        with replica.session():
+            self.assertEqual(Item.find_one({'id': 1})['name'], 'primary')
+        self.assertTrue(replica.is_down(0))
+        self.assertIsNone(replica.choose())
+
+    def test_query_error_not_down(self):
+        # the replica answers the health check, the error is the query's
+        with replica.session(), self.assertRaises(Exception):
+            self.Item.find_one({'missing': 1})
+        self.assertFalse(replica.is_down(0))
+
+    def test_replica_rows_not_cached(self):
+        with replica.session():
+            self.assertEqual(self.Item.find_by_id(1)['name'], 'replica')
+            self.assertEqual([ret['name'] for ret in self.Item.find_all()],
+                    ['replica'])
+        self.assertEqual(_row_keys(), [])
+
+        with replica.primary():
+            self.Item.find_all()
+        self.assertEqual(_row_keys(), [])
+        with replica.primary():
+            self.Item.save({'name': 'primary'})
+            self.Item.find_by_id(1)
+        self.assertEqual(len(_row_keys()), 1)
+
+    def test_cache_timeout(self):
+        lee.conf.shm_cache = True
+        self.addCleanup(setattr, lee.conf, 'shm_cache', False)
+        with replica.session():
+            self.assertEqual(replica.cache_timeout(0), 60)
+            self.assertEqual(replica.cache_timeout(600), 60)
+            self.assertEqual(replica.cache_timeout(5), 5)
+            with replica.primary():
+                self.assertEqual(replica.cache_timeout(600), 600)
+            replica.wrote()
+            self.assertEqual(replica.cache_timeout(600), 600)
+
+        lee.conf.shm_cache = False
+        with replica.session():
+            self.assertIsNone(replica.cache_timeout(600))
+        with replica.using(0):
+            self.assertIsNone(replica.cache_timeout(600))
@@ -0,0 +1,84 @@
+from lee import Model, Table, shard, scatter
+from lee import cache as mc
+from tests.base import TestCase
+
+class _Event(Model):
+    table_name = 'event'
+    sharded = True
+    query_cache = True
+    cache_hydrate = True
+    columns = [
+        {'name': 'id',    'type': 'int', 'primary': True},
+        {'name': 'kind',  'type': 'str'},
+        {'name': 'score', 'type': 'int'},
+    ]
+
+class ScatterUtilsTest(TestCase):
+
+    def test_merge(self):
+        results = [[{'id': 1}, {'id': 4}], [{'id': 2}, {'id': 3}]]
+        self.assertEqual([ret['id'] for ret in scatter.merge(results, 'id', 3)],
+                [1, 2, 3])
+        self.assertEqual(scatter.parse_limit('1, 2'), (1, 2))
+
+class ScatterTest(TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.connect(lru_cache=True,
+                shards=[self.dsn('s0.db'), self.dsn('s1.db')])
+        self.Event = Table(_Event)
+        for idx in range(1, 21):
+            self.Event.save({'id': idx, 'kind': 'ab'[idx % 2], 'score': idx})
+
+    def test_gather(self):
+        rets = self.Event.find_all(order={'id': 'DESC'}, limit=5, cache=False)
+        self.assertEqual([ret['id'] for ret in rets], [20, 19, 18, 17, 16])
+        self.assertEqual(self.Event.count(cache=False), 20)
+        rets = self.Event.find_all(column='kind, sum(score) AS total',
+                group=['kind'], order='kind', cache=False)
+        self.assertEqual([(ret['kind'], ret['total']) for ret in rets],
+                [('a', 110), ('b', 100)])
+
+    def test_order_column_not_selected(self):
+        rets = self.Event.find_all(column='kind', order={'score': 'DESC'},
+                limit=3, cache=False)
+        self.assertEqual([dict(ret) for ret in rets],
+                [{'kind': 'a'}, {'kind': 'b'}, {'kind': 'a'}])
+        rets = self.Event.find_all(column='`id` AS pk', order={'score': 'DESC'},
+                limit=2)
+        self.assertEqual([dict(ret) for ret in rets], [{'pk': 20}, {'pk': 19}])
+
+        with self.assertRaises(ValueError):
+            self.Event.find_all(column='kind, count(*) AS c', group=['kind'],
+                    order='score', cache=False)
+
+    def test_query_cache_after_row_eviction(self):
+        rets = self.Event.find_all({'kind': 'a'}, order='id')
+        self.assertEqual(len(rets), 10)
+
+        # drop the row entries only, the query entry stays
+        mc.bump_generation('event')
+        sqls = self.record_sql()
+        cached = self.Event.find_all({'kind': 'a'}, order='id')
+        self.assertEqual(sqls, [])
+        self.assertEqual([ret['id'] for ret in cached],
+                [ret['id'] for ret in rets])
+        self.assertEqual(cached[0]['score'], 2)
+
+    def test_query_cache_by_limit(self):
+        # the limit of the aggregates is not in the sql of the shards
+        column = 'kind, count(*) AS c'
+        one = self.Event.find_all(column=column, group=['kind'], order='kind',
+                limit=1)
+        both = self.Event.find_all(column=column, group=['kind'], order='kind')
+        self.assertEqual(len(one), 1)
+        self.assertEqual(len(both), 2)
+
+    def test_query_cache_by_shard(self):
+        counts = []
+        for idx in range(shard.count()):
+            with shard.using(idx):
+                counts.append(len(self.Event.find_all()))
+        self.assertEqual(sum(counts), 20)
+        self.assertNotEqual(counts[0], 20)
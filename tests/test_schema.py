@@ -0,0 +1,78 @@
+from lee import Model, Table, schema, show_tables, query
+from tests.base import TestCase
+import json
+import time
+
+class _User(Model):
+    table_name = 'user'
+    columns = [
+        {'name': 'id',         'type': 'int', 'primary': True, 'auto_increment': True},
+        {'name': 'name',       'type': 'str', 'index': True},
+        {'name': 'created_at', 'type': 'int', 'default': lambda : int(time.time())},
+    ]
+
+class _Post(Model):
+    table_name = 'post'
+    columns = [
+        {'name': 'id',      'type': 'int', 'primary': True, 'auto_increment': True},
+        {'name': 'user_id', 'type': 'int', 'index': True},
+    ]
+
+class LazySchemaTest(TestCase):
+
+    def test_defer_to_first_query(self):
+        self.connect(lazy_schema=True)
+        sqls = self.record_sql()
+        User = Table(_User)
+        Post = Table(_Post)
+        self.assertTrue(schema.pending())
+        self.assertEqual(sqls, [])
+
+        User.save({'name': 'a'})
+        self.assertFalse(schema.pending())
+        self.assertEqual(sorted(show_tables()), ['post', 'user'])
+        creates = [sql for sql in sqls if sql.lower().startswith('create table')]
+        self.assertEqual(len(creates), 2)
+        self.assertEqual(Post.count(), 0)
+
+    def test_create_in_open_transaction(self):
+        self.connect(lazy_schema=True)
+        User = Table(_User)
+        User.count()
+        # the write without autocommit leaves the transaction open
+        query()(lambda cur: cur.execute(
+            "INSERT INTO `user` (`name`) VALUES ('pending')"))()
+        Post = Table(_Post)
+        self.assertEqual(Post.count(), 0)
+        self.assertEqual(User.count(), 1)
+
+    def test_fingerprint(self):
+        sign = schema.fingerprint('user', _User.columns)
+        self.assertEqual(sign, schema.fingerprint('user', _User.columns))
+        self.assertNotEqual(sign, schema.fingerprint('user', _Post.columns))
+
+    def test_schema_cache(self):
+        cache = self.path('schema.json')
+        self.connect(lazy_schema=True, schema_cache=cache)
+        Table(_User).count()
+        with open(cache) as f:
+            saved = json.load(f)
+        self.assertEqual(list(saved.values()),
+                [[schema.fingerprint('user', _User.columns)]])
+
+        # the unchanged schema skips the introspection
+        self.connect(lazy_schema=True, schema_cache=cache)
+        sqls = self.record_sql()
+        Table(_User).count()
+        self.assertEqual(len(sqls), 1)
+        self.assertTrue(sqls[0].upper().startswith('SELECT COUNT'))
+
+    def test_schema_cache_new_database(self):
+        cache = self.path('schema.json')
+        self.connect(lazy_schema=True, schema_cache=cache)
+        Table(_User).count()
+
+        # the other database file is not in the cache
+        self.connect('other.db', lazy_schema=True, schema_cache=cache)
+        Table(_User).save({'name': 'b'})
+        self.assertEqual(show_tables(), ['user'])
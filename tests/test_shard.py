@@ -0,0 +1,87 @@
+from lee import Model, Table, shard, query
+from tests.base import TestCase
+
+class _Event(Model):
+    table_name = 'event'
+    sharded = True
+    columns = [
+        {'name': 'id',   'type': 'int', 'primary': True},
+        {'name': 'name', 'type': 'str'},
+    ]
+
+class _Ranged(Model):
+    table_name = 'ranged'
+    sharded = True
+    shard_key = staticmethod(lambda pk: 0 if pk[0] < 100 else 1)
+    columns = [
+        {'name': 'id',   'type': 'int', 'primary': True},
+        {'name': 'name', 'type': 'str'},
+    ]
+
+def _count_on(idx, table_name):
+    with shard.using(idx):
+        return query()(lambda cur: cur.execute(
+            'SELECT COUNT(*) AS `c` FROM `{}`'.format(table_name)).fetchone()['c'])()
+
+class RingTest(TestCase):
+
+    def test_ring_stable(self):
+        ring = shard.Ring(['a', 'b', 'c'])
+        keys = ['user:{}'.format(idx) for idx in range(1000)]
+        owners = [ring.node(key) for key in keys]
+        self.assertEqual(set(owners), {'a', 'b', 'c'})
+        # the order of the nodes does not matter
+        self.assertEqual(owners, [shard.Ring(['c', 'a', 'b']).node(key) \
+                for key in keys])
+
+        # a new node only takes keys, about 1/4 of them
+        bigger = shard.Ring(['a', 'b', 'c', 'd'])
+        moved = [key for key, owner in zip(keys, owners) \
+                if bigger.node(key) != owner]
+        self.assertTrue(all(bigger.node(key) == 'd' for key in moved))
+        self.assertLess(len(moved), 400)
+
+    def test_parse_dsn(self):
+        self.assertEqual(shard.parse_dsn('sqlite://data/a.db')['path'], 'data/a.db')
+        mysql = shard.parse_dsn('mysql://host?user=u&db=d')
+        self.assertTrue(mysql['use_mysql'])
+        self.assertEqual(mysql['mysql'], {'host': 'host', 'port': 3306,
+            'user': 'u', 'db': 'd'})
+
+class ShardTest(TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.connect(lru_cache=True,
+                shards=[self.dsn('s0.db'), self.dsn('s1.db')])
+
+    def test_route_by_pk(self):
+        Event = Table(_Event)
+        for idx in range(1, 41):
+            Event.save({'id': idx, 'name': 'e{}'.format(idx)})
+        counts = [_count_on(idx, 'event') for idx in range(2)]
+        self.assertEqual(sum(counts), 40)
+        self.assertTrue(all(counts))
+
+        for idx in range(1, 41):
+            self.assertEqual(Event.find_by_id(idx)['name'], 'e{}'.format(idx))
+            with shard.using(shard.route(_Event, (idx, ))):
+                self.assertEqual(Event.count({'id': idx}), 1)
+
+        Event.del_by_id(1)
+        self.assertIsNone(Event.find_by_id(1))
+
+    def test_shard_key(self):
+        Ranged = Table(_Ranged)
+        Ranged.save({'id': 1, 'name': 'a'})
+        Ranged.save({'id': 200, 'name': 'b'})
+        self.assertEqual([_count_on(idx, 'ranged') for idx in range(2)], [1, 1])
+        with shard.using(1):
+            self.assertEqual(Ranged.find_one({'id': 200})['name'], 'b')
+
+    def test_using_out_of_range(self):
+        with self.assertRaises(IndexError):
+            shard.using(2)
+        with shard.using(1):
+            self.assertEqual(shard.current(), 1)
+        self.assertIsNone(shard.current())
@@ -0,0 +1,100 @@
+from lee import conf
+from lee.cache import shm_cache
+from tests.base import TestCase
+import multiprocessing
+import os
+import subprocess
+import sys
+import threading
+
+def _child_set(path, key, val):
+    shm_cache.close()
+    conf.shm_cache_path = path
+    shm_cache.set(key, val)
+
+class ShmCacheTest(TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.connect(shm_cache=self.path('shm'), shm_cache_size=64 * 1024,
+                shm_cache_slot_size=256)
+        self.addCleanup(shm_cache.close)
+
+    def test_get_set_delete(self):
+        shm_cache.set('a', {'x': 1})
+        self.assertEqual(shm_cache.get('a'), {'x': 1})
+        self.assertEqual(shm_cache.incr('n'), 1)
+        self.assertEqual(shm_cache.incr('n'), 2)
+        shm_cache.delete('a')
+        self.assertIsNone(shm_cache.get('a'))
+        self.assertFalse(shm_cache.set('big', 'x' * 1000))
+
+    def test_oversize_drops_the_old_value(self):
+        shm_cache.set('k', 'small')
+        self.assertFalse(shm_cache.set('k', 'x' * 1000))
+        self.assertIsNone(shm_cache.get('k'))
+
+    def test_shared_by_processes(self):
+        shm_cache.get('warm')
+        ctx = multiprocessing.get_context('fork')
+        proc = ctx.Process(target=_child_set, args=(self.path('shm'), 'k', 'from child'))
+        proc.start()
+        proc.join()
+        self.assertEqual(proc.exitcode, 0)
+        self.assertEqual(shm_cache.get('k'), 'from child')
+
+    def test_other_size_is_refused(self):
+        shm_cache.set('a', 1)
+        shm_cache.close()
+        size = os.path.getsize(self.path('shm'))
+        conf.shm_cache_size = 128 * 1024
+        with self.assertRaises(ValueError):
+            shm_cache.get('a')
+        # the mapped file is never truncated
+        self.assertEqual(os.path.getsize(self.path('shm')), size)
+
+        conf.shm_cache_size = 64 * 1024
+        self.assertEqual(shm_cache.get('a'), 1)
+
+    def test_default_path_per_database(self):
+        self.connect('a.db', shm_cache=True)
+        path_a = conf.shm_cache_path
+        self.connect('b.db', shm_cache=True)
+        path_b = conf.shm_cache_path
+        self.assertNotEqual(path_a, path_b)
+        self.assertTrue(path_a.startswith('/dev/shm/lee_cache_'))
+        self.connect('a.db', shm_cache=True)
+        self.assertEqual(conf.shm_cache_path, path_a)
+
+    def test_keys_with_writers(self):
+        stop = threading.Event()
+
+        def write():
+            idx = 0
+            while not stop.is_set():
+                shm_cache.set('w{}'.format(idx % 50), 'v' * (idx % 100))
+                idx += 1
+
+        threads = [threading.Thread(target=write) for _ in range(3)]
+        for thread in threads:
+            thread.start()
+        try:
+            for _ in range(20):
+                keys = shm_cache.keys()
+                self.assertTrue(all(key.startswith('w') for key in keys))
+        finally:
+            stop.set()
+            for thread in threads:
+                thread.join()
+        self.assertEqual(len(shm_cache.keys(10)), 10)
+
+class NoShmCacheTest(TestCase):
+
+    def test_connect_without_fcntl(self):
+        # fcntl is missing on Windows
+        code = ('import sys; sys.modules["fcntl"] = None; import lee; '
+                'lee.connect({!r}); assert "lee.cache.shm_cache" not in sys.modules'
+                ).format(self.dsn())
+        env = dict(os.environ, PYTHONPATH=os.path.dirname(os.path.dirname(
+            os.path.abspath(__file__))))
+        subprocess.check_call([sys.executable, '-c', code], env=env)
@@ -0,0 +1,66 @@
+from lee import Model, Table
+from lee.cache import tinylfu
+from lee.cache.replay import replay
+from tests.base import TestCase
+
+class _Row(Model):
+    table_name = 'row'
+    columns = [
+        {'name': 'id', 'type': 'int', 'primary': True},
+        {'name': 'v',  'type': 'str'},
+    ]
+
+class TinyLFUTest(TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.connect(lru_cache=True, lru_cache_max=100, cache_policy='tinylfu')
+
+    def test_bounded(self):
+        for idx in range(500):
+            tinylfu.set('k{}'.format(idx), idx)
+        self.assertLessEqual(tinylfu.stats()['entries'], 100)
+
+    def test_scan_resistant(self):
+        hot = ['hot{}'.format(idx) for idx in range(50)]
+        for _ in range(5):
+            for key in hot:
+                if tinylfu.get(key) is None:
+                    tinylfu.set(key, True)
+
+        for idx in range(1000):
+            tinylfu.set('cold{}'.format(idx), True)
+
+        kept = sum(1 for key in hot if tinylfu.get(key) is not None)
+        self.assertGreaterEqual(kept, 45)
+
+    def test_replay_beats_lru_on_scans(self):
+        keys = []
+        for round in range(20):
+            keys.extend('hot{}'.format(idx) for idx in range(30))
+            keys.extend('scan{}-{}'.format(round, idx) for idx in range(100))
+        ratios = replay(keys, size=50)
+        self.assertGreater(ratios['tinylfu'], ratios['lru'])
+
+    def test_table_on_tinylfu(self):
+        Row = Table(_Row)
+        Row.save({'id': 1, 'v': 'a'})
+        self.assertEqual(Row.find_by_id(1)['v'], 'a')
+        sqls = self.record_sql()
+        self.assertEqual(Row.find_by_id(1)['v'], 'a')
+        self.assertEqual(sqls, [])
+        Row.del_by_id(1)
+        self.assertIsNone(Row.find_by_id(1))
+
+    def test_sizes_kept_after_replay(self):
+        main_max = tinylfu._main_max
+        replay(['a', 'b', 'a'], size=10)
+        self.assertEqual(tinylfu._main_max, main_max)
+
+    def test_connect_resizes(self):
+        self.connect(lru_cache=True, lru_cache_max=1000, cache_policy='tinylfu')
+        self.assertEqual(tinylfu._main_max + tinylfu._window_max, 1000)
+
+    def test_unbounded_refused(self):
+        with self.assertRaises(ValueError):
+            self.connect(lru_cache=True, lru_cache_max=0, cache_policy='tinylfu')
@@ -0,0 +1,44 @@
+from lee import Model, Table, trace
+from tests.base import TestCase
+import json
+
+class _Event(Model):
+    table_name = 'event'
+    columns = [
+        {'name': 'id',   'type': 'int', 'primary': True, 'auto_increment': True},
+        {'name': 'name', 'type': 'str'},
+    ]
+
+class TraceTest(TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.connect(lru_cache=True)
+        self.addCleanup(trace.stop)
+
+    def test_trace_file(self):
+        Event = Table(_Event)
+        path = self.path('trace.json')
+        trace.start(path, buffer_size=2)
+        self.assertTrue(trace.enabled())
+        Event.save({'name': 'a'})
+        Event.find_by_id(1)
+        Event.find_all()
+        with trace.span('custom', 'app', {'k': 1}):
+            pass
+        trace.stop()
+        self.assertFalse(trace.enabled())
+
+        with open(path) as f:
+            events = json.load(f)
+        cats = set(event['cat'] for event in events if 'cat' in event)
+        self.assertTrue({'sql', 'query', 'cache', 'app', 'model'} <= cats, cats)
+        for event in events:
+            if event['ph'] == 'X':
+                self.assertGreaterEqual(event['dur'], 0)
+        self.assertEqual(events[-1]['ph'], 'M')
+
+    def test_disabled_no_spans(self):
+        trace.add_span('x', 'app', 0, 1)
+        self.assertFalse(trace.enabled())
+        self.assertEqual(trace._buffer, [])
@@ -0,0 +1,93 @@
+from lee import Model, Table, query, transfer
+from tests.base import TestCase
+import contextlib
+import io
+
+class _Doc(Model):
+    table_name = 'doc'
+    columns = [
+        {'name': 'id',   'type': 'int', 'primary': True, 'auto_increment': True},
+        {'name': 'name', 'type': 'str'},
+        {'name': 'data', 'type': 'pickle'},
+    ]
+
+_rows = [
+    {'name': 'plain', 'data': {'k': [1, 2]}},
+    {'name': '\\starts with a backslash', 'data': None},
+    {'name': 'multi\nline, "quoted"', 'data': b'\x00\xff'},
+    {'name': None, 'data': 'text'},
+]
+
+class TransferTest(TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.connect(lru_cache=True)
+        self.Doc = Table(_Doc)
+        for row in _rows:
+            self.Doc.save(dict(row))
+
+    def rows(self, table):
+        return [dict(ret) for ret in table.find_all(order='id')]
+
+    def round_trip(self, format, **kwargs):
+        out = io.StringIO()
+        self.assertEqual(self.Doc.export(out, format), len(_rows))
+        expected = self.rows(self.Doc)
+
+        self.connect('copy.db', lru_cache=True)
+        copy = Table(_Doc)
+        self.assertEqual(copy.import_(io.StringIO(out.getvalue()), format,
+            **kwargs), len(_rows))
+        self.assertEqual(self.rows(copy), expected)
+
+    def test_jsonl(self):
+        self.round_trip('jsonl', batch_size=3)
+
+    def test_csv(self):
+        self.round_trip('csv', batch_size=1)
+
+    def test_processes(self):
+        self.round_trip('csv', batch_size=2, processes=2)
+
+    def test_unknown_format(self):
+        with self.assertRaises(ValueError):
+            self.Doc.export(io.StringIO(), 'xml')
+
+    def test_import_after_pending_write(self):
+        out = io.StringIO()
+        self.Doc.export(out, query={'id_$gt': 2})
+        self.Doc.del_all({'id_$gt': 2})
+
+        # the write without autocommit leaves the transaction open
+        query()(lambda cur: cur.execute(
+            'INSERT INTO `doc` (`id`, `name`) VALUES (10, ?)', ('pending', )))()
+        self.assertEqual(self.Doc.import_(io.StringIO(out.getvalue())), 2)
+        self.assertEqual([ret['id'] for ret in self.rows(self.Doc)],
+                [1, 2, 3, 4, 10])
+
+    def test_failed_batch_rolled_back(self):
+        out = io.StringIO()
+        self.Doc.export(out)
+        self.Doc.del_all({'id': 4})
+        query()(lambda cur: cur.execute(
+            'INSERT INTO `doc` (`id`, `name`) VALUES (10, ?)', ('pending', )))()
+
+        # the row 4 then the conflict of the row 1 in one batch
+        lines = out.getvalue().splitlines(True)
+        with self.assertRaises(Exception):
+            self.Doc.import_(io.StringIO(lines[3] + lines[0]), batch_size=2)
+        self.assertEqual([ret['id'] for ret in self.rows(self.Doc)],
+                [1, 2, 3, 10])
+
+    def test_cli(self):
+        path = self.path('doc.csv.gz')
+        transfer.dump_main(['-q', '-o', path, self.dsn(), 'doc'])
+        self.connect('copy.db')
+        Table(_Doc)
+        transfer.load_main(['-q', self.dsn('copy.db'), 'doc', path])
+        self.assertEqual(len(self.rows(Table(_Doc))), len(_rows))
+
+        out = io.StringIO()
+        with contextlib.redirect_stderr(out), self.assertRaises(SystemExit):
+            transfer.load_main(['-q', self.dsn('copy.db'), 'missing', path])
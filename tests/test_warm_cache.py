@@ -0,0 +1,61 @@
+from lee import Model, Table
+from lee import cache as mc
+from lee.cache import lru_cache
+from tests.base import TestCase
+
+class _Page(Model):
+    table_name = 'page'
+    columns = [
+        {'name': 'id',    'type': 'int', 'primary': True, 'auto_increment': True},
+        {'name': 'title', 'type': 'str'},
+    ]
+
+class _Other(Model):
+    table_name = 'other'
+    columns = [
+        {'name': 'id', 'type': 'int', 'primary': True},
+    ]
+
+class WarmCacheTest(TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.connect(lru_cache=True, lru_cache_max=1000)
+        self.Page = Table(_Page)
+        for idx in range(20):
+            self.Page.save({'title': 't{}'.format(idx)})
+        lru_cache.clear()
+
+    def test_warm_cache(self):
+        self.assertEqual(self.Page.warm_cache({'id_$lte': 10}, chunk_size=3), 10)
+        sqls = self.record_sql()
+        self.assertEqual(self.Page.find_by_id(5)['title'], 't4')
+        self.assertEqual(sqls, [])
+        self.Page.find_by_id(15)
+        self.assertEqual(len(sqls), 1)
+
+    def test_dump_and_preload(self):
+        Other = Table(_Other)
+        Other.save({'id': 1})
+        Other.find_by_id(1)
+        self.Page.warm_cache(limit=5)
+        path = self.path('keys.txt')
+        self.assertEqual(mc.dump_keys(path), len(mc.keys()))
+
+        lru_cache.clear()
+        self.assertEqual(self.Page.preload_cache(path), 5)
+        sqls = self.record_sql()
+        for idx in range(1, 6):
+            self.assertEqual(self.Page.find_by_id(idx)['id'], idx)
+        self.assertEqual(sqls, [])
+
+    def test_preload_skips_old_schema(self):
+        self.Page.warm_cache()
+        path = self.path('keys.txt')
+        mc.dump_keys(path)
+        lru_cache.clear()
+
+        class _Changed(_Page):
+            columns = _Page.columns + [{'name': 'body', 'type': 'str'}]
+
+        self.assertEqual(Table(_Changed).preload_cache(path), 0)
@@ -0,0 +1,78 @@
+from lee import Model, Table, query, workload
+from tests.base import TestCase
+import json
+
+class _Doc(Model):
+    table_name = 'doc'
+    columns = [
+        {'name': 'id',   'type': 'int', 'primary': True, 'auto_increment': True},
+        {'name': 'name', 'type': 'str'},
+        {'name': 'data', 'type': 'pickle'},
+    ]
+
+class WorkloadTest(TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.connect()
+        self.log = self.path('workload.jsonl')
+        self.addCleanup(workload.stop_capture)
+
+    def read_log(self):
+        with open(self.log) as f:
+            return [json.loads(line) for line in f]
+
+    def test_capture(self):
+        Doc = Table(_Doc)
+        workload.start_capture(self.log)
+        self.assertTrue(workload.capturing())
+        Doc.save({'name': 'secret', 'data': [1, 2]})
+        Doc.find_by_id(1)
+        Doc.find_all({'name': 'secret'})
+        workload.stop_capture()
+        self.assertFalse(workload.capturing())
+
+        records = self.read_log()
+        self.assertEqual(records[0]['version'], 1)
+        ops = [record['op'] for record in records[1:]]
+        self.assertEqual(ops[0], 'save')
+        self.assertIn('find_by_id', ops)
+        self.assertIn('find_all', ops)
+        # only the top-level operations and no raw values
+        self.assertEqual(len(ops), len(set(ops)))
+        self.assertNotIn('secret', json.dumps(records))
+
+    def test_capture_not_anonymized(self):
+        Doc = Table(_Doc)
+        workload.start_capture(self.log, anonymize=False)
+        Doc.find_all({'name': 'secret'})
+        workload.stop_capture()
+        self.assertEqual(self.read_log()[1]['kwargs']['query'],
+                {'name': 'secret'})
+
+    def test_replay_from_schema(self):
+        Doc = Table(_Doc)
+        # the untyped sqlite column has no type in desc_table
+        query(autocommit=True)(lambda cur: cur.execute(
+            'CREATE TABLE `untyped` (`id` INTEGER PRIMARY KEY, `data`)'))()
+        Doc.save({'name': 'a', 'data': {'k': 1}})
+
+        records = [
+            {'version': 1, 'start': 0, 'anonymize': False},
+            {'ts': 0, 'tid': 1, 'table': 'doc', 'op': 'find_by_id',
+                'args': [1], 'kwargs': {}, 'elapsed': 0},
+            {'ts': 0, 'tid': 1, 'table': 'doc', 'op': 'count',
+                'args': [], 'kwargs': {}, 'elapsed': 0},
+            {'ts': 0, 'tid': 1, 'table': 'untyped', 'op': 'count',
+                'args': [], 'kwargs': {}, 'elapsed': 0},
+            {'ts': 0, 'tid': 1, 'table': 'untyped', 'op': 'find_all',
+                'args': [], 'kwargs': {}, 'elapsed': 0},
+        ]
+        with open(self.log, 'w') as f:
+            for record in records:
+                f.write(json.dumps(record) + '\n')
+
+        result = workload.replay(self.log, threads=2, speed=0)
+        self.assertEqual(result['count'], 4)
+        self.assertEqual(result['errors'], 0)
+        self.assertEqual(result['ops']['count']['count'], 2)
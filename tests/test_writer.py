@@ -0,0 +1,88 @@
+from lee import Model, Table, writer
+from tests.base import TestCase
+import logging
+
+class _Event(Model):
+    table_name = 'event'
+    write_behind = True
+    write_behind_batch = 2000
+    write_behind_interval = 0.05
+    columns = [
+        {'name': 'id',   'type': 'int', 'primary': True, 'auto_increment': True},
+        {'name': 'name', 'type': 'str', 'unique': True},
+        {'name': 'hits', 'type': 'int', 'default': 0},
+    ]
+
+class _Log(Model):
+    table_name = 'log'
+    write_behind = True
+    write_behind_batch = 2000
+    write_behind_interval = 0.05
+    # the unique index Table.save does not look up
+    spec_uniq = [('name', 'name')]
+    columns = [
+        {'name': 'id',   'type': 'int', 'primary': True, 'auto_increment': True},
+        {'name': 'name', 'type': 'str'},
+    ]
+
+class WriterTest(TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.connect()
+        self.Event = Table(_Event)
+        self.Log = Table(_Log)
+
+    def names(self, table=None):
+        return [ret['name'] for ret in (table or self.Event).find_all(order='id')]
+
+    def test_batch_insert(self):
+        for idx in range(10):
+            self.assertIsNone(self.Event.save({'name': 'e{}'.format(idx)}))
+        writer.flush()
+        self.assertEqual(self.names(), ['e{}'.format(idx) for idx in range(10)])
+        self.assertEqual(self.Event.find_by_id(1)['hits'], 0)
+
+    def test_coalesce(self):
+        self.Event.save({'name': 'a'})
+        writer.flush()
+        for hits in range(1, 4):
+            self.Event.save({'id': 1, 'name': 'a', 'hits': hits})
+        writer.flush()
+        self.assertEqual(self.Event.find_by_id(1)['hits'], 3)
+
+    def test_save_by_unique_key(self):
+        self.Event.save({'name': 'a', 'hits': 1})
+        writer.flush()
+        self.Event.save({'name': 'a', 'hits': 2})
+        self.Event.save({'name': 'b'})
+        self.Event.save({'name': 'a', 'hits': 3})
+        writer.flush()
+        self.assertEqual(self.names(), ['a', 'b'])
+        self.assertEqual(self.Event.find_by_name('a')['hits'], 3)
+
+    def test_unique_conflict_drops_the_row_only(self):
+        self.Log.save({'name': 'e3'})
+        writer.flush()
+        with self.assertLogs('lee', logging.ERROR) as logs:
+            for idx in range(6):
+                self.Log.save({'name': 'e{}'.format(idx)})
+            writer.flush()
+        self.assertEqual(self.names(self.Log), ['e3', 'e0', 'e1', 'e2', 'e4', 'e5'])
+        self.assertEqual(len(logs.output), 1)
+        self.assertIn("'name': 'e3'", logs.output[0])
+
+    def test_failed_chunk_not_committed_later(self):
+        # 2 columns, 499 rows per INSERT, the conflict is in the second one
+        with self.assertLogs('lee', logging.ERROR):
+            for idx in range(600):
+                self.Log.save({'name': 'e{}'.format(idx)})
+            self.Log.save({'name': 'e0'})
+            writer.flush()
+        self.assertEqual(self.Log.count(), 600)
+
+        self.Log.save({'name': 'next'})
+        writer.flush()
+        names = self.names(self.Log)
+        self.assertEqual(len(names), 601)
+        self.assertEqual(len(set(names)), 601)